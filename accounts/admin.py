@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
+from .search import matching_user_ids
 from django import forms
 
 class CustomUserCreationForm(forms.ModelForm):
@@ -37,3 +38,10 @@ class CustomUserAdmin(UserAdmin):
 
     search_fields = ('phone', 'email', 'name')
     ordering = ('phone',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Prefix search over the indexed keys instead of icontains scans of every column
+        ids = matching_user_ids(search_term)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=ids), False
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.search import create_fuzzy_index, rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the phone / email / name search keys behind the admin student '
+        'typeahead. Migrations fill them once; run this whenever users were changed outside '
+        'the ORM, or with --fuzzy to add fuzzy name matching.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fuzzy', action='store_true',
+                            help='Also create the fuzzy name index (SQLite FTS5 or PostgreSQL pg_trgm) if possible')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['fuzzy']:
+            backend = create_fuzzy_index()
+            if backend:
+                self.stdout.write(f"Fuzzy name index: {backend}.")
+            else:
+                self.stdout.write(self.style.WARNING('This database cannot provide a fuzzy index; search stays prefix-only.'))
+
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} users ({time.monotonic() - started:.1f}s)."
+        ))
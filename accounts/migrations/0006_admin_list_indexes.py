@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customuser_password_set'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'name', 'id'], name='accounts_cu_role_e550ce_idx'),
+        ),
+    ]
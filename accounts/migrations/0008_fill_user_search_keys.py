@@ -0,0 +1,31 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def fill_search_keys(apps, schema_editor):
+    from accounts.search import user_keys
+
+    db = schema_editor.connection.alias
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UserSearchKey = apps.get_model('accounts', 'UserSearchKey')
+    UserSearchKey.objects.using(db).all().delete()
+    keys = []
+    users = CustomUser.objects.using(db).order_by('pk').values_list('pk', 'phone', 'email', 'name')
+    for pk, phone, email, name in users.iterator(chunk_size=BATCH_SIZE):
+        keys.extend(UserSearchKey(user_id=pk, kind=kind, key=key) for kind, key in user_keys(phone, email, name))
+        if len(keys) >= BATCH_SIZE:
+            UserSearchKey.objects.using(db).bulk_create(keys)
+            keys = []
+    UserSearchKey.objects.using(db).bulk_create(keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_search_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
@@ -91,5 +91,32 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'phone'
     REQUIRED_FIELDS = ['email', 'name', 'class_level']
 
+    class Meta:
+        # The admin student list pages through students by name (admin_panel.pagination)
+        indexes = [models.Index(fields=['role', 'name', 'id'])]
+
+    def __str__(self):
+        return self.name
+
+class UserSearchKey(models.Model):
+    """
+    One normalized, prefix-searchable key of a user: the digits of their
+    phone, their lowercased email or one word of their name.
+    Rebuilt whenever those fields change (see accounts.search).
+    """
+    KINDS = (
+        ('phone', 'Phone'),
+        ('email', 'Email'),
+        ('name', 'Name'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='search_keys')
+    kind = models.CharField(max_length=5, choices=KINDS)
+    key = models.CharField(max_length=254)
+
+    class Meta:
+        # Prefix lookups are range scans of this index; user_id comes from the index itself
+        indexes = [models.Index(fields=['key', 'user'])]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.user_id} {self.kind}:{self.key}"
@@ -0,0 +1,76 @@
+"""
+Password generation and bulk hashing.
+
+Django's default hasher is deliberately slow, so hashing thousands of new
+passwords one after another ties up a core for minutes. ParallelHasher
+spreads make_password() over a pool of worker processes (each running
+django.setup() so the configured PASSWORD_HASHERS apply); small batches
+are hashed in-process where starting the pool would cost more than it saves.
+"""
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+# Batches smaller than this are hashed in the calling process.
+PARALLEL_THRESHOLD = 16
+
+
+def generate_password():
+    """A random 8-character password, as used for admin-created accounts."""
+    return str(uuid.uuid4())[:8]
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+class ParallelHasher:
+    """
+    Hashes lists of passwords, in parallel when it pays off. Use as a
+    context manager so the worker processes are started once per job and
+    shut down afterwards:
+
+        with ParallelHasher() as hasher:
+            hashes = hasher.hash(passwords)
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or HASH_WORKERS
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _get_pool(self):
+        if self.pool is None:
+            # 'spawn' so workers do not inherit the web process's threads and connections
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return self.pool
+
+    def hash(self, passwords):
+        """Hashes for `passwords`, in the same order."""
+        passwords = list(passwords)
+        if self.workers < 2 or len(passwords) < PARALLEL_THRESHOLD:
+            return _hash_chunk(passwords)
+        size = -(-len(passwords) // self.workers)
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        return [hashed for chunk in self._get_pool().map(_hash_chunk, chunks) for hashed in chunk]
@@ -0,0 +1,347 @@
+"""
+Typeahead search for users by phone, email or name.
+
+A plain icontains search (as CustomUserAdmin's search_fields does) is an
+unanchored LIKE '%term%' over three columns: a full table scan on every
+keystroke. Instead each user has a few normalized keys in UserSearchKey:
+
+    phone   the digits only, plus the last 10 digits so a country code
+            need not be typed
+    email   lowercased
+    name    each word, lowercased with accents stripped
+
+and a query term matches the keys it is a prefix of. The prefix is looked
+up as the range key >= term AND key < (term with its last character
+bumped), which any backend answers from the (key, user) index. Every term
+of a multi-word query has to match one of the user's keys.
+
+Results come back in key order, so the lookup reads the index in order
+and stops after `limit` users: an exact word ("priya") sorts before its
+extensions ("priyanka"). Further terms are checked per candidate with an
+EXISTS against the user's own few keys.
+
+Fuzzy name matching, for typos, is optional and depends on the backend;
+`manage.py rebuild_search_index --fuzzy` sets it up. On SQLite an FTS5
+trigram table holds the distinct name words, a vocabulary far smaller than
+the user table: a misspelt word is replaced by the closest words in it and
+the prefix search is run again. On PostgreSQL a pg_trgm index on names is
+queried directly. Either way fuzzy matching only runs when the prefix
+search comes up short.
+"""
+import hashlib
+import itertools
+import re
+import unicodedata
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import CustomUser, UserSearchKey
+
+MIN_QUERY_LENGTH = 2
+MAX_RESULTS = 20
+FTS_TABLE = 'accounts_user_search_words'
+PG_TRGM_INDEX = 'accounts_customuser_name_trgm'
+# Share of trigrams a word must have in common with a query word to replace it
+FUZZY_THRESHOLD = 0.3
+# Vocabulary words checked against FUZZY_THRESHOLD per query word
+FUZZY_CANDIDATES = 50
+# Replacements tried per misspelt word, and word combinations searched
+FUZZY_ALTERNATIVES = 3
+FUZZY_COMBINATIONS = 6
+# Keys counted per term to find the most selective one
+SELECTIVITY_CAP = 1000
+# Candidate keys read before giving up on filling a page of results
+MAX_SCANNED_KEYS = 2000
+BATCH_SIZE = 1000
+SEARCHED_FIELDS = {'phone', 'email', 'name'}
+
+_fuzzy_backend = None
+
+
+def _fold(text):
+    """Lowercase and strip accents."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def name_words(name):
+    return re.findall(r'\w+', _fold(name))
+
+
+def user_keys(phone, email, name):
+    """[(kind, key)] for one user."""
+    keys = []
+    digits = re.sub(r'\D', '', phone or '')
+    if digits:
+        keys.append(('phone', digits))
+        if len(digits) > 10:
+            keys.append(('phone', digits[-10:]))
+    if email:
+        keys.append(('email', email.lower()))
+    for word in dict.fromkeys(name_words(name)):
+        keys.append(('name', word))
+    return keys
+
+
+def _word_id(word):
+    """Stable rowid of a word in the FTS vocabulary."""
+    return int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+def _is_name_query(query):
+    return '@' not in query and not any(c.isdigit() for c in query)
+
+
+def query_terms(query):
+    """
+    Normalized search terms. A query that is all digits once spaces and
+    dashes are removed is one phone term; one with an @ is one email term.
+    """
+    query = (query or '').strip()
+    digits = re.sub(r'[\s\-().+]', '', query)
+    if digits.isdigit():
+        return [digits]
+    if '@' in query:
+        return [query.lower()]
+    return list(dict.fromkeys(name_words(query)))
+
+
+def _prefix(term):
+    """Keys starting with `term`, as an index range."""
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return UserSearchKey.objects.filter(key__gte=term, key__lt=upper, key__startswith=term)
+
+
+# ---------------------------------------------------------------------------
+# Keeping the keys current
+# ---------------------------------------------------------------------------
+
+def index_users(users):
+    """(Re)build the search keys of the given users."""
+    users = list(users)
+    if not users:
+        return
+    if any(user.pk is None for user in users):
+        # Backends that do not return primary keys from bulk_create
+        pks = dict(CustomUser.objects.filter(phone__in=[u.phone for u in users]).values_list('phone', 'pk'))
+        for user in users:
+            user.pk = user.pk or pks.get(user.phone)
+        users = [user for user in users if user.pk]
+    keys = [
+        UserSearchKey(user_id=user.pk, kind=kind, key=key)
+        for user in users
+        for kind, key in user_keys(user.phone, user.email, user.name)
+    ]
+    with transaction.atomic():
+        UserSearchKey.objects.filter(user_id__in=[user.pk for user in users]).delete()
+        UserSearchKey.objects.bulk_create(keys, batch_size=BATCH_SIZE)
+        if _fuzzy() == 'fts5':
+            # Words are never removed here; rebuild_index() drops unused ones
+            words = {key.key for key in keys if key.kind == 'name' and not key.key.isdigit()}
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, word) VALUES (%s, %s)',
+                    [(_word_id(word), word) for word in words],
+                )
+
+
+def rebuild_index():
+    """Rebuild every user's search keys. Returns the number of users indexed."""
+    UserSearchKey.objects.all().delete()
+    if _fuzzy() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    count = 0
+    batch = []
+    for user in CustomUser.objects.order_by('pk').only('pk', 'phone', 'email', 'name').iterator(chunk_size=BATCH_SIZE):
+        batch.append(user)
+        if len(batch) >= BATCH_SIZE:
+            index_users(batch)
+            count += len(batch)
+            batch = []
+    index_users(batch)
+    return count + len(batch)
+
+
+# ---------------------------------------------------------------------------
+# Optional fuzzy index
+# ---------------------------------------------------------------------------
+
+def _fuzzy():
+    """'fts5', 'trgm' or '' depending on which fuzzy index exists. Checked once per process."""
+    global _fuzzy_backend
+    if _fuzzy_backend is None:
+        backend = ''
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                    backend = 'fts5' if cursor.fetchone() else ''
+                elif connection.vendor == 'postgresql':
+                    cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [PG_TRGM_INDEX])
+                    backend = 'trgm' if cursor.fetchone() else ''
+        except DatabaseError:
+            backend = ''
+        _fuzzy_backend = backend
+    return _fuzzy_backend
+
+
+def create_fuzzy_index():
+    """
+    Create the fuzzy name index for this backend. Returns its kind, or ''
+    when the database cannot provide one (then search stays prefix-only).
+    Run rebuild_index() afterwards to fill it.
+    """
+    global _fuzzy_backend
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(word, tokenize='trigram')"
+                )
+            elif connection.vendor == 'postgresql':
+                table = CustomUser._meta.db_table
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {PG_TRGM_INDEX} ON {table} USING gin (lower(name) gin_trgm_ops)'
+                )
+            else:
+                return ''
+    except DatabaseError:
+        return ''
+    _fuzzy_backend = None
+    return _fuzzy()
+
+
+def _trigrams(text):
+    # Padded like pg_trgm, so word starts weigh more than word ends
+    text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _similar_words(word):
+    """Vocabulary words that look like `word`, closest first (FTS5 only)."""
+    grams = {word[i:i + 3] for i in range(len(word) - 2)}
+    if not grams:
+        return []
+    match = ' OR '.join('"%s"' % gram.replace('"', '""') for gram in sorted(grams))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT word FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [match, FUZZY_CANDIDATES],
+        )
+        words = [row[0] for row in cursor.fetchall()]
+    wanted = _trigrams(word)
+    scored = []
+    for candidate in words:
+        have = _trigrams(candidate)
+        score = len(wanted & have) / len(wanted | have)
+        if score >= FUZZY_THRESHOLD and candidate != word:
+            scored.append((score, candidate))
+    return [candidate for _, candidate in sorted(scored, key=lambda s: -s[0])[:FUZZY_ALTERNATIVES]]
+
+
+def _fuzzy_user_ids(query, role, exclude, limit):
+    """Ids of users whose name looks like `query`, best first."""
+    backend = _fuzzy()
+    terms = query_terms(query)
+    if not backend or not terms or not _is_name_query(query):
+        return []
+    if backend == 'trgm':
+        text = ' '.join(terms)
+        sql = f'SELECT id FROM {CustomUser._meta.db_table} WHERE lower(name) %% %s'
+        params = [text]
+        if role:
+            sql += ' AND role = %s'
+            params.append(role)
+        sql += ' ORDER BY similarity(lower(name), %s) DESC LIMIT %s'
+        params += [text, limit + len(exclude)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [user_id for (user_id,) in cursor.fetchall() if user_id not in exclude][:limit]
+
+    # FTS5: swap each word that matches nothing for its closest vocabulary words
+    alternatives = []
+    for term in terms:
+        if len(term) < 3 or _prefix(term).exists():
+            alternatives.append([term])
+        else:
+            alternatives.append(_similar_words(term))
+    if any(not words for words in alternatives):
+        return []
+    ids = []
+    for combination in itertools.islice(itertools.product(*alternatives), FUZZY_COMBINATIONS):
+        if list(combination) == terms:
+            continue
+        for user_id in _ranked_user_ids(list(combination), role, limit + len(exclude)):
+            if user_id not in exclude and user_id not in ids:
+                ids.append(user_id)
+        if len(ids) >= limit:
+            break
+    return ids[:limit]
+
+
+# ---------------------------------------------------------------------------
+# Searching
+# ---------------------------------------------------------------------------
+
+def _matching_keys(terms):
+    """Search keys matching one term whose user also has keys matching the others."""
+    if len(terms) > 1:
+        # Drive the lookup from the rarest term; counting is capped so it stays an index probe
+        terms = sorted(terms, key=lambda term: _prefix(term).values('pk')[:SELECTIVITY_CAP].count())
+    keys = _prefix(terms[0])
+    for term in terms[1:]:
+        keys = keys.filter(Exists(_prefix(term).filter(user_id=OuterRef('user_id'))))
+    return keys
+
+
+def _ranked_user_ids(terms, role, limit):
+    """
+    Up to `limit` user ids in key order (exact words before longer ones).
+    The role is checked on each page of candidates by primary key rather
+    than filtered in SQL, which would let the database drive the query
+    from the role index.
+    """
+    ids = []
+    rows = _matching_keys(terms).order_by('key', 'user_id').values_list('user_id', flat=True)
+    # A user can match through several keys, so read a few extra rows
+    size = limit * 3
+    for offset in range(0, MAX_SCANNED_KEYS, size):
+        chunk = list(rows[offset:offset + size])
+        page = [user_id for user_id in dict.fromkeys(chunk) if user_id not in ids]
+        if role and page:
+            roles = dict(CustomUser.objects.filter(id__in=page).values_list('id', 'role'))
+            page = [user_id for user_id in page if roles.get(user_id) == role]
+        ids += page[:limit - len(ids)]
+        if len(ids) == limit or len(chunk) < size:
+            break
+    return ids
+
+
+def matching_user_ids(query):
+    """
+    Queryset of the ids of users matching every term of `query` by prefix,
+    or None when the query is too short to search.
+    """
+    terms = query_terms(query)
+    if not terms or sum(len(t) for t in terms) < MIN_QUERY_LENGTH:
+        return None
+    return _matching_keys(terms).values('user_id')
+
+
+def search_users(query, role=None, limit=10, fuzzy=True):
+    """
+    Users (with the given role, if any) matching `query`: prefix matches
+    first, then fuzzy name matches. At most `limit` users.
+    """
+    limit = max(1, min(limit, MAX_RESULTS))
+    terms = query_terms(query)
+    if not terms or sum(len(t) for t in terms) < MIN_QUERY_LENGTH:
+        return []
+    ids = _ranked_user_ids(terms, role, limit)
+    if fuzzy and len(ids) < limit:
+        ids += _fuzzy_user_ids(query, role, set(ids), limit - len(ids))
+    found = CustomUser.objects.in_bulk(ids)
+    return [found[user_id] for user_id in ids if user_id in found]
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.events import publish_on_commit
+
+from .models import CustomUser
+from .search import SEARCHED_FIELDS, index_users
+
+
+@receiver(post_save, sender=CustomUser)
+def refresh_search_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-index a saved user unless the save touched none of the searched fields (e.g. last_login)."""
+    if raw or (update_fields is not None and not SEARCHED_FIELDS & set(update_fields)):
+        return
+    index_users([instance])
+
+
+
+@receiver(post_save, sender=CustomUser)
+def publish_new_student(sender, instance, created, raw=False, **kwargs):
+    """Live dashboard delta for a registered student (roster imports publish per batch)."""
+    if created and not raw and instance.role == 'student':
+        publish_on_commit('student', delta={
+            'students': 1,
+            'paid_students': int(instance.payment_status),
+            'students_with_password': int(instance.password_set),
+        })
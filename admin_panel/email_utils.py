@@ -1,10 +1,24 @@
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bulk operations send their emails from here instead of inside the request.
+EMAIL_WORKERS = getattr(settings, 'EMAIL_QUEUE_WORKERS', 2)
+_email_executor = ThreadPoolExecutor(max_workers=EMAIL_WORKERS, thread_name_prefix='email')
+
+
+def queue_email(send_func, *args):
+    """
+    Send an email in the background. `send_func` is one of the send_*
+    functions below; they log their own failures. Returns a Future whose
+    result is what `send_func` returned (True once the email is sent).
+    """
+    return _email_executor.submit(send_func, *args)
+
 
 def send_password_email(student_email, student_name, phone, password):
     """
@@ -146,3 +160,30 @@ Tansam E-Learning Team
     except Exception as e:
         logger.error(f"Failed to send password reset email to {student_email}: {str(e)}")
         return False
+
+
+def send_welcome_email(student_email, student_name):
+    """
+    Send the welcome email to a student whose payment has been recorded.
+    
+    Args:
+        student_email: Email address of the student
+        student_name: Full name of the student
+    
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    try:
+        send_mail(
+            subject='Welcome to Our E-Learning Portal!',
+            message=f'Hi {student_name},\n\nYour account is ready. Login with your phone number at our portal.',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[student_email],
+            fail_silently=False,
+        )
+        logger.info(f"Welcome email sent successfully to {student_email}")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Failed to send welcome email to {student_email}: {str(e)}")
+        return False
@@ -0,0 +1,271 @@
+"""
+Spreadsheet exports: gradebook, progress report, payments and exam results.
+
+Rows are read with values_list(...).iterator(chunk_size=CHUNK_SIZE), so
+neither the ORM nor this module ever holds more than a chunk of rows. CSV
+is written straight into a StreamingHttpResponse. XLSX cannot be streamed
+(the file is a ZIP whose directory is written last), so it goes through
+openpyxl's write-only mode into a temporary file, which also keeps memory
+flat. Large exports can run as a background job (core.jobs) that writes
+the file to EXPORT_DIR for download from the job page.
+"""
+import csv
+import datetime
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import FinalExamSubmission, Payment, Submission, TopicCompletion
+
+CHUNK_SIZE = 2000
+# Rows joined into one chunk of the streamed response.
+ROWS_PER_WRITE = 500
+EXPORT_DIR = getattr(settings, 'EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'tansam_exports'))
+# Finished export files are deleted after this many seconds.
+EXPORT_MAX_AGE = 60 * 60 * 24
+# Above this many rows an XLSX export is sent to a background job.
+XLSX_SYNC_LIMIT = 50000
+FORMATS = ('csv', 'xlsx')
+
+
+class ExportError(Exception):
+    """The export cannot be produced (e.g. XLSX support is missing)."""
+
+
+class Export:
+    """
+    One export: a model, its (header, lookup) columns and the request
+    parameters it can be filtered by (parameter name -> lookup).
+    """
+
+    def __init__(self, title, model, columns, filters, ordering=('id',)):
+        self.title = title
+        self.model = model
+        self.headers = [header for header, _ in columns]
+        self.lookups = [lookup for _, lookup in columns]
+        self.filters = filters
+        self.ordering = ordering
+
+    def queryset(self, params):
+        queryset = self.model.objects.order_by(*self.ordering)
+        for name, lookup in self.filters.items():
+            value = params.get(name)
+            if value and str(value).isdigit():
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    def rows(self, params):
+        return self.queryset(params).values_list(*self.lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+EXPORTS = {
+    'grades': Export(
+        'Gradebook',
+        Submission,
+        [
+            ('Submission ID', 'id'),
+            ('Course', 'assignment__course__title'),
+            ('Assignment', 'assignment__title'),
+            ('Student', 'student__name'),
+            ('Phone', 'student__phone'),
+            ('Email', 'student__email'),
+            ('Submitted At', 'submitted_at'),
+            ('Due Date', 'assignment__due_date'),
+            ('Grade', 'grade'),
+            ('Graded', 'reviewed'),
+            ('Graded By', 'graded_by__name'),
+            ('Graded At', 'graded_at'),
+            ('Feedback', 'feedback'),
+        ],
+        {'course': 'assignment__course_id', 'assignment': 'assignment_id'},
+    ),
+    'progress': Export(
+        'Progress Report',
+        TopicCompletion,
+        [
+            ('Student', 'progress__student__name'),
+            ('Phone', 'progress__student__phone'),
+            ('Course', 'progress__course__title'),
+            ('Course Progress %', 'progress__overall_progress'),
+            ('Final Exam Score', 'progress__final_exam_score'),
+            ('Final Exam Passed', 'progress__final_exam_passed'),
+            ('Certificate Issued At', 'progress__certificate_issued_at'),
+            ('Topic', 'topic__title'),
+            ('Topic Order', 'topic__order'),
+            ('Video Watched', 'video_watched'),
+            ('Watch Seconds', 'watch_seconds'),
+            ('MCQ Passed', 'mcq_passed'),
+            ('Assignment Submitted', 'assignment_submitted'),
+            ('Assignment Score', 'assignment_score'),
+            ('Topic Completed', 'completed'),
+            ('Video Watched At', 'video_watched_at'),
+            ('MCQ Passed At', 'mcq_passed_at'),
+            ('Assignment Submitted At', 'assignment_submitted_at'),
+        ],
+        {'course': 'progress__course_id'},
+        ordering=('progress_id', 'id'),
+    ),
+    'payments': Export(
+        'Payments',
+        Payment,
+        [
+            ('Payment ID', 'id'),
+            ('Student', 'student__name'),
+            ('Phone', 'student__phone'),
+            ('Email', 'student__email'),
+            ('Amount', 'amount'),
+            ('Transaction ID', 'transaction_id'),
+            ('Payment Date', 'payment_date'),
+            ('Student Marked Paid', 'student__payment_status'),
+        ],
+        {'student': 'student_id'},
+    ),
+    'exam_results': Export(
+        'Final Exam Results',
+        FinalExamSubmission,
+        [
+            ('Submission ID', 'id'),
+            ('Student', 'student__name'),
+            ('Phone', 'student__phone'),
+            ('Email', 'student__email'),
+            ('Course', 'course__title'),
+            ('Score', 'score'),
+            ('Passed', 'passed'),
+            ('Submitted At', 'submitted_at'),
+        ],
+        {'course': 'course_id'},
+    ),
+}
+
+
+def _text(value):
+    # Keep spreadsheet apps from running user-entered text as a formula
+    if value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if timezone.is_aware(value) else value
+    if isinstance(value, str):
+        return _text(value)
+    return value
+
+
+def xlsx_cell(value):
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime.datetime):
+        # Excel has no time zones: write local wall-clock time
+        return timezone.make_naive(value) if timezone.is_aware(value) else value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, str):
+        return _text(value)
+    return value
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(export, params):
+    """Yield the CSV export in chunks of ROWS_PER_WRITE rows."""
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    yield '\ufeff' + writer.writerow(export.headers)
+    lines = []
+    for row in export.rows(params):
+        lines.append(writer.writerow([csv_cell(v) for v in row]))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_csv(export, params, fileobj, progress=None):
+    """Write the CSV export to a text file. Returns the number of rows."""
+    writer = csv.writer(fileobj)
+    fileobj.write('\ufeff')
+    writer.writerow(export.headers)
+    count = 0
+    for count, row in enumerate(export.rows(params), start=1):
+        writer.writerow([csv_cell(v) for v in row])
+        if progress and count % 5000 == 0:
+            progress(count)
+    return count
+
+
+def write_xlsx(export, params, fileobj, progress=None):
+    """Write the XLSX export to a binary file in write-only mode. Returns the number of rows."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError('XLSX exports need the openpyxl package; choose CSV instead.')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(export.title[:31])
+    sheet.append(export.headers)
+    count = 0
+    for count, row in enumerate(export.rows(params), start=1):
+        sheet.append([xlsx_cell(v) for v in row])
+        if progress and count % 5000 == 0:
+            progress(count)
+    workbook.save(fileobj)
+    return count
+
+
+def export_filename(kind, fmt):
+    return f'{kind}-{timezone.localdate():%Y%m%d}.{fmt}'
+
+
+def export_path(name):
+    return os.path.join(EXPORT_DIR, os.path.basename(name))
+
+
+def remove_old_exports():
+    """Delete finished export files older than EXPORT_MAX_AGE."""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def run_export(job, kind, fmt, params):
+    """Background task: write an export file to EXPORT_DIR."""
+    export = EXPORTS[kind]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    total = export.queryset(params).count()
+    job.report(0, total=total, message=f'Writing {total} rows')
+    name = f'{kind}-{job.pk}.{fmt}'
+    path = export_path(name)
+
+    def progress(done):
+        job.report(min(done, total))
+
+    if fmt == 'xlsx':
+        with open(path, 'wb') as f:
+            rows = write_xlsx(export, params, f, progress)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            rows = write_csv(export, params, f, progress)
+    job.report(total, message=f'{rows} rows exported')
+    return {'rows': rows, 'file': name, 'filename': export_filename(kind, fmt)}
@@ -0,0 +1,130 @@
+"""
+Bulk grading of assignment submissions.
+
+Every grade change bumps Submission.version. The bulk grading page sends
+back, with each edited row, the version it was loaded at; a row is only
+written if its version is unchanged, so a grade another grader saved in
+the meantime comes back as a conflict (with the current values) instead of
+being silently overwritten. Rows whose posted values already match the
+database are skipped. The checked rows are locked, compared and written
+with one bulk_update inside a single transaction.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.models import Submission
+
+MAX_GRADE = Decimal('100')
+# Upper bound on rows per save, matching the largest admin page.
+MAX_ENTRIES = 200
+
+
+class GradeEntryError(ValueError):
+    """A posted grade entry is malformed."""
+
+
+def _grade(value):
+    if value in (None, ''):
+        return None
+    try:
+        grade = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise GradeEntryError(f"'{value}' is not a number.")
+    if not Decimal('0') <= grade <= MAX_GRADE:
+        raise GradeEntryError(f'Grades must be between 0 and {MAX_GRADE}.')
+    return grade
+
+
+def parse_entries(rows):
+    """
+    Validate posted rows ({id, version, grade, feedback}). Returns
+    ({id: entry}, [{id, message}]) with the malformed rows in the second list.
+    """
+    if not isinstance(rows, list):
+        raise GradeEntryError('Expected a list of grades.')
+    if len(rows) > MAX_ENTRIES:
+        raise GradeEntryError(f'At most {MAX_ENTRIES} grades can be saved at once.')
+    entries, errors = {}, []
+    for row in rows:
+        try:
+            submission_id, version = int(row['id']), int(row['version'])
+        except (KeyError, TypeError, ValueError):
+            raise GradeEntryError('Every grade needs a submission id and version.')
+        try:
+            entries[submission_id] = {
+                'version': version,
+                'grade': _grade(row.get('grade')),
+                'feedback': (row.get('feedback') or '').strip(),
+            }
+        except GradeEntryError as e:
+            errors.append({'id': submission_id, 'message': str(e)})
+    return entries, errors
+
+
+def _state(submission):
+    return {
+        'id': submission.id,
+        'version': submission.version,
+        'grade': None if submission.grade is None else str(submission.grade),
+        'feedback': submission.feedback or '',
+        'graded_by': submission.graded_by.name if submission.graded_by_id else None,
+    }
+
+
+def apply_grades(assignment, entries, grader):
+    """
+    Save {submission id: entry} for one assignment.
+    Returns {'saved': [states], 'conflicts': [states], 'missing': [ids]}.
+    """
+    saved, conflicts = [], []
+    with transaction.atomic():
+        current = {
+            s.id: s
+            for s in Submission.objects.select_for_update()
+            .select_related('graded_by')
+            .filter(assignment=assignment, id__in=list(entries))
+        }
+        now = timezone.now()
+        changed = []
+        for submission_id, entry in entries.items():
+            submission = current.get(submission_id)
+            if submission is None:
+                continue
+            if submission.grade == entry['grade'] and (submission.feedback or '') == entry['feedback']:
+                continue
+            if submission.version != entry['version']:
+                conflicts.append(_state(submission))
+                continue
+            submission.grade = entry['grade']
+            submission.feedback = entry['feedback']
+            submission.reviewed = entry['grade'] is not None
+            submission.version += 1
+            submission.graded_by = grader
+            submission.graded_at = now
+            changed.append(submission)
+        if changed:
+            Submission.objects.bulk_update(
+                changed, ['grade', 'feedback', 'reviewed', 'version', 'graded_by', 'graded_at']
+            )
+            saved = [_state(s) for s in changed]
+    return {
+        'saved': saved,
+        'conflicts': conflicts,
+        'missing': [i for i in entries if i not in current],
+    }
+
+
+def grading_progress(assignment):
+    """How many of an assignment's submissions are graded."""
+    counts = Submission.objects.filter(assignment=assignment).aggregate(
+        total=Count('id'), graded=Count('id', filter=Q(reviewed=True))
+    )
+    total = counts['total']
+    return {
+        'graded': counts['graded'],
+        'total': total,
+        'percent': round(counts['graded'] * 100 / total) if total else 0,
+    }
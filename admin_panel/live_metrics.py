@@ -0,0 +1,169 @@
+"""
+Live admin dashboard metrics over Server-Sent Events.
+
+The dashboard counters come from one shared snapshot: metrics_snapshot()
+keeps the last computed figures in the cache and recomputes them at most
+once every METRICS_INTERVAL seconds, however many admins reload the page or
+hold a live connection. Between snapshots, each connection forwards the
+deltas published on the in-process event bus (core.events) as payments,
+topic completions, submissions and registrations are committed.
+
+Under an ASGI server (elearning.asgi, e.g. `uvicorn elearning.asgi:application`)
+the stream is the async generator metrics_stream(), so an idle connection
+is just a coroutine waiting on its queue rather than a worker thread; the
+database work runs through sync_to_async. WSGI servers cannot send an
+async iterator until it is exhausted, so there metrics_stream_sync() is
+used instead, and each open dashboard occupies a worker thread.
+Connections close after STREAM_MAX_AGE seconds and EventSource reconnects
+on its own, which re-checks the admin's session.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from accounts.models import CustomUser
+from core import events
+from core.models import Course, Payment, Submission, Topic, TopicCompletion
+
+METRICS_INTERVAL = getattr(settings, 'LIVE_METRICS_INTERVAL', 15)
+STREAM_MAX_AGE = 5 * 60
+# Browsers wait this long (ms) before reconnecting a dropped stream
+RECONNECT_DELAY = 3000
+SNAPSHOT_KEY = 'live_metrics:snapshot'
+RECOMPUTE_GATE_KEY = 'live_metrics:recompute'
+
+
+def compute_metrics():
+    """Run the dashboard's aggregate queries."""
+    computed_at = time.time()
+    students = CustomUser.objects.filter(role='student').aggregate(
+        students=Count('id'),
+        paid_students=Count('id', filter=Q(payment_status=True)),
+        students_with_password=Count('id', filter=Q(password_set=True)),
+    )
+    completions = TopicCompletion.objects.aggregate(
+        completions=Count('id'),
+        completed_completions=Count('id', filter=Q(completed=True)),
+    )
+    payments = Payment.objects.aggregate(payments=Count('id'), revenue=Sum('amount'))
+    return {
+        'computed_at': computed_at,
+        'courses': Course.objects.count(),
+        'topics': Topic.objects.count(),
+        **students,
+        **completions,
+        'payments': payments['payments'],
+        'revenue': float(payments['revenue'] or 0),
+        'submissions': Submission.objects.count(),
+    }
+
+
+def metrics_snapshot():
+    """The shared dashboard figures, recomputed at most once per METRICS_INTERVAL."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    stale = snapshot is None or time.time() - snapshot['computed_at'] >= METRICS_INTERVAL
+    # Only the caller that wins the gate recomputes; the rest keep the last figures
+    if snapshot is None or (stale and cache.add(RECOMPUTE_GATE_KEY, True, METRICS_INTERVAL)):
+        snapshot = compute_metrics()
+        cache.set(SNAPSHOT_KEY, snapshot, None)
+    return snapshot
+
+
+def completion_percentage(metrics):
+    total = metrics['completions']
+    return int(metrics['completed_completions'] / total * 100) if total > 0 else 0
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def _figures(snapshot):
+    return {name: value for name, value in snapshot.items() if name != 'computed_at'}
+
+
+def _merge(batch, since):
+    """Sum the deltas of a batch of events, leaving out those the snapshot already counts."""
+    delta = {}
+    for event in batch:
+        if event['at'] < since:
+            continue
+        for name, value in event.get('delta', {}).items():
+            delta[name] = delta.get(name, 0) + value
+    return delta
+
+
+class _Stream:
+    """What to send for each batch of events and at each refresh; shared by both stream flavours."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        # Deltas sent since the last snapshot; a new snapshot settles any drift
+        self.drift = False
+
+    def start(self):
+        return f'retry: {RECONNECT_DELAY}\n' + _sse('snapshot', self.snapshot)
+
+    def events(self, batch):
+        delta = _merge(batch, self.snapshot['computed_at'])
+        if not delta:
+            return None
+        self.drift = True
+        return _sse('delta', delta)
+
+    def refresh(self, latest):
+        changed = self.drift or _figures(latest) != _figures(self.snapshot)
+        self.snapshot = latest
+        if changed:
+            self.drift = False
+            return _sse('snapshot', latest)
+        # Comment line: keeps proxies from closing the idle connection
+        return ': keepalive\n\n'
+
+
+async def metrics_stream():
+    """Yield a snapshot, then deltas as they happen and a fresh snapshot every interval."""
+    loop = asyncio.get_running_loop()
+    subscription = events.subscribe()
+    try:
+        stream = _Stream(await sync_to_async(metrics_snapshot)())
+        yield stream.start()
+        closes_at = loop.time() + STREAM_MAX_AGE
+        refresh_at = loop.time() + METRICS_INTERVAL
+        while loop.time() < closes_at:
+            chunk = stream.events(await subscription.next_batch(max(refresh_at - loop.time(), 0)))
+            if chunk:
+                yield chunk
+            if loop.time() >= refresh_at:
+                refresh_at = loop.time() + METRICS_INTERVAL
+                yield stream.refresh(await sync_to_async(metrics_snapshot)())
+    finally:
+        events.unsubscribe(subscription)
+
+
+def metrics_stream_sync():
+    """
+    metrics_stream() for WSGI servers, which can only send a synchronous
+    iterator as it is produced. Each open dashboard holds a worker thread
+    until the stream closes after STREAM_MAX_AGE.
+    """
+    subscription = events.subscribe(threaded=True)
+    try:
+        stream = _Stream(metrics_snapshot())
+        yield stream.start()
+        closes_at = time.monotonic() + STREAM_MAX_AGE
+        refresh_at = time.monotonic() + METRICS_INTERVAL
+        while time.monotonic() < closes_at:
+            chunk = stream.events(subscription.next_batch(max(refresh_at - time.monotonic(), 0)))
+            if chunk:
+                yield chunk
+            if time.monotonic() >= refresh_at:
+                refresh_at = time.monotonic() + METRICS_INTERVAL
+                yield stream.refresh(metrics_snapshot())
+    finally:
+        events.unsubscribe(subscription)
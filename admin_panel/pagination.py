@@ -0,0 +1,166 @@
+"""
+Keyset (seek) pagination for the admin list pages.
+
+Offset pagination makes the database walk past every skipped row, so a
+deep page of a large table costs as much as reading all the rows before
+it. Here a page is addressed by the row it starts after instead: the cursor
+carries that row's (sort key, ..., id) values and the page is
+
+    WHERE key >= v AND (key > v OR (key = v AND id > i))
+    ORDER BY key, id LIMIT n
+
+which, with an index on (filter columns, key, id), is an index range scan
+at any depth. Pages get next/previous links rather than page numbers.
+
+Totals shown above a list still have to count every matching row, so they
+are computed apart from the page with list_counts() and cached for
+COUNT_CACHE_TTL seconds per filter combination.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+COUNT_CACHE_TTL = 60
+
+
+class KeysetPage:
+    """One page of rows plus the querystrings of its neighbours."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.next_url = self._url(params, 'after', next_cursor)
+        self.previous_url = self._url(params, 'before', previous_cursor)
+
+    @staticmethod
+    def _url(params, name, cursor):
+        if cursor is None:
+            return None
+        params = params.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[name] = cursor
+        return f'?{params.urlencode()}'
+
+    @property
+    def has_next(self):
+        return self.next_url is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_url is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds times to milliseconds; a cursor must keep microseconds.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _encode(values):
+    raw = json.dumps(values, cls=_CursorEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(token, fields):
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    values = json.loads(raw)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError('Malformed cursor')
+    return [field.to_python(value) for field, value in zip(fields, values)]
+
+
+def _seek(keys, values, forward):
+    """Rows strictly after `values` in (keys) order; before them if not `forward`."""
+    (name, descending), value = keys[0], values[0]
+    upwards = descending != forward
+    strict = Q(**{f"{name}__{'gt' if upwards else 'lt'}": value})
+    if len(keys) == 1:
+        return strict
+    return strict | (Q(**{name: value}) & _seek(keys[1:], values[1:], forward))
+
+
+def keyset_page(request, queryset, ordering, per_page=PER_PAGE):
+    """
+    Page through `queryset` sorted by `ordering` (field attnames, '-' for
+    descending), using the `after` / `before` cursors in request.GET. The
+    primary key is added as the final tie-breaker if not already present.
+    An invalid cursor falls back to the first page.
+    """
+    keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    if keys[-1][0] not in ('id', 'pk'):
+        keys.append(('id', keys[-1][1]))
+    opts = queryset.model._meta
+    fields = [opts.pk if name in ('id', 'pk') else opts.get_field(name) for name, _ in keys]
+
+    try:
+        per_page = max(1, min(int(request.GET.get('per_page', per_page)), MAX_PER_PAGE))
+    except (TypeError, ValueError):
+        pass
+
+    forward, cursor = True, None
+    token = request.GET.get('before') or request.GET.get('after')
+    if token:
+        try:
+            cursor = _decode(token, fields)
+            forward = not request.GET.get('before')
+        except (ValueError, TypeError, ValidationError, binascii.Error):
+            cursor = None
+
+    order_by = [f"{'-' if descending == forward else ''}{name}" for name, descending in keys]
+    if cursor is not None:
+        # The leading inclusive bound is what lets the database seek straight to the cursor.
+        (first, descending), value = keys[0], cursor[0]
+        bound = 'gte' if descending != forward else 'lte'
+        queryset = queryset.filter(Q(**{f'{first}__{bound}': value}) & _seek(keys, cursor, forward))
+    rows = list(queryset.order_by(*order_by)[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def cursor_of(row):
+        return _encode([getattr(row, field.attname) for field in fields])
+
+    has_next = more if forward else cursor is not None
+    has_previous = cursor is not None if forward else more
+    return KeysetPage(
+        rows,
+        cursor_of(rows[-1]) if rows and has_next else None,
+        cursor_of(rows[0]) if rows and has_previous else None,
+        request.GET,
+        per_page,
+    )
+
+
+def list_counts(name, filters, compute):
+    """
+    The totals of a list page: compute() for the `filters` in effect, reused
+    for COUNT_CACHE_TTL seconds so paging and reloading do not recount.
+    """
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+    return cache.get_or_set(f'list_counts:{name}:{digest}', compute, COUNT_CACHE_TTL)
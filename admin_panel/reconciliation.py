@@ -0,0 +1,203 @@
+"""
+Bulk payment reconciliation from a bank statement (CSV or XLSX).
+
+Columns (header row required, any order, case-insensitive):
+    transaction_id, amount    required
+    phone, email              identify the student; phone is tried first
+
+Rows are keyed on transaction_id, so importing the same statement twice
+changes nothing. Each batch of BATCH_SIZE rows is matched to students and
+to the payments already recorded with one query each. New transactions, and
+ones whose amount changed, are written with a single
+bulk_create(update_conflicts=True) upsert, which also absorbs a payment
+recorded by hand while the import runs. The students those payments belong
+to who were not yet marked as paid are flipped with one UPDATE and sent the
+welcome email through the email queue. bulk_create bypasses Payment.save()
+and the post_save handler, which would otherwise save the student and send
+the email inline for every row.
+"""
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from accounts.models import CustomUser
+from core.events import publish_on_commit
+from core.models import Payment
+
+from .email_utils import queue_email, send_welcome_email
+from .roster import _Report, count_rows, normalize_phone, read_roster
+
+BATCH_SIZE = 500
+REQUIRED_COLUMNS = ('transaction_id', 'amount')
+MAX_AMOUNT = Decimal('99999999.99')
+TRANSACTION_ID_LENGTH = Payment._meta.get_field('transaction_id').max_length
+
+
+class _ReconciliationReport(_Report):
+    def __init__(self):
+        # No passwords are handed out here
+        super().__init__(send_emails=False)
+        self.emails_queued = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.marked_paid = 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'marked_paid': self.marked_paid,
+            'skipped': self.skipped,
+            'emails_queued': self.emails_queued,
+            'errors': self.errors,
+        }
+
+
+def _amount(value):
+    try:
+        amount = Decimal(value.replace(',', '').lstrip('₹').strip()).quantize(Decimal('0.01'))
+        valid = Decimal('0') < amount <= MAX_AMOUNT
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'.")
+    if not valid:
+        raise ValueError(f'Amount must be greater than zero and at most {MAX_AMOUNT}.')
+    return amount
+
+
+def _clean(row):
+    """Validate one statement row. Returns (transaction_id, phone, email, amount)."""
+    transaction_id = row.get('transaction_id', '')
+    if not transaction_id:
+        raise ValueError('transaction_id is required.')
+    if len(transaction_id) > TRANSACTION_ID_LENGTH:
+        raise ValueError(f'transaction_id is longer than {TRANSACTION_ID_LENGTH} characters.')
+    if not row.get('amount'):
+        raise ValueError('amount is required.')
+    phone = normalize_phone(row['phone']) if row.get('phone') else ''
+    # Statements and sign-up forms disagree on case; match emails case-insensitively
+    email = CustomUser.objects.normalize_email(row.get('email', '')).lower()
+    if not phone and not email:
+        raise ValueError('A phone or email is needed to find the student.')
+    return transaction_id, phone, email, _amount(row['amount'])
+
+
+def _upsert(payments):
+    if connection.features.supports_update_conflicts_with_target:
+        Payment.objects.bulk_create(
+            payments, update_conflicts=True, unique_fields=['transaction_id'], update_fields=['amount']
+        )
+    else:
+        Payment.objects.bulk_create(payments, update_conflicts=True, update_fields=['amount'])
+
+
+def _reconcile_batch(batch, report, send_emails):
+    """Match, upsert and mark paid [(row number, cleaned values)]."""
+    phones = {phone for _, (_, phone, _, _) in batch if phone}
+    emails = {email for _, (_, _, email, _) in batch if email}
+    by_phone, by_email = {}, {}
+    for student_id, phone, email in CustomUser.objects.annotate(email_lower=Lower('email')).filter(
+        Q(phone__in=phones) | Q(email_lower__in=emails), role='student'
+    ).values_list('id', 'phone', 'email_lower'):
+        by_phone[phone] = student_id
+        by_email[email] = student_id
+
+    recorded = {
+        transaction_id: (student_id, amount)
+        for transaction_id, student_id, amount in Payment.objects.filter(
+            transaction_id__in=[values[0] for _, values in batch]
+        ).values_list('transaction_id', 'student_id', 'amount')
+    }
+
+    payments, paid = [], set()
+    # Live dashboard delta for this batch
+    new_payments, revenue = 0, Decimal('0')
+    for number, (transaction_id, phone, email, amount) in batch:
+        student_id = by_phone.get(phone) or by_email.get(email)
+        if student_id is None:
+            report.error(number, f'No student with phone {phone or "-"} or email {email or "-"}.')
+            continue
+        existing = recorded.get(transaction_id)
+        if existing is not None:
+            if existing[0] != student_id:
+                report.error(number, f'Transaction {transaction_id} is already recorded for another student.')
+                continue
+            if existing[1] == amount:
+                report.unchanged += 1
+                continue
+            report.updated += 1
+            revenue += amount - existing[1]
+        else:
+            report.created += 1
+            new_payments += 1
+            revenue += amount
+        payments.append(Payment(student_id=student_id, amount=amount, transaction_id=transaction_id))
+        paid.add(student_id)
+
+    with transaction.atomic():
+        if payments:
+            _upsert(payments)
+        newly_paid = list(
+            CustomUser.objects.select_for_update()
+            .filter(id__in=paid, payment_status=False)
+            .values_list('id', 'name', 'email')
+        )
+        if newly_paid:
+            CustomUser.objects.filter(id__in=[student_id for student_id, _, _ in newly_paid]).update(
+                payment_status=True
+            )
+        if payments:
+            publish_on_commit('payment', delta={
+                'payments': new_payments, 'revenue': float(revenue), 'paid_students': len(newly_paid),
+            })
+    report.marked_paid += len(newly_paid)
+
+    if send_emails:
+        for _, name, email in newly_paid:
+            queue_email(send_welcome_email, email, name)
+            report.emails_queued += 1
+
+
+def reconcile_payments(job, path, extension, send_emails=True):
+    """
+    Background task: reconcile the bank statement at `path`, then delete it.
+    Returns the report stored as the job result.
+    """
+    report = _ReconciliationReport()
+    try:
+        job.report(0, total=count_rows(path, extension), message='Reading statement')
+        seen = {}
+        batch = []
+        # Row 1 is the header, so data rows are numbered from 2
+        for number, row in enumerate(read_roster(path, extension, REQUIRED_COLUMNS), start=2):
+            if row is None:
+                continue
+            report.rows += 1
+            try:
+                values = _clean(row)
+            except ValueError as e:
+                report.error(number, str(e))
+                continue
+            if values[0] in seen:
+                report.error(number, f'Transaction {values[0]} already appears on row {seen[values[0]]}.')
+                continue
+            seen[values[0]] = number
+            batch.append((number, values))
+            if len(batch) >= BATCH_SIZE:
+                _reconcile_batch(batch, report, send_emails)
+                batch = []
+                job.report(number - 1, message=f'{report.created} payments recorded')
+        if batch:
+            _reconcile_batch(batch, report, send_emails)
+    finally:
+        os.remove(path)
+
+    job.report(
+        report.rows,
+        message=f'{report.created} new, {report.updated} updated, {report.unchanged} unchanged, {report.skipped} skipped',
+    )
+    return report.as_dict()
@@ -0,0 +1,372 @@
+"""
+Bulk student roster operations: import from CSV or XLSX, and password resets.
+
+Columns (header row required, any order, case-insensitive):
+    name, phone, email, class_level   required; class_level is 6-8 or 9-12
+    payment_status                    optional; yes/true/1/paid marks the student as paid
+
+The upload is saved to a temporary file and imported by a background job
+(core.jobs). Rows are read as a stream (openpyxl's read-only mode for
+XLSX) and checked against sets of the phones and emails already taken,
+loaded once, so duplicates are caught without a query per row. Valid rows
+are created in batches of BATCH_SIZE: the generated passwords are hashed
+in worker processes (accounts.passwords) and the users written with
+bulk_create. Credential emails are queued once a batch is saved, and the
+job waits for them before it finishes.
+
+reset_passwords() applies the same batching to existing students: new
+passwords are hashed in the process pool, written back with bulk_update and
+mailed through the email queue.
+
+A generated password that is not emailed (emails switched off) or whose
+email fails is listed in the job result, so the admin can pass it on
+instead of the student being locked out. These are the only plaintext
+passwords kept anywhere.
+"""
+import csv
+import os
+import re
+import tempfile
+
+from django.db import IntegrityError, transaction
+
+from accounts.models import CustomUser
+from accounts.passwords import ParallelHasher, generate_password
+from accounts.search import index_users
+from core.events import publish_on_commit
+
+from .email_utils import queue_email, send_password_email, send_password_reset_email
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = ('name', 'phone', 'email', 'class_level')
+ROSTER_FILE_TYPES = ('.csv', '.xlsx')
+TRUE_VALUES = ('1', 'yes', 'y', 'true', 'paid')
+
+PHONE_RE = re.compile(r'^\+?\d{7,14}$')
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+CLASS_LEVELS = {value for value, _ in CustomUser.CLASS_LEVELS}
+NAME_MAX_LENGTH = CustomUser._meta.get_field('name').max_length
+EMAIL_MAX_LENGTH = CustomUser._meta.get_field('email').max_length
+
+
+class RosterFormatError(ValueError):
+    """The file as a whole cannot be read (as opposed to a bad row)."""
+
+
+def _cell(value):
+    # Spreadsheets hand back phone numbers as floats (9876543210.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return '' if value is None else str(value).strip()
+
+
+def _header(names, required):
+    header = [_cell(name).lower().replace(' ', '_') for name in names]
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise RosterFormatError(f"Missing column(s): {', '.join(missing)}.")
+    return header
+
+
+def _csv_rows(path, required):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        try:
+            header = _header(next(reader, []), required)
+            for values in reader:
+                if any(v.strip() for v in values):
+                    yield dict(zip(header, (_cell(v) for v in values)))
+                else:
+                    yield None
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise RosterFormatError(f'Could not read the file: {e}')
+
+
+def _xlsx_rows(path, required):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RosterFormatError('Reading .xlsx files needs the openpyxl package; upload a CSV instead.')
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise RosterFormatError(f'Could not read the workbook: {e}')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()), required)
+        for values in rows:
+            if any(v not in (None, '') for v in values):
+                yield dict(zip(header, (_cell(v) for v in values)))
+            else:
+                yield None
+    finally:
+        workbook.close()
+
+
+def read_roster(path, extension, required=REQUIRED_COLUMNS):
+    """
+    Yield one dict per data row (None for blank rows), streaming the file.
+    The header must contain the `required` columns.
+    """
+    if extension == '.xlsx':
+        return _xlsx_rows(path, required)
+    return _csv_rows(path, required)
+
+
+def stage_upload(upload, required=REQUIRED_COLUMNS, prefix='roster-'):
+    """
+    Copy an uploaded roster (or other CSV/XLSX sheet) to a temporary file for
+    an import job and check its header row. Returns (path, extension);
+    raises RosterFormatError.
+    """
+    extension = os.path.splitext((upload.name or '').lower())[1]
+    if extension not in ROSTER_FILE_TYPES:
+        raise RosterFormatError('Upload a .csv or .xlsx file.')
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=extension)
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    rows = read_roster(path, extension, required)
+    try:
+        next(rows, None)
+    except RosterFormatError:
+        os.remove(path)
+        raise
+    finally:
+        rows.close()
+    return path, extension
+
+
+def count_rows(path, extension):
+    """Best-effort number of data rows, for the progress bar."""
+    if extension == '.csv':
+        with open(path, 'rb') as f:
+            return max(0, sum(1 for _ in f) - 1)
+    try:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return max(0, (workbook.active.max_row or 1) - 1)
+        finally:
+            workbook.close()
+    except Exception:
+        return 0
+
+
+def normalize_phone(value):
+    phone = re.sub(r'[\s\-().]', '', value)
+    if not PHONE_RE.match(phone):
+        raise ValueError(f"Invalid phone number '{value}'.")
+    return phone
+
+
+def _clean(row, phones, emails):
+    """Validate one row against the taken phones/emails. Returns CustomUser field values."""
+    for column in REQUIRED_COLUMNS:
+        if not row.get(column):
+            raise ValueError(f'{column} is required.')
+
+    phone = normalize_phone(row['phone'])
+    if phone in phones:
+        raise ValueError(f'Phone {phone} is already registered.')
+
+    email = CustomUser.objects.normalize_email(row['email'])
+    if not EMAIL_RE.match(email) or len(email) > EMAIL_MAX_LENGTH:
+        raise ValueError(f"Invalid email '{row['email']}'.")
+    if email.lower() in emails:
+        raise ValueError(f'Email {email} is already registered.')
+
+    class_level = row['class_level']
+    if class_level not in CLASS_LEVELS:
+        raise ValueError(f"class_level must be one of {', '.join(sorted(CLASS_LEVELS))}.")
+
+    name = row['name']
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f'name is longer than {NAME_MAX_LENGTH} characters.')
+
+    phones.add(phone)
+    emails.add(email.lower())
+    return {
+        'phone': phone,
+        'email': email,
+        'name': name,
+        'class_level': class_level,
+        'payment_status': row.get('payment_status', '').lower() in TRUE_VALUES,
+    }
+
+
+class _Credentials:
+    """New passwords on their way to students, by email or via the job result."""
+
+    def __init__(self, send_func, send_emails):
+        self.send_func = send_func
+        self.send_emails = send_emails
+        self.pending = []
+        self.sent = 0
+        self.unsent = []
+
+    def hand_out(self, name, phone, email, password):
+        credential = {'name': name, 'phone': phone, 'email': email, 'password': password}
+        if self.send_emails:
+            self.pending.append((queue_email(self.send_func, email, name, phone, password), credential))
+        else:
+            self.unsent.append(credential)
+
+    def wait(self):
+        """Wait for the queued emails; keep the passwords whose email failed."""
+        for future, credential in self.pending:
+            if future.result():
+                self.sent += 1
+            else:
+                self.unsent.append(credential)
+        self.pending = []
+
+    def as_dict(self):
+        return {'emails_sent': self.sent, 'unsent_passwords': self.unsent}
+
+
+class _Report:
+    def __init__(self, send_emails):
+        self.rows = 0
+        self.created = 0
+        self.skipped = 0
+        self.credentials = _Credentials(send_password_email, send_emails)
+        self.errors = []
+        self.stopped = ''
+
+    def error(self, row, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'message': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'skipped': self.skipped,
+            **self.credentials.as_dict(),
+            **({'stopped': self.stopped} if self.stopped else {}),
+            'errors': self.errors,
+        }
+
+
+def _save_batch(batch, hasher, report):
+    """Hash, insert and hand out the passwords for [(row number, values)]."""
+    passwords = [generate_password() for _ in batch]
+    hashes = hasher.hash(passwords)
+    users = [
+        CustomUser(role='student', password=hashed, password_set=True, **values)
+        for (_, values), hashed in zip(batch, hashes)
+    ]
+    try:
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users)
+            # bulk_create skips the post_save handlers that maintain the search
+            # keys and publish the live dashboard delta
+            index_users(users)
+            publish_on_commit('student', delta={'students': len(users), 'students_with_password': len(users)})
+        created = list(zip(batch, passwords))
+    except IntegrityError:
+        # Someone registered one of these meanwhile: fall back to row by row
+        created = []
+        for (number, values), user, password in zip(batch, users, passwords):
+            try:
+                with transaction.atomic():
+                    user.save()
+                created.append(((number, values), password))
+            except IntegrityError:
+                report.error(number, f"Phone {values['phone']} or email {values['email']} is already registered.")
+
+    report.created += len(created)
+    for (_, values), password in created:
+        report.credentials.hand_out(values['name'], values['phone'], values['email'], password)
+
+
+def import_roster(job, path, extension, send_emails=True):
+    """
+    Background task: import students from the file at `path`, then delete it.
+    Returns the report stored as the job result.
+    """
+    report = _Report(send_emails)
+    try:
+        job.report(0, total=count_rows(path, extension), message='Checking existing students')
+        phones = set(CustomUser.objects.values_list('phone', flat=True).iterator())
+        emails = {email.lower() for email in CustomUser.objects.values_list('email', flat=True).iterator()}
+
+        with ParallelHasher() as hasher:
+            batch = []
+            # Row 1 is the header, so data rows are numbered from 2
+            for number, row in enumerate(read_roster(path, extension), start=2):
+                if row is None:
+                    continue
+                report.rows += 1
+                try:
+                    batch.append((number, _clean(row, phones, emails)))
+                except ValueError as e:
+                    report.error(number, str(e))
+                if len(batch) >= BATCH_SIZE:
+                    _save_batch(batch, hasher, report)
+                    batch = []
+                    job.report(number - 1, message=f'{report.created} students created')
+            if batch:
+                _save_batch(batch, hasher, report)
+    except Exception as e:
+        if not report.created:
+            raise
+        # Finish with the students created so far so their passwords reach the result
+        report.stopped = str(e)
+    finally:
+        os.remove(path)
+
+    job.report(report.rows, message='Sending credential emails')
+    report.credentials.wait()
+    message = f'{report.created} students created, {report.skipped} skipped'
+    job.report(report.rows, message=f'Stopped: {message}' if report.stopped else message)
+    return report.as_dict()
+
+
+def _reset_batches(job, student_ids, report, credentials):
+    """Reset the passwords a batch at a time, handing each new one to `credentials`."""
+    with ParallelHasher() as hasher:
+        for start in range(0, len(student_ids), BATCH_SIZE):
+            chunk = student_ids[start:start + BATCH_SIZE]
+            students = list(
+                CustomUser.objects.filter(id__in=chunk, role='student').only('id', 'name', 'phone', 'email')
+            )
+            # Students deleted since the reset was started are skipped
+            report['missing'] += len(chunk) - len(students)
+            passwords = [generate_password() for _ in students]
+            for student, hashed in zip(students, hasher.hash(passwords)):
+                student.password = hashed
+                student.password_set = True
+            with transaction.atomic():
+                CustomUser.objects.bulk_update(students, ['password', 'password_set'])
+            report['reset'] += len(students)
+
+            for student, password in zip(students, passwords):
+                credentials.hand_out(student.name, student.phone, student.email, password)
+            job.report(start + len(chunk), message=f"{report['reset']} passwords reset")
+
+
+def reset_passwords(job, student_ids, send_emails=True):
+    """
+    Background task: give each student in `student_ids` a new password and
+    (optionally) email it. Returns the report stored as the job result.
+    """
+    report = {'students': len(student_ids), 'reset': 0, 'missing': 0}
+    credentials = _Credentials(send_password_reset_email, send_emails)
+    job.report(0, total=len(student_ids), message='Resetting passwords')
+    try:
+        _reset_batches(job, student_ids, report, credentials)
+    except Exception as e:
+        if not report['reset']:
+            raise
+        # Finish with the passwords already changed so they reach the result
+        report['stopped'] = str(e)
+
+    job.report(len(student_ids), message='Sending password emails')
+    credentials.wait()
+    message = f"{report['reset']} passwords reset"
+    job.report(len(student_ids), message=f'Stopped: {message}' if report.get('stopped') else message)
+    return {**report, **credentials.as_dict()}
@@ -4,11 +4,14 @@ from . import views
 urlpatterns = [
     path('login/', views.admin_login_view, name='admin_login'),
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/stream/', views.admin_dashboard_stream, name='admin_dashboard_stream'),
     path('logout/', views.admin_logout_view, name='admin_logout'),
     
     # Students Management
     path('students/', views.manage_students, name='manage_students'),
     path('students/add/', views.add_student, name='add_student'),
+    path('students/import/', views.import_students, name='import_students'),
+    path('students/reset-passwords/', views.bulk_reset_passwords, name='bulk_reset_passwords'),
     path('students/<int:student_id>/performance/', views.student_performance, name='student_performance'),
     
     # Courses Management
@@ -16,14 +19,23 @@ urlpatterns = [
     path('courses/add/', views.add_course, name='add_course'),
     path('courses/<int:course_id>/edit/', views.edit_course, name='edit_course'),
     path('courses/<int:course_id>/delete/', views.delete_course, name='delete_course'),
+    path('courses/<int:course_id>/analytics/', views.course_watch_analytics, name='course_watch_analytics'),
     
     # Topics Management
     path('topics/', views.manage_topics, name='manage_topics'),
     path('topics/add/', views.add_topic, name='add_topic'),
     path('topics/<int:topic_id>/edit/', views.edit_topic, name='edit_topic'),
     path('topics/<int:topic_id>/delete/', views.delete_topic, name='delete_topic'),
+    path('courses/<int:course_id>/topics/reorder/', views.reorder_topics_page, name='reorder_topics'),
     # Ajax endpoints
     path('api/topics/', views.api_topics, name='api_topics'),
+    path('api/courses/<int:course_id>/topics/order/', views.api_reorder_topics, name='api_reorder_topics'),
+    path('api/uploads/', views.api_upload_start, name='api_upload_start'),
+    path('api/uploads/<uuid:upload_id>/', views.api_upload_status, name='api_upload_status'),
+    path('api/uploads/<uuid:upload_id>/chunk/', views.api_upload_chunk, name='api_upload_chunk'),
+    path('api/uploads/<uuid:upload_id>/complete/', views.api_upload_complete, name='api_upload_complete'),
+    path('api/jobs/<int:job_id>/', views.api_job_status, name='api_job_status'),
+    path('api/students/search/', views.api_search_students, name='api_search_students'),
     
     # Assignments Management
     path('assignments/', views.manage_assignments, name='manage_assignments'),
@@ -34,16 +46,28 @@ urlpatterns = [
     # Submissions & Grading
     path('submissions/', views.manage_submissions, name='manage_submissions'),
     path('submissions/<int:submission_id>/grade/', views.grade_submission, name='grade_submission'),
+    path('assignments/<int:assignment_id>/grade/', views.bulk_grade_submissions, name='bulk_grade_submissions'),
+    path('api/assignments/<int:assignment_id>/grades/', views.api_bulk_grade, name='api_bulk_grade'),
     
     # MCQ Questions Management
     path('mcqs/', views.manage_mcqs, name='manage_mcqs'),
     path('mcqs/add/', views.add_mcq, name='add_mcq'),
     path('mcqs/<int:mcq_id>/edit/', views.edit_mcq, name='edit_mcq'),
     path('mcqs/<int:mcq_id>/delete/', views.delete_mcq, name='delete_mcq'),
+    path('questions/import/', views.import_questions_view, name='import_questions'),
+    
+    # Background Jobs
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    
+    # Exports
+    path('exports/', views.exports_page, name='exports'),
+    path('exports/jobs/<int:job_id>/download/', views.download_export, name='download_export'),
+    path('exports/<str:kind>/', views.export_data, name='export_data'),
     
     # Payments Management
     path('payments/', views.manage_payments, name='manage_payments'),
     path('payments/add/', views.add_payment, name='add_payment'),
+    path('payments/import/', views.import_payments, name='import_payments'),
     path('payments/<int:payment_id>/edit/', views.edit_payment, name='edit_payment'),
     path('payments/<int:payment_id>/delete/', views.delete_payment, name='delete_payment'),
     
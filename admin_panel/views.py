@@ -3,16 +3,46 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.urls import reverse
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST, require_GET
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 from core.models import (
     Course, Topic, Assignment, Submission, Payment, MCQQuestion,
-    FinalExam, FinalExamQuestion, FinalExamSubmission, Progress, TopicCompletion
+    FinalExam, FinalExamQuestion, FinalExamSubmission, Progress, TopicCompletion,
+    UploadSession, BackgroundJob
 )
+from core.uploads import UploadError, start_upload, write_chunk, complete_upload, completed_upload
+from core.attempts import student_history, topic_pass_rates
+from core.item_analysis import exam_item_analysis
+from core.question_import import ImportFormatError, import_questions
+from core.dedup import find_similar
+from core.deletion import purge
+from core.jobs import job_status, live_job, start_job
+from core.topic_order import (
+    TopicOrderError, compact_topic_order, place_topic, recompute_progress, reorder_topics,
+)
+from core.watch import SEGMENT_SECONDS, UNKNOWN_LENGTH_WATCHED_SECONDS
+from core.watch_analytics import course_retention
 from accounts.models import CustomUser
+from accounts.search import search_users
 from .email_utils import send_password_email, send_password_reset_email
+from .exports import (
+    EXPORTS, FORMATS, XLSX_SYNC_LIMIT, ExportError, export_filename, export_path, remove_old_exports,
+    run_export, stream_csv, write_xlsx
+)
+from .live_metrics import completion_percentage, metrics_snapshot, metrics_stream, metrics_stream_sync
+from .grading import GradeEntryError, _grade, apply_grades, grading_progress, parse_entries
+from .pagination import keyset_page, list_counts
+from .reconciliation import REQUIRED_COLUMNS as STATEMENT_COLUMNS, reconcile_payments
+from .roster import RosterFormatError, import_roster, reset_passwords, stage_upload
+import json
 import logging
+import os
+import tempfile
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -56,12 +86,9 @@ def admin_login_view(request):
 @user_passes_test(is_admin, login_url='admin_login')
 def admin_dashboard(request):
     """Main admin dashboard with student performance overview."""
-    courses_count = Course.objects.count()
-    topics_count = Topic.objects.count()
+    # Shared with the live stream and recomputed at most once per interval
+    metrics = metrics_snapshot()
     students = CustomUser.objects.filter(role='student')
-    students_count = students.count()
-    paid_students_count = students.filter(payment_status=True).count()
-    students_with_password = students.filter(password_set=True).count()
     
     # Get top performing students
     top_students = students.order_by('-progress')[:5]
@@ -69,15 +96,6 @@ def admin_dashboard(request):
     # Add completion count for each student
     student_performance = []
     from core.models import TopicCompletion
-    # Overall completion stats across all topic completions (for charts)
-    try:
-        overall_total_completions = TopicCompletion.objects.count()
-        overall_completed_completions = TopicCompletion.objects.filter(completed=True).count()
-        overall_completion_percentage = int((overall_completed_completions / overall_total_completions * 100) if overall_total_completions > 0 else 0)
-    except Exception:
-        overall_total_completions = 0
-        overall_completed_completions = 0
-        overall_completion_percentage = 0
     for student in top_students:
         completed_count = TopicCompletion.objects.filter(
             progress__student=student,
@@ -90,21 +108,41 @@ def admin_dashboard(request):
         })
     
     context = {
-        'courses_count': courses_count,
-        'topics_count': topics_count,
-        'students_count': students_count,
-        'paid_students_count': paid_students_count,
-        'students_with_password': students_with_password,
+        'courses_count': metrics['courses'],
+        'topics_count': metrics['topics'],
+        'students_count': metrics['students'],
+        'paid_students_count': metrics['paid_students'],
+        'students_with_password': metrics['students_with_password'],
+        'payments_count': metrics['payments'],
+        'submissions_count': metrics['submissions'],
         'student_performance': student_performance,
         'all_students': students,
-        'overall_total_completions': overall_total_completions,
-        'overall_completed_completions': overall_completed_completions,
-        'overall_completion_percentage': overall_completion_percentage,
+        'overall_total_completions': metrics['completions'],
+        'overall_completed_completions': metrics['completed_completions'],
+        'overall_completion_percentage': completion_percentage(metrics),
     }
     
     return render(request, 'admin_dashboard.html', context)
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+async def admin_dashboard_stream(request):
+    """SSE endpoint: live dashboard counters.
+
+    Sends a `snapshot` event with every counter, then `delta` events adding
+    to them as payments, completions, submissions and students come in, and
+    a fresh snapshot every LIVE_METRICS_INTERVAL seconds.
+    """
+    # WSGI would collect an async stream into a list before sending any of it
+    stream = metrics_stream() if isinstance(request, ASGIRequest) else metrics_stream_sync()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def manage_students(request):
@@ -143,9 +181,11 @@ def manage_students(request):
                     messages.warning(request, f'Password reset but email delivery failed. New password: {new_password}')
             
             elif action == 'delete_student':
-                student_name = student.name
-                student.delete()
-                messages.success(request, f'Student {student_name} has been deleted.')
+                # Locked out at once; their submissions, progress and files go in the background
+                CustomUser.objects.filter(pk=student.pk).update(is_active=False)
+                job = start_job('student_delete', request.user, purge, CustomUser, [student.pk], f'student {student.name}')
+                messages.success(request, f'Deleting student {student.name} in the background.')
+                return redirect('job_detail', job_id=job.id)
         
         except CustomUser.DoesNotExist:
             messages.error(request, 'Student not found.')
@@ -155,10 +195,58 @@ def manage_students(request):
         
         return redirect('manage_students')
     
-    context = {'students': students}
+    class_level = request.GET.get('class_level')
+    payment_filter = request.GET.get('payment')
+    if class_level:
+        students = students.filter(class_level=class_level)
+    if payment_filter in ('paid', 'unpaid'):
+        students = students.filter(payment_status=payment_filter == 'paid')
+    
+    page = keyset_page(request, students, ['name'])
+    context = {
+        'students': page,
+        'page': page,
+        'class_levels': CustomUser.CLASS_LEVELS,
+        'selected_class_level': class_level,
+        'payment_filter': payment_filter,
+    }
     return render(request, 'manage_students.html', context)
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def bulk_reset_passwords(request):
+    """Reset passwords for the selected students, or all matching the filters, in a background job."""
+    students = CustomUser.objects.filter(role='student')
+    selected = [value for value in request.POST.getlist('student_ids') if value.isdigit()]
+    if selected:
+        students = students.filter(id__in=selected)
+    else:
+        class_level = request.POST.get('class_level')
+        payment_status = request.POST.get('payment_status')
+        if class_level:
+            students = students.filter(class_level=class_level)
+        if payment_status in ('paid', 'unpaid'):
+            students = students.filter(payment_status=payment_status == 'paid')
+
+    student_ids = list(students.order_by('id').values_list('id', flat=True))
+    if not student_ids:
+        messages.warning(request, 'No students match the selection.')
+        return redirect('manage_students')
+
+    send_emails = request.POST.get('send_emails') == 'on'
+    try:
+        job = start_job('password_reset', request.user, reset_passwords, student_ids,
+                        send_emails=send_emails, total=len(student_ids))
+    except Exception as e:
+        logger.error(f"Error starting bulk password reset: {str(e)}")
+        messages.error(request, f'Error: {str(e)}')
+        return redirect('manage_students')
+    messages.success(request, f'Resetting passwords for {len(student_ids)} students in the background.')
+    return redirect('job_detail', job_id=job.id)
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def add_student(request):
@@ -208,11 +296,65 @@ def add_student(request):
     return render(request, 'add_student.html', context)
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def import_students(request):
+    """Bulk import students from a CSV/XLSX roster in a background job."""
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        send_emails = request.POST.get('send_emails') == 'on'
+        if not upload:
+            messages.error(request, 'Choose a roster file to import.')
+        else:
+            try:
+                path, extension = stage_upload(upload)
+                job = start_job('student_import', request.user, import_roster, path, extension, send_emails=send_emails)
+                messages.success(request, f'Importing {upload.name} in the background.')
+                return redirect('job_detail', job_id=job.id)
+            except RosterFormatError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                logger.error(f"Error starting roster import: {str(e)}")
+                messages.error(request, f'Error: {str(e)}')
+
+    context = {
+        'class_levels': CustomUser.CLASS_LEVELS,
+        'recent_jobs': BackgroundJob.objects.filter(kind='student_import')[:10],
+    }
+    return render(request, 'admin/import_students.html', context)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_GET
+def api_search_students(request):
+    """AJAX endpoint: students matching a name, phone or email prefix (typeahead)."""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    students = search_users(request.GET.get('q', ''), role='student', limit=limit)
+    return JsonResponse({
+        'results': [
+            {
+                'id': student.id,
+                'name': student.name,
+                'phone': student.phone,
+                'email': student.email,
+                'class_level': student.class_level,
+                'payment_status': student.payment_status,
+                'url': reverse('student_performance', args=[student.id]),
+            }
+            for student in students
+        ]
+    })
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def manage_courses(request):
-    """View and manage all courses."""
-    courses = Course.objects.all().order_by('title')
+    """View and manage all courses, including those still being deleted."""
+    courses = Course.all_objects.all().order_by('title')
     context = {'courses': courses}
     return render(request, 'manage_courses.html', context)
 
@@ -264,20 +406,55 @@ def edit_course(request, course_id):
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def delete_course(request, course_id):
-    """Delete a course."""
-    course = get_object_or_404(Course, id=course_id)
-    course_title = course.title
-    
+    """Delete a course and everything in it, in a background job."""
+    course = get_object_or_404(Course.all_objects, id=course_id)
+
+    # Hidden from students and admin pages at once; only the request that hides it starts the purge
+    hidden = Course.all_objects.filter(pk=course.pk, is_active=True).update(is_active=False)
+    target = f'course:{course.pk}'
+    running = None if hidden else live_job('course_delete', target)
+    if running:
+        messages.warning(request, f'Course "{course.title}" is already being deleted.')
+        return redirect('job_detail', job_id=running.id)
+
     try:
-        course.delete()
-        messages.success(request, f'Course "{course_title}" deleted successfully!')
+        job = start_job(
+            'course_delete', request.user, purge, Course, [course.pk], f'course "{course.title}"', target=target
+        )
+        messages.success(request, f'Deleting course "{course.title}" in the background.')
+        return redirect('job_detail', job_id=job.id)
     except Exception as e:
         logger.error(f"Error deleting course: {str(e)}")
         messages.error(request, f'Error: {str(e)}')
+        if hidden:
+            Course.all_objects.filter(pk=course.pk).update(is_active=True)
     
     return redirect('manage_courses')
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def course_watch_analytics(request, course_id):
+    """Video retention curves and drop-off points for each topic of a course."""
+    course = get_object_or_404(Course, id=course_id)
+    topics = course_retention(course)
+    pass_rates = {row['topic_id']: row for row in topic_pass_rates(course)}
+
+    # Downsample each curve to at most 100 points for the SVG chart
+    for topic in topics:
+        retention = topic['retention']
+        step = max(1, len(retention) // 100)
+        sampled = retention[::step]
+        last = max(len(sampled) - 1, 1)
+        topic['chart_points'] = ' '.join(
+            f"{i * 100 / last:.1f},{100 - value:.1f}" for i, value in enumerate(sampled)
+        )
+        topic['quiz'] = pass_rates.get(topic['topic_id'])
+
+    context = {'course': course, 'topics': topics, 'segment_seconds': SEGMENT_SECONDS}
+    return render(request, 'admin/watch_analytics.html', context)
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def student_performance(request, student_id):
@@ -332,6 +509,7 @@ def student_performance(request, student_id):
         'completion_percentage': completion_percentage,
         'courses_stats': list(courses_stats.values()),
         'completions': completions,
+        'quiz_attempts': student_history(student)[:20],
     }
     
     return render(request, 'student_performance.html', context)
@@ -354,13 +532,14 @@ def admin_logout_view(request):
 def manage_topics(request):
     """View and manage all topics."""
     course_id = request.GET.get('course')
+    topics = Topic.objects.select_related('course')
     if course_id:
-        topics = Topic.objects.filter(course_id=course_id).order_by('order')
+        page = keyset_page(request, topics.filter(course_id=course_id), ['order'])
     else:
-        topics = Topic.objects.all().order_by('course__title', 'order')
+        page = keyset_page(request, topics, ['course_id', 'order'])
     
     courses = Course.objects.all()
-    context = {'topics': topics, 'courses': courses, 'selected_course': course_id}
+    context = {'topics': page, 'page': page, 'courses': courses, 'selected_course': course_id}
     return render(request, 'admin/manage_topics.html', context)
 
 
@@ -385,6 +564,63 @@ def api_topics(request):
         return JsonResponse({'error': 'internal server error'}, status=500)
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def reorder_topics_page(request, course_id):
+    """Drag-and-drop ordering of all of a course's topics."""
+    course = get_object_or_404(Course, id=course_id)
+    topics = Topic.objects.filter(course=course).order_by('order', 'id').only('id', 'title', 'order')
+    context = {'course': course, 'topics': topics}
+    return render(request, 'admin/reorder_topics.html', context)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def api_reorder_topics(request, course_id):
+    """AJAX endpoint: set the order of a course's topics.
+
+    Body: {"topic_ids": [...]} listing every topic of the course exactly once.
+    Returns: JSON {moved, job_url} where job_url tracks the progress recompute.
+    """
+    course = get_object_or_404(Course, id=course_id)
+    try:
+        data = json.loads(request.body or b'{}')
+        moved = reorder_topics(course, data.get('topic_ids'))
+    except (ValueError, AttributeError) as e:
+        message = str(e) if isinstance(e, TopicOrderError) else 'invalid JSON'
+        return JsonResponse({'error': message}, status=400)
+    except Exception as e:
+        logger.error(f"Error reordering topics of course {course_id}: {str(e)}")
+        return JsonResponse({'error': 'could not save the order'}, status=500)
+
+    job_url = None
+    if moved:
+        job = start_job('progress_recompute', request.user, recompute_progress, course.id)
+        job_url = reverse('job_detail', args=[job.id])
+    return JsonResponse({'moved': moved, 'job_url': job_url})
+
+
+def _video_duration(value):
+    """Video length in whole seconds from the topic form; blank means read it from the file."""
+    if not value:
+        return None
+    seconds = int(value)
+    if seconds < 1:
+        raise ValueError('Video length must be at least 1 second.')
+    return seconds
+
+
+def _warn_unknown_duration(request, topic):
+    if topic.video_file and not topic.video_duration:
+        messages.warning(
+            request,
+            f'The length of the video for "{topic.title}" could not be read. '
+            f'Until you enter it on the topic, students complete the video after '
+            f'{UNKNOWN_LENGTH_WATCHED_SECONDS} seconds of watching.'
+        )
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def add_topic(request):
@@ -404,17 +640,32 @@ def add_topic(request):
         ppt_file = request.FILES.get('ppt_file')
         poster_image = request.FILES.get('poster_image')
         
+        # Large files arrive beforehand through the chunked upload API
+        video_upload = completed_upload(request.user, 'video_file', request.POST.get('video_upload_id'))
+        ppt_upload = completed_upload(request.user, 'ppt_file', request.POST.get('ppt_upload_id'))
+
         try:
             course = Course.objects.get(id=course_id)
-            topic = Topic.objects.create(
-                course=course,
-                title=title,
-                order=int(order) if order else Topic.objects.filter(course=course).count() + 1,
-                video_file=video_file,
-                ppt_file=ppt_file,
-                poster_image=poster_image
-            )
+            # The topic takes over the uploads' stored files with the sessions
+            with transaction.atomic():
+                topic = Topic.objects.create(
+                    course=course,
+                    title=title,
+                    order=int(order) if order else Topic.objects.filter(course=course).count() + 1,
+                    video_file=video_upload.stored_name if video_upload else video_file,
+                    video_file_name=video_upload.filename if video_upload else '',
+                    ppt_file=ppt_upload.stored_name if ppt_upload else ppt_file,
+                    ppt_file_name=ppt_upload.filename if ppt_upload else '',
+                    poster_image=poster_image,
+                    video_duration=_video_duration(request.POST.get('video_duration')),
+                )
+                for upload in (video_upload, ppt_upload):
+                    if upload:
+                        upload.delete()
+            place_topic(topic, topic.order)
+            start_job('progress_recompute', request.user, recompute_progress, course.id)
             messages.success(request, f'Topic "{title}" added successfully!')
+            _warn_unknown_duration(request, topic)
             return redirect('manage_topics')
         except Exception as e:
             logger.error(f"Error adding topic: {str(e)}")
@@ -424,6 +675,84 @@ def add_topic(request):
     return render(request, 'admin/add_topic.html', context)
 
 
+def _upload_state(session):
+    return {
+        'upload_id': str(session.id),
+        'offset': session.received_bytes,
+        'size': session.total_size,
+        'chunk_size': session.chunk_size,
+        'status': session.status,
+    }
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def api_upload_start(request):
+    """AJAX endpoint: open a chunked upload session.
+
+    POST params: field (video_file|ppt_file), filename, size
+    Returns: JSON {upload_id, offset, size, chunk_size, status}
+    """
+    try:
+        session = start_upload(
+            request.user,
+            request.POST.get('field'),
+            request.POST.get('filename'),
+            int(request.POST.get('size') or 0),
+        )
+    except ValueError:
+        return JsonResponse({'error': 'size must be an integer'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_state(session), status=201)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_GET
+def api_upload_status(request, upload_id):
+    """AJAX endpoint: current acknowledged offset of an upload, for resuming."""
+    session = get_object_or_404(UploadSession, id=upload_id, owner=request.user)
+    return JsonResponse(_upload_state(session))
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def api_upload_chunk(request, upload_id):
+    """AJAX endpoint: append one raw chunk to an upload.
+
+    Headers: X-Upload-Offset, X-Chunk-Sha256; body: the chunk bytes.
+    Returns: JSON upload state; 409 with the expected offset when out of order.
+    """
+    session = get_object_or_404(UploadSession, id=upload_id, owner=request.user)
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        write_chunk(session, offset, request.headers.get('X-Chunk-Sha256'), request)
+    except ValueError:
+        return JsonResponse({'error': 'X-Upload-Offset header is required'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e), **_upload_state(session)}, status=e.status)
+    return JsonResponse(_upload_state(session))
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def api_upload_complete(request, upload_id):
+    """AJAX endpoint: assemble a fully received upload into storage."""
+    session = get_object_or_404(UploadSession, id=upload_id, owner=request.user)
+    try:
+        complete_upload(session)
+    except UploadError as e:
+        return JsonResponse({'error': str(e), **_upload_state(session)}, status=e.status)
+    except OSError as e:
+        logger.error(f"Error assembling upload {upload_id}: {e}")
+        return JsonResponse({'error': 'could not assemble upload'}, status=500)
+    return JsonResponse(_upload_state(session))
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def edit_topic(request, topic_id):
@@ -432,6 +761,7 @@ def edit_topic(request, topic_id):
     courses = Course.objects.all()
     
     if request.method == 'POST':
+        old_course_id = topic.course_id
         topic.course_id = request.POST.get('course')
         topic.title = request.POST.get('title')
         topic.order = request.POST.get('order')
@@ -442,10 +772,30 @@ def edit_topic(request, topic_id):
             topic.ppt_file = request.FILES.get('ppt_file')
         if request.FILES.get('poster_image'):
             topic.poster_image = request.FILES.get('poster_image')
+
+        # Large files arrive beforehand through the chunked upload API
+        uploads = []
+        for field, param in (('video_file', 'video_upload_id'), ('ppt_file', 'ppt_upload_id')):
+            upload = completed_upload(request.user, field, request.POST.get(param))
+            if upload:
+                setattr(topic, field, upload.stored_name)
+                setattr(topic, f'{field}_name', upload.filename)
+                uploads.append(upload)
         
         try:
-            topic.save()
+            topic.video_duration = _video_duration(request.POST.get('video_duration'))
+            with transaction.atomic():
+                topic.save()
+                for upload in uploads:
+                    upload.delete()
+            place_topic(topic, topic.order)
+            if int(topic.course_id) != old_course_id:
+                # The topic left a gap behind and changed both courses' topic counts
+                compact_topic_order(old_course_id)
+                for course_id in (old_course_id, int(topic.course_id)):
+                    start_job('progress_recompute', request.user, recompute_progress, course_id)
             messages.success(request, 'Topic updated successfully!')
+            _warn_unknown_duration(request, topic)
             return redirect('manage_topics')
         except Exception as e:
             logger.error(f"Error updating topic: {str(e)}")
@@ -461,9 +811,12 @@ def delete_topic(request, topic_id):
     """Delete a topic."""
     topic = get_object_or_404(Topic, id=topic_id)
     topic_title = topic.title
+    course_id = topic.course_id
     
     try:
         topic.delete()
+        compact_topic_order(course_id)
+        start_job('progress_recompute', request.user, recompute_progress, course_id)
         messages.success(request, f'Topic "{topic_title}" deleted successfully!')
     except Exception as e:
         logger.error(f"Error deleting topic: {str(e)}")
@@ -480,13 +833,19 @@ def delete_topic(request, topic_id):
 def manage_assignments(request):
     """View and manage all assignments."""
     course_id = request.GET.get('course')
+    assignments = Assignment.objects.select_related('course', 'topic')
     if course_id:
-        assignments = Assignment.objects.filter(course_id=course_id).order_by('-created_at')
-    else:
-        assignments = Assignment.objects.all().order_by('-created_at')
+        assignments = assignments.filter(course_id=course_id)
     
+    page = keyset_page(request, assignments, ['-created_at'])
     courses = Course.objects.all()
-    context = {'assignments': assignments, 'courses': courses, 'selected_course': course_id}
+    context = {
+        'assignments': page,
+        'page': page,
+        'total_assignments': list_counts('assignments', {'course': course_id}, assignments.count),
+        'courses': courses,
+        'selected_course': course_id,
+    }
     return render(request, 'admin/manage_assignments.html', context)
 
 
@@ -584,23 +943,37 @@ def delete_assignment(request, assignment_id):
 def manage_submissions(request):
     """View and manage all submissions."""
     assignment_id = request.GET.get('assignment')
+    course_id = request.GET.get('course')
     reviewed_filter = request.GET.get('reviewed')
     
-    submissions = Submission.objects.select_related('assignment', 'student').order_by('-submitted_at')
+    submissions = Submission.objects.select_related('assignment', 'student')
     
     if assignment_id:
         submissions = submissions.filter(assignment_id=assignment_id)
+    if course_id:
+        submissions = submissions.filter(assignment__course_id=course_id)
+    counts = list_counts(
+        'submissions', {'assignment': assignment_id, 'course': course_id},
+        lambda: submissions.aggregate(total=Count('id'), pending=Count('id', filter=Q(reviewed=False))),
+    )
     
     if reviewed_filter == 'pending':
         submissions = submissions.filter(reviewed=False)
     elif reviewed_filter == 'reviewed':
         submissions = submissions.filter(reviewed=True)
     
+    page = keyset_page(request, submissions, ['-submitted_at'])
     assignments = Assignment.objects.all()
     context = {
-        'submissions': submissions,
+        'submissions': page,
+        'page': page,
+        'total_submissions': counts['total'],
+        'pending_submissions': counts['pending'],
+        'graded_submissions': counts['total'] - counts['pending'],
         'assignments': assignments,
+        'courses': Course.objects.all(),
         'selected_assignment': assignment_id,
+        'selected_course': course_id,
         'reviewed_filter': reviewed_filter
     }
     return render(request, 'admin/manage_submissions.html', context)
@@ -614,15 +987,33 @@ def grade_submission(request, submission_id):
     
     if request.method == 'POST':
         grade = request.POST.get('grade')
-        feedback = request.POST.get('feedback')
+        feedback = (request.POST.get('feedback') or '').strip()
         
         try:
-            submission.grade = float(grade) if grade else None
-            submission.feedback = feedback
-            submission.reviewed = True
-            submission.save()
-            messages.success(request, 'Submission graded successfully!')
-            return redirect('manage_submissions')
+            value = _grade(grade)
+            # Only written if nobody has graded it since this page was loaded
+            updated = Submission.objects.filter(
+                pk=submission.pk, version=int(request.POST.get('version', ''))
+            ).update(
+                grade=value,
+                feedback=feedback,
+                reviewed=value is not None,
+                version=F('version') + 1,
+                graded_by=request.user,
+                graded_at=timezone.now(),
+            )
+            if updated:
+                messages.success(request, 'Submission graded successfully!')
+                return redirect('manage_submissions')
+            submission.refresh_from_db()
+            grader = submission.graded_by.name if submission.graded_by_id else 'Another admin'
+            messages.error(
+                request,
+                f'{grader} graded this submission while you were editing. Your grade '
+                f'({grade or "none"}) was not saved; the current grade is shown below.'
+            )
+        except GradeEntryError as e:
+            messages.error(request, str(e))
         except Exception as e:
             logger.error(f"Error grading submission: {str(e)}")
             messages.error(request, f'Error: {str(e)}')
@@ -631,9 +1022,78 @@ def grade_submission(request, submission_id):
     return render(request, 'admin/grade_submission.html', context)
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def bulk_grade_submissions(request, assignment_id):
+    """Grade a page of one assignment's submissions inline."""
+    assignment = get_object_or_404(Assignment.objects.select_related('course'), id=assignment_id)
+    reviewed_filter = request.GET.get('reviewed', 'pending')
+    
+    submissions = Submission.objects.filter(assignment=assignment).select_related('student', 'graded_by')
+    if reviewed_filter == 'pending':
+        submissions = submissions.filter(reviewed=False)
+    elif reviewed_filter == 'reviewed':
+        submissions = submissions.filter(reviewed=True)
+    
+    page = keyset_page(request, submissions, ['submitted_at'])
+    context = {
+        'assignment': assignment,
+        'submissions': page,
+        'page': page,
+        'progress': grading_progress(assignment),
+        'reviewed_filter': reviewed_filter,
+    }
+    return render(request, 'admin/bulk_grade.html', context)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_POST
+def api_bulk_grade(request, assignment_id):
+    """AJAX endpoint: save several grades for one assignment.
+
+    Body: {"grades": [{"id", "version", "grade", "feedback"}, ...]}
+    Rows changed by someone else since they were loaded are returned under
+    "conflicts" with their current values and left untouched (HTTP 409 if
+    any conflicted).
+    """
+    assignment = get_object_or_404(Assignment, id=assignment_id)
+    try:
+        data = json.loads(request.body or b'{}')
+        entries, errors = parse_entries(data.get('grades'))
+    except (ValueError, AttributeError) as e:
+        message = str(e) if isinstance(e, GradeEntryError) else 'invalid JSON'
+        return JsonResponse({'error': message}, status=400)
+    
+    try:
+        result = apply_grades(assignment, entries, request.user)
+    except Exception as e:
+        logger.error(f"Error saving bulk grades: {str(e)}")
+        return JsonResponse({'error': 'could not save grades'}, status=500)
+    
+    result['errors'] = errors
+    result['progress'] = grading_progress(assignment)
+    return JsonResponse(result, status=409 if result['conflicts'] else 200)
+
+
 # ===========================
 # MCQ QUESTIONS MANAGEMENT
 # ===========================
+def _warn_near_duplicates(request, kind, question_id):
+    """Flash a warning if a saved question looks like one already in either bank."""
+    try:
+        matches = find_similar(kind, question_id)
+    except Exception as e:
+        logger.error(f"Error checking for duplicate questions: {str(e)}")
+        return
+    if matches:
+        labels = ', '.join(
+            f"{'MCQ' if other_kind == 'mcq' else 'exam question'} #{other_id} ({score:.0%})"
+            for other_kind, other_id, score in matches[:5]
+        )
+        messages.warning(request, f'This question looks like a near-duplicate of: {labels}.')
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def manage_mcqs(request):
@@ -641,18 +1101,21 @@ def manage_mcqs(request):
     course_id = request.GET.get('course')
     topic_id = request.GET.get('topic')
     
-    mcqs = MCQQuestion.objects.select_related('course', 'topic').order_by('topic__order', 'id')
+    mcqs = MCQQuestion.objects.select_related('course', 'topic')
     
     if course_id:
         mcqs = mcqs.filter(course_id=course_id)
     if topic_id:
         mcqs = mcqs.filter(topic_id=topic_id)
     
+    page = keyset_page(request, mcqs, ['id'])
     courses = Course.objects.all()
     topics = Topic.objects.all() if not course_id else Topic.objects.filter(course_id=course_id)
     
     context = {
-        'mcqs': mcqs,
+        'mcqs': page,
+        'page': page,
+        'total_mcqs': list_counts('mcqs', {'course': course_id, 'topic': topic_id}, mcqs.count),
         'courses': courses,
         'topics': topics,
         'selected_course': course_id,
@@ -661,6 +1124,10 @@ def manage_mcqs(request):
     return render(request, 'admin/manage_mcqs.html', context)
 
 
+def _difficulty(value):
+    return value if value in dict(MCQQuestion.DIFFICULTIES) else 'medium'
+
+
 @login_required(login_url='admin_login')
 @user_passes_test(is_admin, login_url='admin_login')
 def add_mcq(request):
@@ -695,9 +1162,11 @@ def add_mcq(request):
                 option_3=option_3,
                 option_4=option_4,
                 correct_option=int(correct_option),
+                difficulty=_difficulty(request.POST.get('difficulty')),
                 image=image
             )
             messages.success(request, 'MCQ question added successfully!')
+            _warn_near_duplicates(request, 'mcq', mcq.id)
             return redirect('manage_mcqs')
         except Exception as e:
             logger.error(f"Error adding MCQ: {str(e)}")
@@ -723,6 +1192,7 @@ def edit_mcq(request, mcq_id):
         mcq.option_3 = request.POST.get('option_3')
         mcq.option_4 = request.POST.get('option_4')
         mcq.correct_option = int(request.POST.get('correct_option'))
+        mcq.difficulty = _difficulty(request.POST.get('difficulty'))
         
         if request.FILES.get('image'):
             mcq.image = request.FILES.get('image')
@@ -730,6 +1200,7 @@ def edit_mcq(request, mcq_id):
         try:
             mcq.save()
             messages.success(request, 'MCQ question updated successfully!')
+            _warn_near_duplicates(request, 'mcq', mcq.id)
             return redirect('manage_mcqs')
         except Exception as e:
             logger.error(f"Error updating MCQ: {str(e)}")
@@ -755,6 +1226,143 @@ def delete_mcq(request, mcq_id):
     return redirect('manage_mcqs')
 
 
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def import_questions_view(request):
+    """Bulk import MCQ or final exam questions from CSV, JSON(L) or a ZIP with images."""
+    kind = request.POST.get('kind') or request.GET.get('kind') or 'mcq'
+    if kind not in ('mcq', 'exam'):
+        kind = 'mcq'
+    report = None
+
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        dry_run = request.POST.get('dry_run') == 'on'
+        if not upload:
+            messages.error(request, 'Choose a file to import.')
+        else:
+            try:
+                report = import_questions(upload, kind, dry_run=dry_run)
+                if dry_run:
+                    messages.success(request, f'Dry run: {report.valid} of {report.rows} rows are valid. Nothing was saved.')
+                else:
+                    messages.success(request, f'Imported {report.created} questions ({report.error_count} rows skipped).')
+            except ImportFormatError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                logger.error(f"Error importing questions: {str(e)}")
+                messages.error(request, f'Error: {str(e)}')
+
+    context = {'kind': kind, 'report': report}
+    return render(request, 'admin/import_questions.html', context)
+
+
+# ===========================
+# BACKGROUND JOBS
+# ===========================
+# kind: (title, page to return to)
+JOB_PAGES = {
+    'student_import': ('Student Roster Import', 'manage_students'),
+    'password_reset': ('Bulk Password Reset', 'manage_students'),
+    'export': ('Data Export', 'exports'),
+    'payment_import': ('Payment Reconciliation', 'manage_payments'),
+    'course_delete': ('Course Deletion', 'manage_courses'),
+    'student_delete': ('Student Deletion', 'manage_students'),
+    'progress_recompute': ('Course Progress Recompute', 'manage_topics'),
+}
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def job_detail(request, job_id):
+    """Progress and outcome of a background job."""
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    title, back_url = JOB_PAGES.get(job.kind, (job.kind, 'admin_dashboard'))
+    context = {'job': job, 'job_title': title, 'back_url': back_url}
+    return render(request, 'admin/job_detail.html', context)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+@require_GET
+def api_job_status(request, job_id):
+    """AJAX endpoint: current status of a background job."""
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    return JsonResponse(job_status(job))
+
+
+# ===========================
+# EXPORTS
+# ===========================
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def exports_page(request):
+    """Spreadsheet exports of grades, progress, payments and exam results."""
+    context = {
+        'exports': list(EXPORTS.items()),
+        'courses': Course.objects.all(),
+        'assignments': Assignment.objects.select_related('course'),
+        'recent_jobs': BackgroundJob.objects.filter(kind='export').select_related('created_by')[:10],
+        'xlsx_sync_limit': XLSX_SYNC_LIMIT,
+    }
+    return render(request, 'admin/exports.html', context)
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def export_data(request, kind):
+    """Download an export (GET, streamed) or prepare it as a background job (POST)."""
+    export = EXPORTS.get(kind)
+    if export is None:
+        messages.error(request, 'Unknown export.')
+        return redirect('exports')
+    
+    params = request.POST if request.method == 'POST' else request.GET
+    fmt = params.get('format') if params.get('format') in FORMATS else 'csv'
+    filters = {name: params.get(name) for name in export.filters if params.get(name)}
+    
+    background = request.method == 'POST'
+    if not background and fmt == 'xlsx' and export.queryset(filters).count() > XLSX_SYNC_LIMIT:
+        background = True
+        messages.warning(request, f'More than {XLSX_SYNC_LIMIT} rows: the workbook is being prepared in the background.')
+    if background:
+        remove_old_exports()
+        job = start_job('export', request.user, run_export, kind, fmt, filters)
+        messages.success(request, f'Preparing the {export.title.lower()} export.')
+        return redirect('job_detail', job_id=job.id)
+    
+    filename = export_filename(kind, fmt)
+    if fmt == 'csv':
+        response = StreamingHttpResponse(stream_csv(export, filters), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    workbook = tempfile.TemporaryFile()
+    try:
+        write_xlsx(export, filters, workbook)
+    except ExportError as e:
+        workbook.close()
+        messages.error(request, str(e))
+        return redirect('exports')
+    workbook.seek(0)
+    return FileResponse(
+        workbook, as_attachment=True, filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def download_export(request, job_id):
+    """Download the file written by a background export."""
+    job = get_object_or_404(BackgroundJob, id=job_id, kind='export', status='done')
+    path = export_path(job.result.get('file', ''))
+    if not os.path.isfile(path):
+        messages.error(request, 'This export has expired. Please run it again.')
+        return redirect('exports')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result.get('filename'))
+
+
 # ===========================
 # PAYMENTS MANAGEMENT
 # ===========================
@@ -763,14 +1371,30 @@ def delete_mcq(request, mcq_id):
 def manage_payments(request):
     """View and manage all payments."""
     student_id = request.GET.get('student')
+    selected_student = None
     
-    payments = Payment.objects.select_related('student').order_by('-payment_date')
+    payments = Payment.objects.select_related('student')
     
-    if student_id:
+    filtered = bool(student_id and student_id.isdigit())
+    if filtered:
+        selected_student = CustomUser.objects.filter(pk=student_id, role='student').first()
         payments = payments.filter(student_id=student_id)
     
-    students = CustomUser.objects.filter(role='student')
-    context = {'payments': payments, 'students': students, 'selected_student': student_id}
+    page = keyset_page(request, payments, ['-payment_date'])
+    if filtered:
+        # One student's payments, read through the student index
+        totals = payments.aggregate(count=Count('id'), amount=Sum('amount'))
+    else:
+        # The whole table: use the dashboard's shared, periodically refreshed figures
+        metrics = metrics_snapshot()
+        totals = {'count': metrics['payments'], 'amount': metrics['revenue']}
+    context = {
+        'payments': page,
+        'page': page,
+        'total_payments': totals['count'],
+        'total_amount': totals['amount'],
+        'selected_student': selected_student,
+    }
     return render(request, 'admin/manage_payments.html', context)
 
 
@@ -778,14 +1402,13 @@ def manage_payments(request):
 @user_passes_test(is_admin, login_url='admin_login')
 def add_payment(request):
     """Add a new payment record."""
-    students = CustomUser.objects.filter(role='student')
     if request.method == 'POST':
         student_id = request.POST.get('student')
         amount = request.POST.get('amount')
         transaction_id = request.POST.get('transaction_id')
         
         try:
-            student = CustomUser.objects.get(id=student_id)
+            student = CustomUser.objects.get(id=student_id, role='student')
             payment = Payment.objects.create(
                 student=student,
                 amount=float(amount) if amount else None,
@@ -797,8 +1420,32 @@ def add_payment(request):
             logger.error(f"Error adding payment: {str(e)}")
             messages.error(request, f'Error: {str(e)}')
     
-    context = {'students': students}
-    return render(request, 'admin/add_payment.html', context)
+    return render(request, 'admin/add_payment.html')
+
+
+@login_required(login_url='admin_login')
+@user_passes_test(is_admin, login_url='admin_login')
+def import_payments(request):
+    """Reconcile payments from a CSV/XLSX bank statement in a background job."""
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        send_emails = request.POST.get('send_emails') == 'on'
+        if not upload:
+            messages.error(request, 'Choose a statement file to import.')
+        else:
+            try:
+                path, extension = stage_upload(upload, STATEMENT_COLUMNS, prefix='statement-')
+                job = start_job('payment_import', request.user, reconcile_payments, path, extension, send_emails=send_emails)
+                messages.success(request, f'Reconciling {upload.name} in the background.')
+                return redirect('job_detail', job_id=job.id)
+            except RosterFormatError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                logger.error(f"Error starting payment reconciliation: {str(e)}")
+                messages.error(request, f'Error: {str(e)}')
+
+    context = {'recent_jobs': BackgroundJob.objects.filter(kind='payment_import').select_related('created_by')[:10]}
+    return render(request, 'admin/import_payments.html', context)
 
 
 @login_required(login_url='admin_login')
@@ -806,7 +1453,6 @@ def add_payment(request):
 def edit_payment(request, payment_id):
     """Edit an existing payment."""
     payment = get_object_or_404(Payment, id=payment_id)
-    students = CustomUser.objects.filter(role='student')
     
     if request.method == 'POST':
         payment.student_id = request.POST.get('student')
@@ -821,7 +1467,7 @@ def edit_payment(request, payment_id):
             logger.error(f"Error updating payment: {str(e)}")
             messages.error(request, f'Error: {str(e)}')
     
-    context = {'payment': payment, 'students': students}
+    context = {'payment': payment}
     return render(request, 'admin/edit_payment.html', context)
 
 
@@ -863,6 +1509,7 @@ def add_exam(request):
         title = request.POST.get('title')
         num_questions = request.POST.get('num_questions')
         pass_mark = request.POST.get('pass_mark')
+        duration_minutes = request.POST.get('duration_minutes') or 60
         
         try:
             course = Course.objects.get(id=course_id)
@@ -870,7 +1517,8 @@ def add_exam(request):
                 course=course,
                 title=title,
                 num_questions=int(num_questions),
-                pass_mark=int(pass_mark)
+                pass_mark=int(pass_mark),
+                duration_minutes=int(duration_minutes)
             )
             messages.success(request, f'Exam "{title}" created successfully!')
             return redirect('manage_exams')
@@ -893,6 +1541,7 @@ def edit_exam(request, exam_id):
         exam.title = request.POST.get('title')
         exam.num_questions = request.POST.get('num_questions')
         exam.pass_mark = request.POST.get('pass_mark')
+        exam.duration_minutes = request.POST.get('duration_minutes') or exam.duration_minutes
         exam.active = request.POST.get('active') == 'on'
         
         try:
@@ -915,8 +1564,22 @@ def edit_exam(request, exam_id):
 def manage_exam_questions(request, exam_id):
     """Manage questions for a final exam."""
     exam = get_object_or_404(FinalExam, id=exam_id)
-    questions = FinalExamQuestion.objects.filter(exam=exam)
-    context = {'exam': exam, 'questions': questions}
+    questions = list(FinalExamQuestion.objects.filter(exam=exam))
+
+    analysis = {'items': {}, 'attempts': 0, 'kr20': None}
+    try:
+        analysis = exam_item_analysis(exam)
+    except Exception as e:
+        logger.error(f"Error computing item analysis for exam {exam.id}: {str(e)}")
+    for question in questions:
+        question.analysis = analysis['items'].get(question.id)
+
+    context = {
+        'exam': exam,
+        'questions': questions,
+        'analysis_attempts': analysis['attempts'],
+        'kr20': analysis['kr20'],
+    }
     return render(request, 'admin/manage_exam_questions.html', context)
 
 
@@ -944,9 +1607,11 @@ def add_exam_question(request, exam_id):
                 option_3=option_3,
                 option_4=option_4,
                 correct_option=int(correct_option),
+                difficulty=_difficulty(request.POST.get('difficulty')),
                 image=image
             )
             messages.success(request, 'Question added successfully!')
+            _warn_near_duplicates(request, 'exam', question.id)
             return redirect('manage_exam_questions', exam_id=exam.id)
         except Exception as e:
             logger.error(f"Error adding exam question: {str(e)}")
@@ -976,6 +1641,7 @@ def edit_exam_question(request, question_id):
         try:
             question.save()
             messages.success(request, 'Question updated successfully!')
+            _warn_near_duplicates(request, 'exam', question.id)
             return redirect('manage_exam_questions', exam_id=question.exam.id)
         except Exception as e:
             logger.error(f"Error updating exam question: {str(e)}")
@@ -54,4 +54,4 @@ class ProgressViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Progress.objects.filter(student=self.request.user)
\ No newline at end of file
+        return Progress.objects.filter(student=self.request.user, course__is_active=True)
\ No newline at end of file
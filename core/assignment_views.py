@@ -10,7 +10,7 @@ def assignment_list(request, topic_id):
     """
     Display list of assignments for a topic
     """
-    topic = get_object_or_404(Topic, id=topic_id)
+    topic = get_object_or_404(Topic, id=topic_id, course__is_active=True)
     assignments = Assignment.objects.filter(topic=topic)
     submissions = AssignmentSubmission.objects.filter(
         student=request.user,
@@ -37,7 +37,7 @@ def submit_assignment(request, assignment_id):
     """
     Handle assignment submission
     """
-    assignment = get_object_or_404(Assignment, id=assignment_id)
+    assignment = get_object_or_404(Assignment, id=assignment_id, course__is_active=True)
     
     # Check if already submitted
     existing_submission = AssignmentSubmission.objects.filter(
@@ -0,0 +1,159 @@
+"""
+Quiz attempt history.
+
+Every submitted topic/course quiz becomes one MCQAttempt row. The question
+ids are packed as little-endian uint32s and each answer as one byte
+(selected option in the high nibble, correct option in the low nibble), so
+a ten-question attempt costs 50 bytes of payload.
+
+Attempts are not written inside the request: record_attempt() hands the
+row to a background writer that collects them and inserts them with
+bulk_create, either every FLUSH_INTERVAL seconds or as soon as BATCH_SIZE
+are waiting. Set MCQ_ATTEMPT_ASYNC = False to write synchronously.
+"""
+import atexit
+import logging
+import queue
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import MCQAttempt
+
+logger = logging.getLogger(__name__)
+
+ASYNC_WRITES = getattr(settings, 'MCQ_ATTEMPT_ASYNC', True)
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 2.0
+
+
+def pack_attempt(question_ids, selected, corrects):
+    """Pack an attempt into (question_ids bytes, answers bytes)."""
+    ids = struct.pack(f'<{len(question_ids)}I', *question_ids)
+    answers = bytes((s & 0x0F) << 4 | (c & 0x0F) for s, c in zip(selected, corrects))
+    return ids, answers
+
+
+def unpack_attempt(question_ids, answers):
+    """Inverse of pack_attempt: (question_ids, selected, corrects) lists."""
+    question_ids = bytes(question_ids)
+    ids = list(struct.unpack(f'<{len(question_ids) // 4}I', question_ids))
+    answers = bytes(answers)
+    return ids, [a >> 4 for a in answers], [a & 0x0F for a in answers]
+
+
+class AttemptWriter:
+    """Buffers unsaved MCQAttempt instances and bulk-inserts them from a thread."""
+
+    def __init__(self, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, attempt):
+        self.queue.put(attempt)
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run, name='mcq-attempt-writer', daemon=True)
+                    self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        close_old_connections()
+        try:
+            MCQAttempt.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} MCQ attempts: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Write everything still waiting, in the calling thread."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for i in range(0, len(batch), self.batch_size):
+            self.write(batch[i:i + self.batch_size])
+
+
+writer = AttemptWriter()
+atexit.register(writer.flush)
+
+
+def record_attempt(student, course, topic_id, question_ids, selected, corrects, score, passed, started_at=None):
+    """Queue an attempt for writing (or write it now with MCQ_ATTEMPT_ASYNC = False)."""
+    packed_ids, packed_answers = pack_attempt(question_ids, selected, corrects)
+    attempt = MCQAttempt(
+        student=student,
+        course=course,
+        topic_id=topic_id,
+        question_ids=packed_ids,
+        answers=packed_answers,
+        score=score,
+        total=len(question_ids),
+        passed=passed,
+        started_at=started_at,
+        submitted_at=timezone.now(),
+    )
+    if ASYNC_WRITES:
+        writer.submit(attempt)
+    else:
+        attempt.save()
+
+
+def student_history(student, course=None):
+    """A student's attempts, newest first (student/submitted_at index)."""
+    attempts = MCQAttempt.objects.filter(student=student)
+    if course is not None:
+        attempts = attempts.filter(course=course)
+    return attempts.select_related('course', 'topic').defer('question_ids', 'answers')
+
+
+def topic_pass_rates(course):
+    """Attempts, passes and pass rate for each quizzed topic of a course."""
+    rows = (
+        MCQAttempt.objects.filter(course=course, topic__isnull=False)
+        .values('topic_id', 'topic__title', 'topic__order')
+        .annotate(attempts=Count('id'), passes=Count('id', filter=Q(passed=True)),
+                  students=Count('student', distinct=True))
+        .order_by('topic__order')
+    )
+    return [
+        {
+            'topic_id': row['topic_id'],
+            'title': row['topic__title'],
+            'attempts': row['attempts'],
+            'students': row['students'],
+            'passes': row['passes'],
+            'pass_rate': round(row['passes'] * 100 / row['attempts'], 1),
+        }
+        for row in rows
+    ]
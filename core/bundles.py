@@ -0,0 +1,165 @@
+"""
+Per-course offline bundles.
+
+A bundle is a ZIP of every topic's video, PPT, captions and chapters plus a
+manifest.json. It is produced on the fly: zipfile writes into a sink that
+hands each piece to the HTTP response as soon as it is produced, and source
+files are copied through in fixed-size blocks, so neither the archive nor
+any media file is ever held in memory.
+
+While streaming the first download of a course version, the same bytes are
+teed into the bundle cache; later downloads of that version are served
+straight from disk. The version is a hash of everything that goes into the
+bundle, so editing a topic or replacing a file produces a new bundle.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import CaptionCue
+from .captions import TRACK_FIELDS
+
+BUNDLE_DIR = getattr(settings, 'OFFLINE_BUNDLE_DIR', os.path.join(tempfile.gettempdir(), 'tansam_bundles'))
+BLOCK_SIZE = 1024 * 1024
+BUNDLE_FIELDS = ('video_file', 'ppt_file') + tuple(TRACK_FIELDS)
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target that collects output for the response and the cache."""
+
+    def __init__(self, tee=None):
+        self.pending = []
+        self.tee = tee
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.pending.append(data)
+        if self.tee is not None:
+            self.tee.write(data)
+        return len(data)
+
+    def drain(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+
+def course_version(course, topics):
+    """Short hash of everything that goes into the course's bundle."""
+    state = [course.id, course.title] + [
+        [t.id, t.order, t.title] + [getattr(t, f).name or '' for f in BUNDLE_FIELDS] for t in topics
+    ]
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()[:16]
+
+
+def cached_bundle_path(course, version):
+    return os.path.join(BUNDLE_DIR, f'course-{course.id}-{version}.zip')
+
+
+def _entries(topics):
+    """(arcname, FieldFile) for every file in the bundle, plus the manifest topics."""
+    entries = []
+    manifest_topics = []
+    chapters = {}
+    for topic_id, start, end, text in (
+        CaptionCue.objects.filter(topic__in=topics, kind='chapter')
+        .values_list('topic_id', 'start', 'end', 'text')
+    ):
+        chapters.setdefault(topic_id, []).append({'start': start, 'end': end, 'title': text})
+
+    for topic in topics:
+        folder = f"{topic.order:02d}-{slugify(topic.title) or topic.id}"
+        files = {}
+        for field in BUNDLE_FIELDS:
+            field_file = getattr(topic, field)
+            if not field_file:
+                continue
+            arcname = f"{folder}/{field.replace('_file', '')}{os.path.splitext(field_file.name)[1]}"
+            entries.append((arcname, field_file))
+            files[field.replace('_file', '')] = arcname
+        manifest_topics.append({
+            'id': topic.id,
+            'order': topic.order,
+            'title': topic.title,
+            'files': files,
+            'chapters': chapters.get(topic.id, []),
+        })
+    return entries, manifest_topics
+
+
+def stream_bundle(course, topics, version):
+    """
+    Yield the ZIP for a course. The output is also written to the bundle
+    cache unless another request is already building the same version.
+    """
+    entries, manifest_topics = _entries(topics)
+    manifest = {
+        'course': {'id': course.id, 'title': course.title, 'description': course.description},
+        'version': version,
+        'generated_at': timezone.now().isoformat(),
+        'topics': manifest_topics,
+    }
+
+    final_path = cached_bundle_path(course, version)
+    partial_path = final_path + '.partial'
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    try:
+        tee = open(partial_path, 'xb')
+    except FileExistsError:
+        tee = None
+
+    finished = False
+    sink = _Sink(tee)
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+            zf.writestr('manifest.json', json.dumps(manifest, indent=2))
+            yield from sink.drain()
+            for arcname, field_file in entries:
+                try:
+                    src = field_file.storage.open(field_file.name, 'rb')
+                except OSError:
+                    continue
+                with src:
+                    info = zipfile.ZipInfo(arcname, date_time=timezone.localtime().timetuple()[:6])
+                    info.file_size = field_file.size
+                    with zf.open(info, 'w') as dst:
+                        for block in iter(lambda: src.read(BLOCK_SIZE), b''):
+                            dst.write(block)
+                            yield from sink.drain()
+                yield from sink.drain()
+        yield from sink.drain()
+        finished = True
+    finally:
+        if tee is not None:
+            tee.close()
+            if finished:
+                os.replace(partial_path, final_path)
+                _remove_old_versions(course.id, final_path)
+            else:
+                os.remove(partial_path)
+
+
+def discard_bundles(course_id):
+    """Delete every cached bundle of a course, e.g. once its topics were reordered."""
+    if os.path.isdir(BUNDLE_DIR):
+        _remove_old_versions(course_id)
+
+
+def _remove_old_versions(course_id, keep=None):
+    prefix = f'course-{course_id}-'
+    for name in os.listdir(BUNDLE_DIR):
+        path = os.path.join(BUNDLE_DIR, name)
+        if name.startswith(prefix) and name.endswith('.zip') and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
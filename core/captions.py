@@ -0,0 +1,51 @@
+"""
+Caption / chapter indexing for topics.
+
+Topic caption and chapter files are parsed once when they are uploaded and
+stored as CaptionCue rows, so the player can ask for the chapter list or a
+window of cues without downloading and parsing the whole .vtt file.
+"""
+from django.db import transaction
+import logging
+
+from .models import CaptionCue
+from .webvtt import parse_webvtt, WebVTTError
+
+logger = logging.getLogger(__name__)
+
+# Topic file field -> (cue kind, language)
+TRACK_FIELDS = {
+    'caption_en_file': ('caption', 'en'),
+    'caption_ta_file': ('caption', 'ta'),
+    'chapters_file': ('chapter', ''),
+}
+
+
+def index_topic_tracks(topic, fields=None):
+    """
+    Re-parse the given track fields of a topic (all of them by default)
+    and replace their cues. Returns the number of cues written.
+    """
+    written = 0
+    for field_name in fields or TRACK_FIELDS:
+        kind, language = TRACK_FIELDS[field_name]
+        field_file = getattr(topic, field_name)
+        cues = []
+        if field_file:
+            try:
+                field_file.open('rb')
+                try:
+                    cues = [
+                        CaptionCue(topic=topic, kind=kind, language=language, start=start, end=end, text=text)
+                        for start, end, text in parse_webvtt(field_file)
+                    ]
+                finally:
+                    field_file.close()
+            except (OSError, WebVTTError) as e:
+                logger.warning(f"Could not index {field_name} for topic {topic.id}: {e}")
+
+        with transaction.atomic():
+            CaptionCue.objects.filter(topic=topic, kind=kind, language=language).delete()
+            CaptionCue.objects.bulk_create(cues, batch_size=500)
+        written += len(cues)
+    return written
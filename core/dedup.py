@@ -0,0 +1,249 @@
+"""
+Near-duplicate detection for MCQ and final exam questions.
+
+A question's text and options are normalized (case, punctuation,
+whitespace; options sorted so reordering them does not matter) and cut
+into overlapping word 3-shingles. Each shingle set is reduced to a
+NUM_PERM-value MinHash signature; the share of equal values between two
+signatures estimates the Jaccard similarity of their shingle sets.
+
+For locality-sensitive hashing the signature is split into BANDS bands of
+ROWS values. Questions that agree on a whole band land in the same bucket
+and become candidates; only candidates are compared, which keeps a scan of
+the whole bank roughly linear. With 20 bands of 6 rows a pair at 0.7
+similarity becomes a candidate about 92% of the time, a pair at 0.4 about 8%.
+
+Signatures and band keys are stored (QuestionSignature / QuestionBand), so
+a new or edited question is checked with one indexed query. Both banks
+share one key space, so duplicates across them are found too.
+"""
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import FinalExamQuestion, MCQQuestion, QuestionBand, QuestionSignature
+
+NUM_PERM = 120
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+THRESHOLD = 0.7
+BATCH_SIZE = 1000
+
+_PRIME = (1 << 31) - 1
+# Fixed seed: stored signatures must stay comparable across processes
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+MODELS = {'mcq': MCQQuestion, 'exam': FinalExamQuestion}
+TEXT_FIELDS = ('question_text', 'option_1', 'option_2', 'option_3', 'option_4')
+
+
+def _words(text):
+    return re.sub(r'[^\w\s]', ' ', (text or '').lower()).split()
+
+
+def normalize(question_text, options):
+    parts = [' '.join(_words(question_text))] + sorted(' '.join(_words(o)) for o in options)
+    return ' | '.join(parts)
+
+
+def shingles(text):
+    tokens = text.split()
+    if len(tokens) <= SHINGLE_SIZE:
+        return {' '.join(tokens)}
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """uint32 MinHash signature of a normalized text."""
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode()) % _PRIME for s in shingles(text)), dtype=np.uint64
+    )
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    """One signed 64-bit key per band, distinct between bands."""
+    rows = signature.astype('<u4').reshape(BANDS, ROWS)
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + rows[band].tobytes(), digest_size=8).digest(), 'little', signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _unpack(raw):
+    return np.frombuffer(bytes(raw), dtype='<u4')
+
+
+def _normalized_rows(rows):
+    """(id, text_hash, normalized text) for (id, question_text, option_1..4) rows."""
+    for question_id, question_text, *options in rows:
+        text = normalize(question_text, options)
+        yield question_id, hashlib.sha1(text.encode()).hexdigest(), text
+
+
+def _insert_bands(rows):
+    """
+    Insert (signature_id, key) band rows. There are BANDS rows per question,
+    so this skips model instances and goes straight to executemany().
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(QuestionBand._meta.db_table)} "
+        f"({quote('signature_id')}, {quote('key')}) VALUES (%s, %s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, list(rows))
+
+
+def _store(kind, computed):
+    """Upsert signatures and replace their band keys. `computed` is [(id, text_hash, signature)]."""
+    ids = [question_id for question_id, _, _ in computed]
+    with transaction.atomic():
+        QuestionSignature.objects.filter(kind=kind, question_id__in=ids).delete()
+        created = QuestionSignature.objects.bulk_create([
+            QuestionSignature(kind=kind, question_id=question_id, text_hash=text_hash,
+                              signature=signature.astype('<u4').tobytes())
+            for question_id, text_hash, signature in computed
+        ])
+        if created and created[0].pk is None:
+            # Backends that do not return primary keys from bulk_create
+            pks = dict(
+                QuestionSignature.objects.filter(kind=kind, question_id__in=ids).values_list('question_id', 'pk')
+            )
+            for row in created:
+                row.pk = pks[row.question_id]
+        _insert_bands(
+            (row.pk, key)
+            for row, (_, _, signature) in zip(created, computed)
+            for key in band_keys(signature)
+        )
+
+
+def update_signature(kind, question):
+    """Recompute one question's signature if its text changed."""
+    options = [getattr(question, f) for f in TEXT_FIELDS[1:]]
+    text = normalize(question.question_text, options)
+    text_hash = hashlib.sha1(text.encode()).hexdigest()
+    if QuestionSignature.objects.filter(kind=kind, question_id=question.pk, text_hash=text_hash).exists():
+        return
+    _store(kind, [(question.pk, text_hash, minhash(text))])
+
+
+def delete_signature(kind, question_id):
+    QuestionSignature.objects.filter(kind=kind, question_id=question_id).delete()
+
+
+def refresh_signatures(kind):
+    """
+    Bring stored signatures in line with a question bank: compute missing or
+    outdated ones in batches and drop those of deleted questions.
+    Returns the number of signatures written.
+    """
+    model = MODELS[kind]
+    known = dict(QuestionSignature.objects.filter(kind=kind).values_list('question_id', 'text_hash'))
+    written = 0
+    pending = []
+    rows = model.objects.order_by().values_list('id', *TEXT_FIELDS)
+    for question_id, text_hash, text in _normalized_rows(rows.iterator(chunk_size=BATCH_SIZE)):
+        if known.pop(question_id, None) == text_hash:
+            continue
+        pending.append((question_id, text_hash, minhash(text)))
+        if len(pending) >= BATCH_SIZE:
+            _store(kind, pending)
+            written += len(pending)
+            pending = []
+    if pending:
+        _store(kind, pending)
+        written += len(pending)
+    stale = list(known)
+    for i in range(0, len(stale), BATCH_SIZE):
+        QuestionSignature.objects.filter(kind=kind, question_id__in=stale[i:i + BATCH_SIZE]).delete()
+    return written
+
+
+def find_similar(kind, question_id, threshold=THRESHOLD):
+    """
+    Stored questions (from either bank) that look like near-duplicates of
+    one question: [(kind, question_id, similarity)], most similar first.
+    """
+    own = QuestionSignature.objects.filter(kind=kind, question_id=question_id).first()
+    if own is None:
+        return []
+    signature = _unpack(own.signature)
+    candidates = (
+        QuestionSignature.objects.filter(bands__key__in=band_keys(signature))
+        .exclude(pk=own.pk)
+        .distinct()
+        .values_list('kind', 'question_id', 'signature')
+    )
+    matches = []
+    for other_kind, other_id, raw in candidates:
+        score = similarity(signature, _unpack(raw))
+        if score >= threshold:
+            matches.append((other_kind, other_id, score))
+    return sorted(matches, key=lambda m: -m[2])
+
+
+def find_clusters(threshold=THRESHOLD, kinds=None):
+    """
+    Group every stored signature into near-duplicate clusters.
+
+    Buckets are built in memory from the stored band keys; candidate pairs
+    sharing a bucket are confirmed against `threshold` and merged with
+    union-find. Returns clusters (lists of (kind, question_id), size >= 2),
+    largest first.
+    """
+    signatures = QuestionSignature.objects.order_by('pk')
+    if kinds:
+        signatures = signatures.filter(kind__in=kinds)
+    members = {}
+    vectors = {}
+    for pk, kind, question_id, raw in signatures.values_list('pk', 'kind', 'question_id', 'signature').iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        members[pk] = (kind, question_id)
+        vectors[pk] = _unpack(raw)
+
+    buckets = {}
+    bands = QuestionBand.objects.filter(signature__kind__in=kinds) if kinds else QuestionBand.objects.all()
+    for signature_id, key in bands.order_by().values_list('signature_id', 'key').iterator(chunk_size=BATCH_SIZE * BANDS):
+        buckets.setdefault(key, []).append(signature_id)
+
+    parent = {pk: pk for pk in members}
+
+    def root(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    checked = set()
+    for bucket in buckets.values():
+        if len(bucket) < 2:
+            continue
+        for i, a in enumerate(bucket):
+            for b in bucket[i + 1:]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in checked or root(a) == root(b):
+                    continue
+                checked.add(pair)
+                if similarity(vectors[a], vectors[b]) >= threshold:
+                    parent[root(a)] = root(b)
+
+    clusters = {}
+    for pk in members:
+        clusters.setdefault(root(pk), []).append(members[pk])
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=len, reverse=True)
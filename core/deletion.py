@@ -0,0 +1,142 @@
+"""
+Chunked deletion of large object trees (a course, a student) in a background job.
+
+obj.delete() hands everything to Django's Collector, which loads every
+related row that has signals or further relations into memory and deletes
+the lot in one transaction; on SQLite that holds the write lock for the
+whole run. Here the CASCADE relations are walked from the model metadata
+first, and every model in the tree is then deleted leaves-first in chunks
+of CHUNK_SIZE rows, each chunk in its own short transaction. By the time a
+chunk of parents is deleted its children are already gone, so the
+Collector has almost nothing left to gather, while it still sends the
+delete signals and applies SET_NULL / PROTECT for the chunk.
+
+Files referenced by the deleted rows are removed once their chunk has
+committed. Content-addressed blobs (core.storage) are shared, so those are
+left to the post_delete handlers in core.signals, which drop one MediaBlob
+reference per row; the bytes only go with the last one.
+"""
+import logging
+import time
+
+from django.db import models, transaction
+
+from .storage import is_blob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+# Pause between chunks so other writers get the database in between
+CHUNK_PAUSE = 0.01
+
+
+def deletion_plan(queryset):
+    """
+    [(model, queryset)] covering `queryset` and every row that cascades
+    from it, children before their parents.
+    """
+    plan = []
+
+    def walk(queryset, path):
+        model = queryset.model
+        for relation in model._meta.related_objects:
+            if relation.many_to_many or relation.on_delete is not models.CASCADE:
+                continue
+            child = relation.related_model
+            if child in path:
+                continue
+            walk(
+                child._base_manager.filter(**{f'{relation.field.name}__in': queryset}),
+                path | {child},
+            )
+        plan.append((model, queryset))
+
+    walk(queryset, {queryset.model})
+    return plan
+
+
+def _file_fields(model):
+    return [f for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+
+def _release_files(fields, rows):
+    """Delete the stored files of deleted rows. Returns (removed, failed)."""
+    removed = failed = 0
+    for values in rows:
+        for field, name in zip(fields, values):
+            # Blob references are released by the post_delete handlers
+            if not name or is_blob(name):
+                continue
+            try:
+                field.storage.delete(name)
+                removed += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Could not delete {name}: {str(e)}")
+    return removed, failed
+
+
+def delete_in_chunks(model, queryset, progress=None):
+    """
+    Delete the rows of `queryset` CHUNK_SIZE at a time.
+    Returns (rows deleted, files removed, files that could not be removed).
+    """
+    fields = _file_fields(model)
+    deleted = removed = failed = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not pks:
+            break
+        chunk = model._base_manager.filter(pk__in=pks)
+        with transaction.atomic():
+            files = list(chunk.values_list(*(f.attname for f in fields))) if fields else []
+            chunk.delete()
+        deleted += len(pks)
+        if files:
+            done, errors = _release_files(fields, files)
+            removed += done
+            failed += errors
+        if progress:
+            progress(len(pks))
+        time.sleep(CHUNK_PAUSE)
+    return deleted, removed, failed
+
+
+def purge(job, model, pks, label):
+    """
+    Background task: delete the `model` rows with the given primary keys and
+    everything that cascades from them. Returns the report stored as the job result.
+    """
+    plan = deletion_plan(model._base_manager.filter(pk__in=pks))
+    counts = [(m, qs, qs.count()) for m, qs in plan]
+    # Rows reachable two ways (e.g. a topic's assignments are also the course's) are
+    # counted twice here; the total shrinks as the second pass finds them gone.
+    total = sum(count for _, _, count in counts)
+    job.report(0, total=total, message=f'Deleting {label}')
+
+    done = 0
+
+    def progress(rows):
+        nonlocal done
+        done += rows
+        job.report(min(done, total))
+
+    report = {}
+    files_removed = files_failed = 0
+    for m, qs, count in counts:
+        if not count:
+            continue
+        deleted, removed, failed = delete_in_chunks(m, qs, progress)
+        if deleted < count:
+            total -= count - deleted
+            job.report(done, total=total)
+        name = str(m._meta.verbose_name).capitalize()
+        report[name] = report.get(name, 0) + deleted
+        files_removed += removed
+        files_failed += failed
+
+    report['files_removed'] = files_removed
+    if files_failed:
+        report['files_not_removed'] = files_failed
+    job.report(total, message=f'Deleted {label}: {done} rows, {files_removed} files')
+    return report
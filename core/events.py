@@ -0,0 +1,125 @@
+"""
+In-process event bus for live admin pages.
+
+publish() is called from ordinary synchronous code, usually a post_save
+handler once its transaction has committed. A subscriber served by an event
+loop (ASGI) gets an asyncio queue that events are handed to with
+call_soon_threadsafe; one served by a worker thread (WSGI) gets a
+thread-safe queue. Either way publishing never blocks on a client. A
+subscriber that falls MAX_PENDING events behind drops the rest until it
+catches up; live pages re-read a full snapshot every interval.
+
+Events do not leave the process: with several server processes each one
+only sees the writes it handled itself, and the periodic snapshot covers
+the others.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING = 1000
+
+_subscribers = set()
+_lock = threading.Lock()
+
+
+class Subscription:
+    """Events delivered to one listener, read from the loop that subscribed."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def next_batch(self, timeout):
+        """Wait up to `timeout` seconds for events; return all that are waiting."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        events = [event]
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+
+class ThreadSubscription:
+    """Events delivered to one listener that waits in a worker thread."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=MAX_PENDING)
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def next_batch(self, timeout):
+        """Block up to `timeout` seconds for events; return all that are waiting."""
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+def subscribe(threaded=False):
+    """
+    Start receiving events: from the running event loop, or with
+    `threaded=True` from the calling thread.
+    """
+    subscription = ThreadSubscription() if threaded else Subscription()
+    with _lock:
+        _subscribers.add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        _subscribers.discard(subscription)
+
+
+def has_subscribers():
+    """Whether anyone is listening, so publishers can skip preparing an event."""
+    return bool(_subscribers)
+
+
+def publish(kind, **data):
+    """Send an event to every current subscriber."""
+    with _lock:
+        subscribers = list(_subscribers)
+    if not subscribers:
+        return
+    event = {'type': kind, 'at': time.time(), **data}
+    for subscription in subscribers:
+        try:
+            subscription.deliver(event)
+        except RuntimeError:
+            # The subscriber's loop has closed without unsubscribing
+            unsubscribe(subscription)
+
+
+def publish_on_commit(kind, **data):
+    """publish() once the current transaction commits (at once outside one)."""
+    if not has_subscribers():
+        return
+    transaction.on_commit(lambda: publish(kind, **data))
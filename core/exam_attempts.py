@@ -0,0 +1,192 @@
+"""
+Timed final exam attempts with autosave.
+
+Starting the exam opens a FinalExamAttempt with a deadline computed on the
+server, so the time limit does not depend on the browser. While the exam
+is open the page autosaves the answers every few seconds. Autosaves are
+merged into a per-attempt cache entry and written to the database at most
+once every AUTOSAVE_INTERVAL seconds per attempt (a cache.add() lock decides
+which autosave writes), so a room full of students produces a trickle of
+writes rather than one per keystroke. Submitting, or coming back after the
+deadline, grades whatever the cache or the database holds.
+
+Answers saved after an attempt's last write would otherwise only live in
+the cache, so flush_autosaves() writes every open attempt's buffered
+answers: at most once per AUTOSAVE_INTERVAL from whichever autosave comes
+along, and from `manage.py flush_exam_autosaves`, which cron should run
+every minute or so. The command also grades attempts whose time ran out
+without the student coming back (close_expired_attempts()). The buffer
+must be in a cache shared by every server process and the command (see
+CACHES in settings).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .exam_forms import grade_form, new_form
+from .models import FinalExamAttempt, FinalExamSubmission, Progress
+
+AUTOSAVE_INTERVAL = getattr(settings, 'EXAM_AUTOSAVE_INTERVAL', 15)
+# Submissions arriving this long after the deadline are still accepted.
+GRACE_SECONDS = 30
+FLUSH_GATE_KEY = 'exam:autosave:flush-gate'
+# Buffered answers outlive an attempt's deadline by at most this long
+BUFFER_GRACE = GRACE_SECONDS + AUTOSAVE_INTERVAL * 4
+FLUSH_BATCH = 500
+
+
+def _answers_key(attempt_id):
+    return f'exam:autosave:{attempt_id}'
+
+
+def _lock_key(attempt_id):
+    return f'exam:autosave:lock:{attempt_id}'
+
+
+def open_attempt(student, exam):
+    """The student's open attempt for the exam, or None."""
+    return (
+        FinalExamAttempt.objects.filter(student=student, exam=exam, status='active')
+        .order_by('-started_at')
+        .first()
+    )
+
+
+def active_attempt(student, exam):
+    """The student's open attempt for the exam, starting one if needed."""
+    attempt = open_attempt(student, exam)
+    if attempt is None:
+        attempt = FinalExamAttempt.objects.create(
+            student=student,
+            exam=exam,
+            form=new_form(exam),
+            deadline=timezone.now() + timedelta(minutes=exam.duration_minutes),
+        )
+    return attempt
+
+
+def remaining_seconds(attempt):
+    return max(0, int((attempt.deadline - timezone.now()).total_seconds()))
+
+
+def is_expired(attempt):
+    """True once the deadline and the grace period have both passed."""
+    return timezone.now() > attempt.deadline + timedelta(seconds=GRACE_SECONDS)
+
+
+def parse_answers(data, count):
+    """{form position: option} from q<i> fields; missing or invalid fields are skipped."""
+    answers = {}
+    for i in range(count):
+        value = data.get(f'q{i}')
+        if value in (None, ''):
+            continue
+        try:
+            option = int(value)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= option <= 4:
+            answers[str(i)] = option
+    return answers
+
+
+def saved_answers(attempt):
+    """Latest answers: the coalesced cache entry if present, else the database copy."""
+    answers = cache.get(_answers_key(attempt.id))
+    return answers if answers is not None else dict(attempt.answers or {})
+
+
+def autosave(attempt, answers):
+    """
+    Merge partial answers into the attempt. Returns True if this call also
+    wrote them to the database.
+    """
+    merged = saved_answers(attempt)
+    merged.update(answers)
+    cache.set(_answers_key(attempt.id), merged, remaining_seconds(attempt) + BUFFER_GRACE)
+
+    if not cache.add(_lock_key(attempt.id), 1, AUTOSAVE_INTERVAL):
+        if cache.add(FLUSH_GATE_KEY, True, AUTOSAVE_INTERVAL):
+            flush_autosaves()
+        return False
+    now = timezone.now()
+    FinalExamAttempt.objects.filter(pk=attempt.pk, status='active').update(answers=merged, saved_at=now)
+    attempt.answers, attempt.saved_at = merged, now
+    return True
+
+
+def flush_autosaves():
+    """Write the buffered answers of open attempts that have unsaved changes. Returns attempts written."""
+    cutoff = timezone.now() - timedelta(seconds=BUFFER_GRACE)
+    stored = dict(
+        FinalExamAttempt.objects.filter(status='active', deadline__gt=cutoff).values_list('id', 'answers')
+    )
+    ids = list(stored)
+    written = 0
+    for start in range(0, len(ids), FLUSH_BATCH):
+        keys = {_answers_key(attempt_id): attempt_id for attempt_id in ids[start:start + FLUSH_BATCH]}
+        now = timezone.now()
+        for key, answers in cache.get_many(list(keys)).items():
+            attempt_id = keys[key]
+            if answers != (stored[attempt_id] or {}):
+                written += FinalExamAttempt.objects.filter(pk=attempt_id, status='active').update(
+                    answers=answers, saved_at=now
+                )
+    return written
+
+
+def close_expired_attempts():
+    """Grade the open attempts whose time (and grace period) ran out. Returns attempts closed."""
+    cutoff = timezone.now() - timedelta(seconds=GRACE_SECONDS)
+    closed = 0
+    expired = FinalExamAttempt.objects.filter(status='active', deadline__lt=cutoff).select_related('exam', 'student')
+    for attempt in expired.iterator():
+        progress = Progress.objects.filter(student=attempt.student, course_id=attempt.exam.course_id).first()
+        if progress and submit_attempt(attempt, progress):
+            closed += 1
+    return closed
+
+
+def submit_attempt(attempt, progress, answers=None):
+    """
+    Grade and close an attempt, recording the FinalExamSubmission and the
+    progress/certificate fields. `answers` (from the final POST) are merged
+    over the autosaved ones. Returns the submission, or None if the attempt
+    was already closed by a concurrent request.
+    """
+    merged = saved_answers(attempt)
+    if answers:
+        merged.update(answers)
+
+    now = timezone.now()
+    closed = FinalExamAttempt.objects.filter(pk=attempt.pk, status='active').update(
+        status='submitted', submitted_at=now, answers=merged, saved_at=now
+    )
+    cache.delete_many([_answers_key(attempt.id), _lock_key(attempt.id)])
+    if not closed:
+        return None
+
+    form = attempt.form
+    score, selected, corrects = grade_form(form, [merged.get(str(i), 0) for i in range(len(form['ids']))])
+    passed = score >= attempt.exam.pass_mark
+    submission = FinalExamSubmission.objects.create(
+        student=attempt.student,
+        course_id=attempt.exam.course_id,
+        score=score,
+        passed=passed,
+        details={
+            'question_ids': form['ids'],
+            'selected': selected,
+            'corrects': corrects,
+            'seed': form['seed'],
+        }
+    )
+
+    progress.final_exam_score = score
+    progress.final_exam_passed = passed
+    if passed and not progress.certificate_issued_at:
+        progress.certificate_issued_at = now
+    progress.save()
+    return submission
@@ -0,0 +1,102 @@
+"""
+Per-student final exam forms.
+
+Each student gets a seeded random subset of the exam's questions, in a
+seeded order, with the options of every question shuffled. The subset is
+drawn in Python from a cached (id, correct option) pool, so the database is
+never asked to ORDER BY RANDOM() and the question table is only read for
+the rows actually shown.
+
+A form is kept on the student's FinalExamAttempt as the seed, the chosen
+question ids and their answer keys (a digit string). The option order is
+re-derived from the seed, and grading needs nothing else, so a submission
+is scored without touching the question table at all.
+"""
+import random
+import secrets
+
+from django.core.cache import cache
+
+from .models import FinalExamQuestion
+
+POOL_CACHE_TIMEOUT = 60 * 60
+OPTIONS = (1, 2, 3, 4)
+
+
+def _pool_key(exam_id):
+    return f'final_exam_pool:{exam_id}'
+
+
+def question_pool(exam_id):
+    """Cached {'ids': [...], 'keys': [...]} for every question of an exam."""
+    pool = cache.get(_pool_key(exam_id))
+    if pool is None:
+        rows = list(
+            FinalExamQuestion.objects.filter(exam_id=exam_id).order_by('id').values_list('id', 'correct_option')
+        )
+        pool = {'ids': [r[0] for r in rows], 'keys': [r[1] for r in rows]}
+        cache.set(_pool_key(exam_id), pool, POOL_CACHE_TIMEOUT)
+    return pool
+
+
+def invalidate_question_pool(exam_id):
+    cache.delete(_pool_key(exam_id))
+
+
+def option_orders(seed, count):
+    """The shuffled option order of each of a form's `count` questions."""
+    rng = random.Random(f'{seed}:options')
+    orders = []
+    for _ in range(count):
+        order = list(OPTIONS)
+        rng.shuffle(order)
+        orders.append(order)
+    return orders
+
+
+def new_form(exam, seed=None):
+    """Draw a form of up to exam.num_questions questions from the pool."""
+    if seed is None:
+        seed = secrets.randbits(32)
+    pool = question_pool(exam.id)
+    count = min(exam.num_questions, len(pool['ids']))
+    picks = random.Random(seed).sample(range(len(pool['ids'])), count)
+    return {
+        'seed': seed,
+        'ids': [pool['ids'][i] for i in picks],
+        'keys': ''.join(str(pool['keys'][i]) for i in picks),
+    }
+
+
+def render_form(form, answers=None):
+    """
+    Questions in form order, each with its position in the form
+    (`form_index`), an `options` list of (value, text) pairs in its
+    shuffled order and the `saved` answer from `answers`, if any. Values
+    are the original option numbers.
+    """
+    answers = answers or {}
+    questions = FinalExamQuestion.objects.in_bulk(form['ids'])
+    rendered = []
+    for index, (question_id, order) in enumerate(zip(form['ids'], option_orders(form['seed'], len(form['ids'])))):
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        question.form_index = index
+        question.saved = answers.get(str(index))
+        question.options = [(option, getattr(question, f'option_{option}')) for option in order]
+        rendered.append(question)
+    return rendered
+
+
+def grade_form(form, answers):
+    """
+    Score a form. `answers` are the submitted option numbers in form order
+    (0 for unanswered). Returns (score percent, selected, corrects).
+    """
+    corrects = [int(k) for k in form['keys']]
+    selected = [a if a in OPTIONS else 0 for a in answers[:len(corrects)]]
+    selected += [0] * (len(corrects) - len(selected))
+    right = sum(1 for a, b in zip(selected, corrects) if a == b)
+    score = int(right / max(len(corrects), 1) * 100)
+    return score, selected, corrects
@@ -0,0 +1,241 @@
+"""
+Classical item analysis over stored exam responses.
+
+Each attempt is a (question_ids, selected, corrects) triple, the shape kept
+in FinalExamSubmission.details and packed into MCQAttempt rows. Attempts
+are read from the database in chunks and flattened into NumPy arrays;
+every chunk is folded into a set of per-item sufficient statistics (counts
+and score sums), from which the difficulty, point-biserial discrimination,
+distractor rates and KR-20 reliability are derived. Because the statistics
+are additive, the cached state for an exam or topic only ever needs the
+attempts that arrived since it was last updated.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .attempts import unpack_attempt
+from .models import FinalExam, FinalExamSubmission, MCQAttempt
+
+CHUNK_SIZE = 2000
+CACHE_TIMEOUT = 60 * 60 * 24
+# Column 0 counts unanswered questions, 1-4 the options.
+NUM_CHOICES = 5
+# Items discriminating below this are flagged for review.
+LOW_DISCRIMINATION = 0.2
+
+
+def _cache_key(exam_id):
+    return f'item_analysis:exam:{exam_id}'
+
+
+def _topic_cache_key(topic_id):
+    return f'item_analysis:topic:{topic_id}'
+
+
+class ItemStats:
+    """Additive response statistics for a set of questions."""
+
+    def __init__(self):
+        self.index = {}
+        self.question_ids = []
+        self.presented = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.choices = np.zeros((0, NUM_CHOICES), dtype=np.int64)
+        # Sums of the attempt's raw score over the attempts that saw the item:
+        # all of them, only those answering it correctly, and squared.
+        self.score_sum = np.zeros(0)
+        self.score_sum_correct = np.zeros(0)
+        self.score_sq_sum = np.zeros(0)
+        self.attempts = 0
+        self.items_sum = 0
+        self.total_sum = 0
+        self.total_sq_sum = 0
+        self.last_id = 0
+
+    def _columns(self, question_ids):
+        """Map an array of question ids to column numbers, adding new ones."""
+        unique, inverse = np.unique(question_ids, return_inverse=True)
+        new = [int(q) for q in unique if int(q) not in self.index]
+        if new:
+            for qid in new:
+                self.index[qid] = len(self.question_ids)
+                self.question_ids.append(qid)
+            grow = len(new)
+            self.presented = np.pad(self.presented, (0, grow))
+            self.correct = np.pad(self.correct, (0, grow))
+            self.choices = np.pad(self.choices, ((0, grow), (0, 0)))
+            self.score_sum = np.pad(self.score_sum, (0, grow))
+            self.score_sum_correct = np.pad(self.score_sum_correct, (0, grow))
+            self.score_sq_sum = np.pad(self.score_sq_sum, (0, grow))
+        lookup = np.array([self.index[int(q)] for q in unique], dtype=np.int64)
+        return lookup[inverse]
+
+    def add(self, attempts):
+        """Fold a list of (question_ids, selected, corrects) attempts in."""
+        qids, selected, corrects, lengths = [], [], [], []
+        for question_ids, chosen, answers in attempts:
+            size = min(len(question_ids), len(chosen), len(answers))
+            if size == 0:
+                continue
+            qids.extend(question_ids[:size])
+            selected.extend(chosen[:size])
+            corrects.extend(answers[:size])
+            lengths.append(size)
+        if not lengths:
+            return
+
+        lengths = np.array(lengths, dtype=np.int64)
+        attempt = np.repeat(np.arange(len(lengths)), lengths)
+        selected = np.array(selected, dtype=np.int64)
+        selected[(selected < 0) | (selected >= NUM_CHOICES)] = 0
+        scored = ((selected == np.array(corrects, dtype=np.int64)) & (selected != 0)).astype(np.float64)
+        column = self._columns(np.array(qids, dtype=np.int64))
+        width = len(self.question_ids)
+
+        totals = np.bincount(attempt, weights=scored, minlength=len(lengths))
+        score = totals[attempt]
+
+        self.presented += np.bincount(column, minlength=width)
+        self.correct += np.bincount(column, weights=scored, minlength=width).astype(np.int64)
+        self.choices += np.bincount(column * NUM_CHOICES + selected, minlength=width * NUM_CHOICES).reshape(
+            width, NUM_CHOICES
+        )
+        self.score_sum += np.bincount(column, weights=score, minlength=width)
+        self.score_sum_correct += np.bincount(column, weights=score * scored, minlength=width)
+        self.score_sq_sum += np.bincount(column, weights=score * score, minlength=width)
+
+        self.attempts += len(lengths)
+        self.items_sum += int(lengths.sum())
+        self.total_sum += float(totals.sum())
+        self.total_sq_sum += float((totals * totals).sum())
+
+    def consume(self, rows):
+        """
+        Fold in (id, details) rows in chunks. Returns True if any row was read.
+        """
+        batch = []
+        seen = False
+        for row_id, details in rows:
+            seen = True
+            self.last_id = max(self.last_id, row_id)
+            if details:
+                batch.append((
+                    details.get('question_ids') or [],
+                    details.get('selected') or [],
+                    details.get('corrects') or [],
+                ))
+            if len(batch) >= CHUNK_SIZE:
+                self.add(batch)
+                batch = []
+        if batch:
+            self.add(batch)
+        return seen
+
+    def summary(self):
+        """
+        Per-question statistics and test reliability.
+
+        Returns {'items': {question_id: {...}}, 'attempts': n, 'kr20': float or None}.
+        Discrimination is the point-biserial correlation between the item
+        and the rest of the attempt (the attempt's score without that item),
+        so an item does not correlate with itself.
+        """
+        n = self.presented.astype(np.float64)
+        n1 = self.correct.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = n1 / n
+            # Rest score R = T - x for every attempt that saw the item.
+            rest_sum = self.score_sum - n1
+            rest_sum_correct = self.score_sum_correct - n1
+            rest_sq_sum = self.score_sq_sum - 2 * self.score_sum_correct + n1
+            mean_correct = rest_sum_correct / n1
+            mean_wrong = (rest_sum - rest_sum_correct) / (n - n1)
+            rest_sd = np.sqrt(np.maximum(rest_sq_sum / n - (rest_sum / n) ** 2, 0))
+            discrimination = (mean_correct - mean_wrong) / rest_sd * np.sqrt(p * (1 - p))
+            rates = self.choices / n[:, None]
+
+        items = {}
+        for qid, col in self.index.items():
+            if not self.presented[col]:
+                continue
+            r = discrimination[col]
+            items[qid] = {
+                'responses': int(self.presented[col]),
+                'difficulty': round(float(p[col]), 3),
+                'discrimination': round(float(r), 3) if np.isfinite(r) else None,
+                'unanswered': round(float(rates[col, 0]), 3),
+                'option_rates': [round(float(v), 3) for v in rates[col, 1:]],
+            }
+            items[qid]['flagged'] = (
+                items[qid]['discrimination'] is not None and items[qid]['discrimination'] < LOW_DISCRIMINATION
+            )
+
+        return {'items': items, 'attempts': self.attempts, 'kr20': self.kr20(p)}
+
+    def kr20(self, p=None):
+        """
+        KR-20 reliability. When attempts saw different question sets the
+        item variances are weighted by how often each item was presented and
+        k is the mean test length.
+        """
+        if self.attempts < 2:
+            return None
+        if p is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                p = self.correct / self.presented
+        k = self.items_sum / self.attempts
+        mean = self.total_sum / self.attempts
+        variance = self.total_sq_sum / self.attempts - mean * mean
+        if k <= 1 or variance <= 0:
+            return None
+        seen = self.presented > 0
+        item_variance = float((p[seen] * (1 - p[seen]) * self.presented[seen]).sum()) / self.attempts
+        return round(k / (k - 1) * (1 - item_variance / variance), 3)
+
+
+def analyze(rows):
+    """Uncached analysis of an iterable of (id, details) rows."""
+    stats = ItemStats()
+    stats.consume(rows)
+    return stats.summary()
+
+
+def exam_item_analysis(exam):
+    """
+    Item analysis for a final exam, reusing the cached statistics and
+    reading only submissions newer than the last one folded in.
+    """
+    key = _cache_key(exam.id)
+    stats = cache.get(key) or ItemStats()
+    rows = (
+        FinalExamSubmission.objects.filter(course_id=exam.course_id, id__gt=stats.last_id)
+        .order_by('id')
+        .values_list('id', 'details')
+    )
+    if stats.consume(rows.iterator(chunk_size=CHUNK_SIZE)):
+        cache.set(key, stats, CACHE_TIMEOUT)
+    return stats.summary()
+
+
+def topic_item_analysis(topic):
+    """Item analysis for a topic's MCQs over the stored quiz attempts."""
+    key = _topic_cache_key(topic.id)
+    stats = cache.get(key) or ItemStats()
+    rows = (
+        MCQAttempt.objects.filter(topic=topic, id__gt=stats.last_id)
+        .order_by('id')
+        .values_list('id', 'question_ids', 'answers')
+    )
+    attempts = (
+        (row_id, dict(zip(('question_ids', 'selected', 'corrects'), unpack_attempt(ids, answers))))
+        for row_id, ids, answers in rows.iterator(chunk_size=CHUNK_SIZE)
+    )
+    if stats.consume(attempts):
+        cache.set(key, stats, CACHE_TIMEOUT)
+    return stats.summary()
+
+
+def invalidate_exam_analysis(course_id):
+    """Drop cached statistics, e.g. after submissions were deleted."""
+    for exam_id in FinalExam.objects.filter(course_id=course_id).values_list('id', flat=True):
+        cache.delete(_cache_key(exam_id))
@@ -0,0 +1,105 @@
+"""
+Background jobs for long admin tasks.
+
+start_job() records a BackgroundJob and hands the task to a small thread
+pool in the web process, so the request that started it returns at once.
+The task receives the job and calls job.report() as it goes; whatever it
+returns is stored as the job's result. The admin's job page polls
+api_job_status for progress.
+
+Jobs live in the process that started them: a job that was running when
+the server restarted stays 'running' and has to be started again.
+live_job() tells such a job from a live one: a job counts as live while
+this process still holds it, or while it has reported progress within
+STALE_AFTER seconds; anything older is marked failed.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = getattr(settings, 'BACKGROUND_JOB_WORKERS', 2)
+# Seconds without a progress report after which another process's job counts as lost
+STALE_AFTER = getattr(settings, 'BACKGROUND_JOB_STALE_AFTER', 15 * 60)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='background-job')
+# Ids of the jobs queued or running in this process
+_held = set()
+
+
+def start_job(kind, user, task, *args, total=0, target='', **kwargs):
+    """
+    Create a job and run task(job, *args, **kwargs) in the background.
+    `target` names what the job works on, for live_job().
+    """
+    job = BackgroundJob.objects.create(kind=kind, created_by=user, total=total, target=target)
+    _held.add(job.pk)
+    # Start only once the job row is visible to the worker's connection
+    transaction.on_commit(lambda: _executor.submit(_run, job.pk, task, args, kwargs))
+    return job
+
+
+def live_job(kind, target):
+    """
+    The queued or running job of `kind` on `target` that is still alive, or
+    None. Jobs left behind by a restart are marked failed on the way.
+    """
+    cutoff = timezone.now() - timedelta(seconds=STALE_AFTER)
+    lost = []
+    for job in BackgroundJob.objects.filter(kind=kind, target=target, status__in=('queued', 'running')):
+        if job.pk in _held or job.updated_at >= cutoff:
+            return job
+        lost.append(job.pk)
+    if lost:
+        BackgroundJob.objects.filter(pk__in=lost, status__in=('queued', 'running')).update(
+            status='failed', message='Interrupted by a server restart', finished_at=timezone.now()
+        )
+    return None
+
+
+def _run(job_id, task, args, kwargs):
+    close_old_connections()
+    try:
+        job = BackgroundJob.objects.get(pk=job_id)
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+        try:
+            result = task(job, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background job {job.kind} #{job.pk} failed: {str(e)}")
+            job.status = 'failed'
+            job.message = str(e)[:255]
+        else:
+            job.status = 'done'
+            job.processed = max(job.processed, job.total)
+            if result is not None:
+                job.result = result
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'processed', 'total', 'message', 'result', 'updated_at', 'finished_at'])
+    except Exception as e:
+        logger.error(f"Error running background job #{job_id}: {str(e)}")
+    finally:
+        _held.discard(job_id)
+        close_old_connections()
+
+
+def job_status(job):
+    """JSON-friendly view of a job for the polling endpoint."""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'percent': job.percent,
+        'message': job.message,
+        'result': job.result if job.status in ('done', 'failed') else None,
+    }
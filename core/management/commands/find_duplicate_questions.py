@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dedup import MODELS, THRESHOLD, find_clusters, refresh_signatures
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh MinHash signatures for MCQ and final exam questions and list '
+        'clusters of near-duplicate questions. Nothing is deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['mcq', 'exam', 'all'], default='all',
+                            help='Question bank(s) to check (default: both, including across banks)')
+        parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help=f'Minimum estimated similarity (default {THRESHOLD})')
+        parser.add_argument('--skip-refresh', action='store_true', help='Use the stored signatures as they are')
+
+    def handle(self, *args, **options):
+        kinds = list(MODELS) if options['kind'] == 'all' else [options['kind']]
+        started = time.monotonic()
+
+        if not options['skip_refresh']:
+            for kind in kinds:
+                written = refresh_signatures(kind)
+                self.stdout.write(f"{kind}: {written} signatures computed.")
+
+        clusters = find_clusters(options['threshold'], kinds)
+        for number, cluster in enumerate(clusters, start=1):
+            members = ', '.join(f"{kind}#{question_id}" for kind, question_id in cluster)
+            self.stdout.write(f"Cluster {number} ({len(cluster)} questions): {members}")
+
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(clusters)} clusters, {duplicates} redundant questions "
+            f"({time.monotonic() - started:.1f}s)."
+        ))
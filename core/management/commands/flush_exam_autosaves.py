@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.exam_attempts import close_expired_attempts, flush_autosaves
+
+
+class Command(BaseCommand):
+    help = (
+        'Write buffered final exam autosaves to the database and grade attempts whose time ran out '
+        '(needs the shared Redis cache, see REDIS_URL).'
+    )
+
+    def handle(self, *args, **options):
+        written = flush_autosaves()
+        closed = close_expired_attempts()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {written} attempts, closed {closed} expired attempts."))
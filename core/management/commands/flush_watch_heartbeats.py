@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.watch import flush_heartbeats
+
+
+class Command(BaseCommand):
+    help = 'Write buffered video-watch heartbeats to TopicCompletion (needs the shared Redis cache, see REDIS_URL).'
+
+    def handle(self, *args, **options):
+        updated = flush_heartbeats()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {updated} watch records."))
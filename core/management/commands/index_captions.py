@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.captions import index_topic_tracks
+from core.models import Topic
+
+
+class Command(BaseCommand):
+    help = 'Parse topic caption and chapter files into the CaptionCue index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', type=int, action='append', help='Only index this topic id (repeatable)')
+
+    def handle(self, *args, **options):
+        topics = Topic.objects.all()
+        if options['topic']:
+            topics = topics.filter(id__in=options['topic'])
+
+        total = 0
+        for topic in topics.iterator():
+            count = index_topic_tracks(topic)
+            total += count
+            self.stdout.write(f"{topic}: {count} cues")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} cues."))
@@ -0,0 +1,182 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils import timezone
+
+from core.models import MediaBlob, UploadSession
+from core.storage import is_blob
+from core.uploads import UPLOAD_EXPIRY, expire_uploads
+
+
+def _human(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = (
+        'Find files under MEDIA_ROOT that no FileField references, and chunked uploads '
+        'that were abandoned, and report them. Nothing is removed unless --delete is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete orphaned files (default is a dry run)')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Ignore files modified in the last N seconds (default 3600)')
+        parser.add_argument('--upload-age', type=int, default=UPLOAD_EXPIRY,
+                            help=f'Discard chunked uploads untouched for N seconds (default {UPLOAD_EXPIRY})')
+        parser.add_argument('--workers', type=int, default=8, help='Threads used to scan and delete')
+        parser.add_argument('--verbose-list', action='store_true', help='Print every orphaned file')
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        if not os.path.isdir(root):
+            self.stdout.write(f"MEDIA_ROOT {root} does not exist; nothing to do.")
+            return
+
+        sessions, strays = expire_uploads(options['upload_age'], dry_run=not options['delete'])
+        self.stdout.write(f"Abandoned uploads: {sessions} sessions, {strays} stray temp files.")
+
+        # Blobs whose count changed after this may be mid-upload or mid-delete
+        settled_before = timezone.now() - timedelta(seconds=options['min_age'])
+        references = self.collect_references()
+        files = self.scan(root, options['workers'])
+
+        cutoff = time.time() - options['min_age']
+        orphans = []
+        referenced_bytes = 0
+        for name, (size, mtime) in files.items():
+            if name in references:
+                referenced_bytes += size
+            elif mtime < cutoff:
+                orphans.append((name, size))
+        orphan_bytes = sum(size for _, size in orphans)
+
+        if options['verbose_list']:
+            for name, size in sorted(orphans):
+                self.stdout.write(f"  {name} ({_human(size)})")
+
+        self.stdout.write(f"Scanned {len(files)} files ({_human(sum(s for s, _ in files.values()))}).")
+        self.stdout.write(f"Referenced: {len(references)} names, {_human(referenced_bytes)} on disk.")
+        self.stdout.write(f"Orphaned: {len(orphans)} files, {_human(orphan_bytes)}.")
+
+        kept = self.reconcile_blobs(references, [name for name, _ in orphans], options['delete'], settled_before)
+        orphans = [(name, size) for name, size in orphans if name not in kept]
+        orphan_bytes = sum(size for _, size in orphans)
+
+        if not options['delete']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing deleted. Re-run with --delete to remove orphans.'))
+            return
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(lambda item: self.remove(root, item[0]), orphans))
+        failures = [name for (name, _), ok in zip(orphans, results) if not ok]
+        for name in failures:
+            self.stderr.write(f"Could not delete {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {len(orphans) - len(failures)} files, freed {_human(orphan_bytes)}."
+        ))
+
+    def collect_references(self):
+        """Counter of storage names referenced by every FileField, read in streaming queries."""
+        references = Counter()
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, models.FileField):
+                    continue
+                names = (
+                    model._default_manager.exclude(**{field.name: ''})
+                    .exclude(**{f'{field.name}__isnull': True})
+                    .values_list(field.name, flat=True)
+                    .order_by()
+                )
+                references.update(names.iterator(chunk_size=5000))
+        # Completed chunked uploads hold their file until a Topic takes it over
+        references.update(
+            UploadSession.objects.filter(status='complete').exclude(stored_name='')
+            .values_list('stored_name', flat=True).order_by().iterator(chunk_size=5000)
+        )
+        return references
+
+    def scan(self, root, workers):
+        """Walk MEDIA_ROOT with a thread pool; returns {relative name: (size, mtime)}."""
+        files = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = [pool.submit(self.scan_dir, root)]
+            while pending:
+                future = pending.pop()
+                subdirs, entries = future.result()
+                for path, size, mtime in entries:
+                    files[os.path.relpath(path, root).replace(os.sep, '/')] = (size, mtime)
+                pending.extend(pool.submit(self.scan_dir, d) for d in subdirs)
+        return files
+
+    @staticmethod
+    def scan_dir(path):
+        subdirs, entries = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError:
+            pass
+        return subdirs, entries
+
+    def reconcile_blobs(self, references, orphan_names, delete, settled_before):
+        """
+        Bring MediaBlob reference counts in line with the actual FileField
+        values. Blobs changed since `settled_before` are left for the next
+        run, and each count is only rewritten if it still holds the value
+        read here, so uploads and deletes during the scan are not undone.
+        Returns the orphaned blob names whose bytes must stay.
+        """
+        stale = []
+        blobs = MediaBlob.objects.filter(updated_at__lt=settled_before).only('id', 'name', 'ref_count')
+        for blob in blobs.iterator(chunk_size=5000):
+            count = references.get(blob.name, 0)
+            if blob.ref_count != count:
+                stale.append((blob.id, blob.ref_count, count))
+        self.stdout.write(f"MediaBlob reference counts out of date: {len(stale)}.")
+        if not delete:
+            return set()
+
+        fixed = 0
+        for i in range(0, len(stale), 500):
+            with transaction.atomic():
+                for blob_id, seen, count in stale[i:i + 500]:
+                    fixed += MediaBlob.objects.filter(
+                        id=blob_id, ref_count=seen, updated_at__lt=settled_before
+                    ).update(ref_count=count)
+        if fixed != len(stale):
+            self.stdout.write(f"Skipped {len(stale) - fixed} counts that changed during the scan.")
+
+        orphan_blobs = [name for name in orphan_names if is_blob(name)]
+        kept = set()
+        for i in range(0, len(orphan_blobs), 500):
+            names = orphan_blobs[i:i + 500]
+            MediaBlob.objects.filter(name__in=names, ref_count=0, updated_at__lt=settled_before).delete()
+            # Referenced again meanwhile: the blob row still owns the bytes
+            kept.update(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        return kept
+
+    @staticmethod
+    def remove(root, name):
+        try:
+            os.remove(os.path.join(root, name))
+            return True
+        except OSError:
+            return False
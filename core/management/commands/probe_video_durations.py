@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Topic
+from core.video_info import fill_durations
+
+
+class Command(BaseCommand):
+    help = 'Read the length of topic videos that have none stored (MP4, M4V and MOV only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topic', type=int, action='append', help='Only probe this topic id (repeatable)')
+
+    def handle(self, *args, **options):
+        topics = Topic.objects.all()
+        if options['topic']:
+            topics = topics.filter(id__in=options['topic'])
+
+        filled, unreadable = fill_durations(topics)
+        self.stdout.write(self.style.SUCCESS(f"Stored the length of {filled} videos."))
+        if unreadable:
+            self.stdout.write(self.style.WARNING(
+                f"{unreadable} videos could not be read; enter their length on the topic."
+            ))
@@ -0,0 +1,86 @@
+"""
+Topic and course-level MCQ quizzes.
+
+Each quiz is QUIZ_LENGTH questions drawn in Python from a cached pool of
+(id, correct option) pairs, so the question table is only read for the rows
+actually shown and the database is never asked to ORDER BY RANDOM(). The
+pool holds every question of a course, grouped by topic (0 for the
+course-level questions) and then by difficulty.
+
+The drawn ids and their answer keys (a digit string) are kept in the
+student's session with the quiz, so a submission is graded without
+touching the question table at all.
+
+With settings.MCQ_DIFFICULTY_QUOTAS, e.g. {'easy': 3, 'medium': 5,
+'hard': 2}, each difficulty contributes up to its quota and any shortfall
+is made up from the other questions; without it questions are drawn
+uniformly.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import MCQQuestion
+
+QUIZ_LENGTH = 10
+PASS_MARK = 7
+POOL_CACHE_TIMEOUT = 60 * 60
+DIFFICULTY_QUOTAS = getattr(settings, 'MCQ_DIFFICULTY_QUOTAS', None)
+
+
+def _pool_key(course_id):
+    return f'mcq_pool:{course_id}'
+
+
+def question_pool(course_id):
+    """Cached {topic id or 0: {difficulty: [(id, correct option), ...]}} for a course."""
+    pool = cache.get(_pool_key(course_id))
+    if pool is None:
+        pool = {}
+        rows = MCQQuestion.objects.filter(course_id=course_id).order_by('id').values_list(
+            'id', 'topic_id', 'difficulty', 'correct_option'
+        )
+        for question_id, topic_id, difficulty, correct in rows:
+            pool.setdefault(topic_id or 0, {}).setdefault(difficulty, []).append((question_id, correct))
+        cache.set(_pool_key(course_id), pool, POOL_CACHE_TIMEOUT)
+    return pool
+
+
+def invalidate_question_pool(course_id):
+    cache.delete(_pool_key(course_id))
+
+
+def new_quiz(course_id, topic_id=None):
+    """Draw a quiz of up to QUIZ_LENGTH questions of a topic, or the course-level ones."""
+    strata = question_pool(course_id).get(topic_id or 0, {})
+    count = min(QUIZ_LENGTH, sum(len(rows) for rows in strata.values()))
+    picks = []
+    for difficulty, quota in (DIFFICULTY_QUOTAS or {}).items():
+        rows = strata.get(difficulty, [])
+        picks.extend(random.sample(rows, min(quota, len(rows))))
+    picks = picks[:count]
+    chosen = {question_id for question_id, _ in picks}
+    rest = [row for rows in strata.values() for row in rows if row[0] not in chosen]
+    picks.extend(random.sample(rest, count - len(picks)))
+    random.shuffle(picks)
+    return {
+        'ids': [question_id for question_id, _ in picks],
+        'keys': ''.join(str(correct) for _, correct in picks),
+    }
+
+
+def quiz_questions(quiz):
+    """The quiz's questions in quiz order (one query)."""
+    questions = MCQQuestion.objects.in_bulk(quiz['ids'])
+    return [questions[question_id] for question_id in quiz['ids'] if question_id in questions]
+
+
+def grade_quiz(quiz, answers):
+    """
+    Grade `answers` (the selected option per quiz position, 0 if none)
+    against the quiz's answer keys. Returns (correct options, score).
+    """
+    corrects = [int(key) for key in quiz['keys']]
+    score = sum(1 for selected, correct in zip(answers, corrects) if selected and selected == correct)
+    return corrects, score
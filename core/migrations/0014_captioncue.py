@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_progress_certificate_issued_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaptionCue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('caption', 'Caption'), ('chapter', 'Chapter')], max_length=10)),
+                ('language', models.CharField(blank=True, help_text='Empty for chapters', max_length=5)),
+                ('start', models.FloatField(help_text='Seconds from the start of the video')),
+                ('end', models.FloatField()),
+                ('text', models.TextField()),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cues', to='core.topic')),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['topic', 'kind', 'language', 'start'], name='core_captio_topic_i_dffa99_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_captioncue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='video_duration',
+            field=models.PositiveIntegerField(blank=True, help_text='Video length in seconds (filled in by the player)', null=True),
+        ),
+        migrations.AddField(
+            model_name='topiccompletion',
+            name='last_position',
+            field=models.FloatField(default=0.0, help_text='Last reported playback position in seconds'),
+        ),
+        migrations.AddField(
+            model_name='topiccompletion',
+            name='watch_seconds',
+            field=models.FloatField(default=0.0, help_text='Seconds of video watched (from player heartbeats)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_topic_video_duration_topiccompletion_last_position_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topiccompletion',
+            name='watch_bitmap',
+            field=models.BinaryField(blank=True, default=b'', help_text='Watched segments, one bit per segment (see core.watch)'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:40
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name, derived from the SHA-256', max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.media_storage, upload_to='assignments/files/'),
+        ),
+        migrations.AlterField(
+            model_name='mcqquestion',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.media_storage, upload_to='mcq_images/'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='submitted_file',
+            field=models.FileField(storage=core.storage.media_storage, upload_to='assignments/submissions/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='caption_en_file',
+            field=models.FileField(blank=True, help_text='English captions (.vtt)', null=True, storage=core.storage.media_storage, upload_to='topic_captions/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='caption_ta_file',
+            field=models.FileField(blank=True, help_text='Tamil captions (.vtt)', null=True, storage=core.storage.media_storage, upload_to='topic_captions/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='chapters_file',
+            field=models.FileField(blank=True, help_text='Upload WebVTT (.vtt) chapters', null=True, storage=core.storage.media_storage, upload_to='topic_chapters/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='poster_image',
+            field=models.ImageField(blank=True, help_text='Optional poster/thumbnail', null=True, storage=core.storage.media_storage, upload_to='topic_posters/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='ppt_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.media_storage, upload_to='topic_ppts/'),
+        ),
+        migrations.AlterField(
+            model_name='topic',
+            name='video_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.media_storage, upload_to='topic_videos/'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_mcqattempt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finalexam',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=60, help_text='Time limit, enforced on the server'),
+        ),
+        migrations.CreateModel(
+            name='FinalExamAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form', models.JSONField(help_text='Seed, question ids and answer keys (see core.exam_forms)')),
+                ('answers', models.JSONField(blank=True, default=dict, help_text='Form position -> selected option')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('submitted', 'Submitted')], default='active', max_length=10)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('deadline', models.DateTimeField()),
+                ('saved_at', models.DateTimeField(blank=True, null=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='core.finalexam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_exam_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'exam', 'status'], name='core_finale_student_05f8bc_idx')],
+            },
+        ),
+    ]
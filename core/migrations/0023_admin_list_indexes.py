@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_background_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['created_at', 'id'], name='core_assign_created_c61965_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['course', 'created_at', 'id'], name='core_assign_course__64140c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mcqquestion',
+            index=models.Index(fields=['course', 'id'], name='core_mcqque_course__32d697_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mcqquestion',
+            index=models.Index(fields=['topic', 'id'], name='core_mcqque_topic_i_0e5b06_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='core_paymen_payment_9fd906_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'payment_date', 'id'], name='core_paymen_student_40ffe4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at', 'id'], name='core_submis_submitt_5fb6e8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'submitted_at', 'id'], name='core_submis_assignm_586985_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['reviewed', 'submitted_at', 'id'], name='core_submis_reviewe_162de5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['course', 'order', 'id'], name='core_topic_course__6fca3f_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_submission_grading_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='topic',
+            name='video_duration',
+            field=models.PositiveIntegerField(blank=True, help_text='Video length in seconds (read from MP4 uploads, otherwise entered by an admin)', null=True),
+        ),
+    ]
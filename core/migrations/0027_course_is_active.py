@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_file_display_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_course_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last change of ref_count'),
+        ),
+    ]
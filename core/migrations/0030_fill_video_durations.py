@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def fill_video_durations(apps, schema_editor):
+    from core.video_info import fill_durations
+
+    fill_durations(apps.get_model('core', 'Topic').objects.using(schema_editor.connection.alias))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_mcqquestion_difficulty'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_video_durations, migrations.RunPython.noop),
+    ]
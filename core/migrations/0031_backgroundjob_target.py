@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_fill_video_durations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='target',
+            field=models.CharField(blank=True, help_text="What the job works on, e.g. 'course:12'", max_length=100),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last progress report'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundjob',
+            index=models.Index(fields=['kind', 'target'], name='core_backgr_kind_5d69e2_idx'),
+        ),
+    ]
@@ -1,13 +1,23 @@
+import uuid
+
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from accounts.models import CustomUser
+from .storage import media_storage
 from django.contrib.auth.models import User  # kept for backward compat but we use CustomUser
 
 
 # ------------------------------
 # Course Model
 # ------------------------------ 
+class VisibleCourseManager(models.Manager):
+    """Courses that are not being deleted."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
 class Course(models.Model):
     """
     Represents a course with title, description, and class level.
@@ -21,6 +31,12 @@ class Course(models.Model):
     description = models.TextField()
     class_level = models.CharField(max_length=5, choices=CLASS_LEVELS)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Cleared when the course is deleted, so it disappears at once while the
+    # background purge (core.deletion) removes its contents
+    is_active = models.BooleanField(default=True)
+
+    objects = VisibleCourseManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.title
@@ -29,20 +45,44 @@ class Assignment(models.Model):
     topic = models.ForeignKey('Topic', on_delete=models.CASCADE, related_name='assignments', null=True, blank=True, help_text='Optional: attach assignment to specific topic')
     title = models.CharField(max_length=200)
     description = models.TextField()
-    file = models.FileField(upload_to='assignments/files/', null=True, blank=True)
+    file = models.FileField(upload_to='assignments/files/', storage=media_storage, null=True, blank=True)
+    # Original filename of `file`; the stored name is a content hash (core.storage)
+    file_name = models.CharField(max_length=255, blank=True)
     due_date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Keyset pagination in the admin (admin_panel.pagination)
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['course', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.title}-{self.course.title}"
 class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    submitted_file = models.FileField(upload_to='assignments/submissions/')
+    submitted_file = models.FileField(upload_to='assignments/submissions/', storage=media_storage)
+    submitted_file_name = models.CharField(max_length=255, blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
     grade = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     feedback = models.TextField(blank=True, null=True)
     reviewed = models.BooleanField(default=False)
+    # Bumped on every grade change; bulk grading refuses to overwrite a newer version
+    version = models.PositiveIntegerField(default=0)
+    graded_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='graded_submissions'
+    )
+    graded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at', 'id']),
+            models.Index(fields=['assignment', 'submitted_at', 'id']),
+            models.Index(fields=['reviewed', 'submitted_at', 'id']),
+            models.Index(fields=['assignment', 'reviewed']),
+        ]
 
     def is_late(self):
         return self.submitted_at > self.assignment.due_date
@@ -62,17 +102,22 @@ class Topic(models.Model):
     """
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='topics')
     title = models.CharField(max_length=200)
-    video_file = models.FileField(upload_to='topic_videos/', blank=True, null=True)
-    poster_image = models.ImageField(upload_to='topic_posters/', blank=True, null=True, help_text='Optional poster/thumbnail')
-    caption_en_file = models.FileField(upload_to='topic_captions/', blank=True, null=True, help_text='English captions (.vtt)')
-    caption_ta_file = models.FileField(upload_to='topic_captions/', blank=True, null=True, help_text='Tamil captions (.vtt)')
-    chapters_file = models.FileField(upload_to='topic_chapters/', blank=True, null=True, help_text='Upload WebVTT (.vtt) chapters')
-    ppt_file = models.FileField(upload_to='topic_ppts/', blank=True, null=True)
+    video_file = models.FileField(upload_to='topic_videos/', storage=media_storage, blank=True, null=True)
+    poster_image = models.ImageField(upload_to='topic_posters/', storage=media_storage, blank=True, null=True, help_text='Optional poster/thumbnail')
+    caption_en_file = models.FileField(upload_to='topic_captions/', storage=media_storage, blank=True, null=True, help_text='English captions (.vtt)')
+    caption_ta_file = models.FileField(upload_to='topic_captions/', storage=media_storage, blank=True, null=True, help_text='Tamil captions (.vtt)')
+    chapters_file = models.FileField(upload_to='topic_chapters/', storage=media_storage, blank=True, null=True, help_text='Upload WebVTT (.vtt) chapters')
+    ppt_file = models.FileField(upload_to='topic_ppts/', storage=media_storage, blank=True, null=True)
+    # Original filenames of the uploads shown to admins and students
+    video_file_name = models.CharField(max_length=255, blank=True)
+    ppt_file_name = models.CharField(max_length=255, blank=True)
+    video_duration = models.PositiveIntegerField(null=True, blank=True, help_text='Video length in seconds (read from MP4 uploads, otherwise entered by an admin)')
     order = models.PositiveIntegerField()
     assignment = models.JSONField(null=True, blank=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [models.Index(fields=['course', 'order', 'id'])]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -92,11 +137,94 @@ class Topic(models.Model):
         if self.chapters_file and not has_ext(self.chapters_file, {'.vtt'}):
             from django.core.exceptions import ValidationError
             raise ValidationError({'chapters_file': 'Chapters must be WebVTT (.vtt).'})
+
+
+# ------------------------------
+# CaptionCue Model
+# ------------------------------
+class CaptionCue(models.Model):
+    """
+    One parsed WebVTT cue from a topic's caption or chapters file.
+    Rebuilt whenever the source file changes (see core.captions).
+    """
+    KINDS = (
+        ('caption', 'Caption'),
+        ('chapter', 'Chapter'),
+    )
+
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='cues')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    language = models.CharField(max_length=5, blank=True, help_text='Empty for chapters')
+    start = models.FloatField(help_text='Seconds from the start of the video')
+    end = models.FloatField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['topic', 'kind', 'language', 'start']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic.title} [{self.kind}{':' + self.language if self.language else ''}] {self.start:.1f}s"
 #-------------------------------
 #
 
 
 
+# ------------------------------
+# MediaBlob Model
+# ------------------------------
+class MediaBlob(models.Model):
+    """
+    One stored file in the content-addressed media store (see core.storage),
+    with the number of FileField values currently pointing at it.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text='Storage name, derived from the SHA-256')
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text='Last change of ref_count')
+
+    def __str__(self):
+        return f"{self.name} (refs: {self.ref_count})"
+
+
+# ------------------------------
+# UploadSession Model
+# ------------------------------
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload of a large topic file (see core.uploads).
+    Chunks are appended to a temp file; once complete the assembled file is
+    moved into storage and attached to a Topic by reference.
+    """
+    FIELDS = (
+        ('video_file', 'Topic video'),
+        ('ppt_file', 'Topic PPT/PDF'),
+    )
+    STATUSES = (
+        ('active', 'Uploading'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='upload_sessions')
+    field = models.CharField(max_length=20, choices=FIELDS)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    received_bytes = models.PositiveBigIntegerField(default=0, help_text='Last acknowledged offset')
+    status = models.CharField(max_length=10, choices=STATUSES, default='active')
+    stored_name = models.CharField(max_length=255, blank=True, help_text='Storage name of the assembled file')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+
 # ------------------------------
 # Progress Model
 # ------------------------------
@@ -162,6 +290,9 @@ class TopicCompletion(models.Model):
     video_watched_at = models.DateTimeField(null=True, blank=True)
     mcq_passed_at = models.DateTimeField(null=True, blank=True)
     assignment_submitted_at = models.DateTimeField(null=True, blank=True)
+    watch_seconds = models.FloatField(default=0.0, help_text='Seconds of video watched (from player heartbeats)')
+    last_position = models.FloatField(default=0.0, help_text='Last reported playback position in seconds')
+    watch_bitmap = models.BinaryField(default=b'', blank=True, help_text='Watched segments, one bit per segment (see core.watch)')
 
     class Meta:
         unique_together = ['progress', 'topic']
@@ -198,6 +329,12 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
     transaction_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_date', 'id']),
+            models.Index(fields=['student', 'payment_date', 'id']),
+        ]
+
     def clean(self):
         if self.amount is not None and self.amount <= 0:
             raise ValidationError("Amount must be greater than zero.")
@@ -217,24 +354,91 @@ class Payment(models.Model):
         return f"{self.student.name} - ₹{self.amount or 'No Amount'}"
 
 class MCQQuestion(models.Model):
+    DIFFICULTIES = (
+        ('easy', 'Easy'),
+        ('medium', 'Medium'),
+        ('hard', 'Hard'),
+    )
+
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='mcqs')
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='mcqs', blank=True, null=True, help_text='Optional: Link MCQ to specific topic')
     question_text = models.TextField()
-    image = models.ImageField(upload_to='mcq_images/', blank=True, null=True)
+    image = models.ImageField(upload_to='mcq_images/', storage=media_storage, blank=True, null=True)
     option_1 = models.CharField(max_length=255)
     option_2 = models.CharField(max_length=255)
     option_3 = models.CharField(max_length=255)
     option_4 = models.CharField(max_length=255)
     correct_option = models.PositiveSmallIntegerField(choices=[(i, f"Option {i}") for i in range(1, 5)])
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTIES, default='medium')
 
     class Meta:
         ordering = ['topic__order', 'id']
+        indexes = [
+            models.Index(fields=['course', 'id']),
+            models.Index(fields=['topic', 'id']),
+        ]
 
     def __str__(self):
         topic_str = f" - {self.topic.title}" if self.topic else ""
         return f"{self.course.title}{topic_str} - {self.question_text[:30]}"
 
 
+class MCQAttempt(models.Model):
+    """
+    One submitted topic or course quiz. Question ids and answers are packed
+    into bytes (see core.attempts) so an attempt is a single small row.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='mcq_attempts')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='mcq_attempts')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='mcq_attempts', blank=True, null=True)
+    question_ids = models.BinaryField(help_text='Little-endian uint32 per question')
+    answers = models.BinaryField(help_text='One byte per question: selected option << 4 | correct option')
+    score = models.PositiveSmallIntegerField()
+    total = models.PositiveSmallIntegerField()
+    passed = models.BooleanField(default=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    submitted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['student', '-submitted_at']),
+            models.Index(fields=['topic', 'passed']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.course.title} ({self.score}/{self.total})"
+
+
+class QuestionSignature(models.Model):
+    """
+    MinHash signature of an MCQ or final exam question, used to find
+    near-duplicates (see core.dedup).
+    """
+    KIND_CHOICES = (
+        ('mcq', 'MCQ question'),
+        ('exam', 'Final exam question'),
+    )
+
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    question_id = models.PositiveIntegerField()
+    text_hash = models.CharField(max_length=40, help_text='SHA-1 of the normalized question and options')
+    signature = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'question_id']
+
+    def __str__(self):
+        return f"{self.kind} #{self.question_id}"
+
+
+class QuestionBand(models.Model):
+    """One LSH band bucket of a QuestionSignature; equal keys mark candidate duplicates."""
+    signature = models.ForeignKey(QuestionSignature, on_delete=models.CASCADE, related_name='bands')
+    key = models.BigIntegerField(db_index=True)
+
+
 # ------------------------------
 # Final Exam Models
 # ------------------------------
@@ -243,6 +447,7 @@ class FinalExam(models.Model):
     title = models.CharField(max_length=200, default='Final Examination')
     num_questions = models.PositiveIntegerField(default=20)
     pass_mark = models.PositiveIntegerField(default=70, help_text='Percent required to pass')
+    duration_minutes = models.PositiveIntegerField(default=60, help_text='Time limit, enforced on the server')
     active = models.BooleanField(default=True)
 
     def __str__(self):
@@ -276,3 +481,86 @@ class FinalExamSubmission(models.Model):
 
     def __str__(self):
         return f"{self.student.name} - {self.course.title} ({self.score}%)"
+
+
+class FinalExamAttempt(models.Model):
+    """
+    A sitting of a final exam: the student's form, server-side deadline and
+    autosaved answers (see core.exam_attempts).
+    """
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('submitted', 'Submitted'),
+    )
+
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='final_exam_attempts')
+    exam = models.ForeignKey(FinalExam, on_delete=models.CASCADE, related_name='attempts')
+    form = models.JSONField(help_text='Seed, question ids and answer keys (see core.exam_forms)')
+    answers = models.JSONField(default=dict, blank=True, help_text='Form position -> selected option')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    started_at = models.DateTimeField(auto_now_add=True)
+    deadline = models.DateTimeField()
+    saved_at = models.DateTimeField(null=True, blank=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['student', 'exam', 'status'])]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.exam} ({self.status})"
+
+
+# ------------------------------
+# BackgroundJob Model
+# ------------------------------
+class BackgroundJob(models.Model):
+    """
+    A long-running admin task (bulk import, bulk reset, ...) run outside the
+    request by core.jobs. The task reports progress here and leaves its
+    outcome in `result` for the admin's job page.
+    """
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    created_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs'
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    target = models.CharField(max_length=100, blank=True, help_text="What the job works on, e.g. 'course:12'")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text='Last progress report')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['kind', 'target'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        return min(99, int(self.processed * 100 / self.total)) if self.total else 0
+
+    def report(self, processed, total=None, message=None):
+        """Record progress with a single UPDATE (safe to call from the task thread)."""
+        fields = {'processed': processed, 'updated_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if message is not None:
+            fields['message'] = message[:255]
+        BackgroundJob.objects.filter(pk=self.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self, name, value)
@@ -0,0 +1,247 @@
+"""
+Bulk import of MCQ and final exam questions.
+
+Accepts CSV, JSON Lines or a JSON array, or a ZIP holding one such file
+plus the images it references. CSV and JSON Lines are parsed as a stream
+straight from the upload; a JSON array has to be read in one piece.
+
+Columns / keys:
+    course          course title or id (required)
+    topic           topic title or id within the course (MCQs only, optional)
+    question_text, option_1 .. option_4 (required)
+    correct_option  1-4 or A-D (required)
+    difficulty      easy, medium or hard (MCQs only, optional; default medium)
+    image           path of an image inside the ZIP (optional)
+
+Course and topic names are resolved against dictionaries built once per
+import. Valid rows are written with bulk_create in batches of BATCH_SIZE;
+invalid rows are skipped and reported with their row number. A dry run
+validates everything (including that images exist in the ZIP) and writes
+nothing. The whole import runs in one transaction.
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .exam_forms import invalidate_question_pool
+from .mcq_forms import invalidate_question_pool as invalidate_quiz_pool
+from .models import Course, FinalExam, FinalExamQuestion, MCQQuestion, Topic
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+OPTION_FIELDS = ('option_1', 'option_2', 'option_3', 'option_4')
+QUESTION_FILE_TYPES = ('.csv', '.jsonl', '.ndjson', '.json')
+IMAGE_TYPES = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+LETTERS = {'a': 1, 'b': 2, 'c': 3, 'd': 4}
+DIFFICULTIES = dict(MCQQuestion.DIFFICULTIES)
+
+
+class ImportFormatError(ValueError):
+    """The upload as a whole cannot be read (as opposed to a bad row)."""
+
+
+class ImportReport:
+    def __init__(self, kind, dry_run):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.rows = 0
+        self.valid = 0
+        self.created = 0
+        self.images = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'message': message})
+
+
+def _rows(stream, extension):
+    """Yield dict rows from a text stream."""
+    if extension == '.csv':
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames:
+            raise ImportFormatError('The CSV file has no header row.')
+        reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames]
+        yield from reader
+    elif extension in ('.jsonl', '.ndjson'):
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+    else:
+        try:
+            data = json.load(stream)
+        except ValueError as e:
+            raise ImportFormatError(f'Invalid JSON: {e}')
+        if not isinstance(data, list):
+            raise ImportFormatError('A JSON file must contain a list of questions.')
+        yield from data
+
+
+class _Lookup:
+    """Course, topic and exam resolution from dictionaries loaded once."""
+
+    def __init__(self):
+        self.courses = {}
+        for course_id, title in Course.objects.values_list('id', 'title'):
+            self.courses[str(course_id)] = course_id
+            self.courses.setdefault(title.strip().lower(), course_id)
+        self.topics = {}
+        for topic_id, course_id, title in Topic.objects.values_list('id', 'course_id', 'title'):
+            self.topics[(course_id, str(topic_id))] = topic_id
+            self.topics.setdefault((course_id, title.strip().lower()), topic_id)
+        self.exams = dict(FinalExam.objects.values_list('course_id', 'id'))
+
+    def course(self, value):
+        return self.courses.get(value.strip().lower())
+
+    def topic(self, course_id, value):
+        return self.topics.get((course_id, value.strip().lower()))
+
+
+def _clean(row, kind, lookup, images):
+    """Validate one row. Returns (field values, image name) or raises ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError('Not a valid record.')
+    row = {str(k).strip().lower(): ('' if v is None else str(v).strip()) for k, v in row.items()}
+
+    if not row.get('course'):
+        raise ValueError('course is required.')
+    course_id = lookup.course(row['course'])
+    if course_id is None:
+        raise ValueError(f"Unknown course '{row['course']}'.")
+
+    values = {}
+    if kind == 'mcq':
+        values['course_id'] = course_id
+        values['topic_id'] = None
+        if row.get('topic'):
+            values['topic_id'] = lookup.topic(course_id, row['topic'])
+            if values['topic_id'] is None:
+                raise ValueError(f"Unknown topic '{row['topic']}' in course '{row['course']}'.")
+    else:
+        values['exam_id'] = lookup.exams.get(course_id)
+        if values['exam_id'] is None:
+            raise ValueError(f"Course '{row['course']}' has no final exam.")
+
+    if not row.get('question_text'):
+        raise ValueError('question_text is required.')
+    values['question_text'] = row['question_text']
+    for field in OPTION_FIELDS:
+        if not row.get(field):
+            raise ValueError(f'{field} is required.')
+        if len(row[field]) > 255:
+            raise ValueError(f'{field} is longer than 255 characters.')
+        values[field] = row[field]
+
+    answer = row.get('correct_option', '').lower()
+    correct = LETTERS.get(answer) or (int(answer) if answer.isdigit() else None)
+    if correct not in (1, 2, 3, 4):
+        raise ValueError('correct_option must be 1-4 or A-D.')
+    values['correct_option'] = correct
+
+    if kind == 'mcq' and row.get('difficulty'):
+        values['difficulty'] = row['difficulty'].lower()
+        if values['difficulty'] not in DIFFICULTIES:
+            raise ValueError('difficulty must be easy, medium or hard.')
+
+    image = row.get('image') or None
+    if image:
+        if images is None:
+            raise ValueError('Images can only be imported from a ZIP.')
+        image = image.replace('\\', '/')
+        if image.startswith('./'):
+            image = image[2:]
+        if image not in images:
+            raise ValueError(f"Image '{image}' is not in the ZIP.")
+    return values, image
+
+
+def _open_source(upload):
+    """(text stream, extension, ZipFile or None, set of image names or None)."""
+    name = (upload.name or '').lower()
+    extension = os.path.splitext(name)[1]
+    if extension == '.zip':
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            raise ImportFormatError('The ZIP file is damaged.')
+        names = [n for n in archive.namelist() if not n.endswith('/')]
+        sources = [n for n in names if os.path.splitext(n.lower())[1] in QUESTION_FILE_TYPES]
+        if len(sources) != 1:
+            raise ImportFormatError('The ZIP must contain exactly one .csv, .jsonl or .json file.')
+        images = {n for n in names if os.path.splitext(n.lower())[1] in IMAGE_TYPES}
+        stream = io.TextIOWrapper(archive.open(sources[0]), encoding='utf-8-sig', newline='')
+        return stream, os.path.splitext(sources[0].lower())[1], archive, images
+    if extension not in QUESTION_FILE_TYPES:
+        raise ImportFormatError('Upload a .csv, .jsonl, .json or .zip file.')
+    return io.TextIOWrapper(getattr(upload, 'file', upload), encoding='utf-8-sig', newline=''), extension, None, None
+
+
+def import_questions(upload, kind, dry_run=False):
+    """
+    Import questions from an uploaded file. `kind` is 'mcq' or 'exam'.
+    Returns an ImportReport; raises ImportFormatError if the file cannot be read.
+    """
+    model = MCQQuestion if kind == 'mcq' else FinalExamQuestion
+    report = ImportReport(kind, dry_run)
+    lookup = _Lookup()
+    stream, extension, archive, images = _open_source(upload)
+    touched_exams = set()
+    touched_courses = set()
+
+    def flush(batch):
+        if dry_run or not batch:
+            return
+        for obj, image in batch:
+            if image:
+                obj.image.save(os.path.basename(image), ContentFile(archive.read(image)), save=False)
+                report.images += 1
+        model.objects.bulk_create([obj for obj, _ in batch], batch_size=BATCH_SIZE)
+        report.created += len(batch)
+
+    try:
+        with transaction.atomic():
+            batch = []
+            try:
+                # Row 1 is the CSV header, so data rows are numbered from 2
+                for number, row in enumerate(_rows(stream, extension), start=2 if extension == '.csv' else 1):
+                    report.rows += 1
+                    try:
+                        values, image = _clean(row, kind, lookup, images)
+                    except ValueError as e:
+                        report.error(number, str(e))
+                        continue
+                    report.valid += 1
+                    if kind == 'exam':
+                        touched_exams.add(values['exam_id'])
+                    else:
+                        touched_courses.add(values['course_id'])
+                    batch.append((model(**values), image))
+                    if len(batch) >= BATCH_SIZE:
+                        flush(batch)
+                        batch = []
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise ImportFormatError(f'Could not read the file: {e}')
+            flush(batch)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    # bulk_create sends no post_save, so drop the cached question pools here
+    if not dry_run:
+        for exam_id in touched_exams:
+            invalidate_question_pool(exam_id)
+        for course_id in touched_courses:
+            invalidate_quiz_pool(course_id)
+    return report
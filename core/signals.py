@@ -1,8 +1,22 @@
-from django.db.models.signals import post_save
+import os
+
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Payment
+from .models import (
+    Assignment, FinalExamQuestion, FinalExamSubmission, MCQQuestion, Payment, Submission, Topic,
+    TopicCompletion,
+)
+from .storage import release_blob
+from .events import has_subscribers, publish_on_commit
+from .video_info import probe_duration
+from .captions import TRACK_FIELDS, index_topic_tracks
+from .item_analysis import invalidate_exam_analysis
+from .exam_forms import invalidate_question_pool
+from .mcq_forms import invalidate_question_pool as invalidate_quiz_pool
+from .dedup import delete_signature, update_signature
 
 # 'get_user_model' and 'User = ...' have been removed from here.
 
@@ -10,12 +24,179 @@ from .models import Payment
 def handle_payment(sender, instance, created, **kwargs):
     if created:
         student = instance.student
+        newly_paid = not student.payment_status
         student.payment_status = True
         student.save()
+        if has_subscribers():
+            publish_on_commit('payment', delta={
+                'payments': 1, 'revenue': float(instance.amount or 0), 'paid_students': int(newly_paid),
+            })
         send_mail(
             subject='Welcome to Our E-Learning Portal!',
             message=f'Hi {student.name},\n\nYour account is ready. Login with your phone number at our portal.',
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[student.email],
             fail_silently=False,
-        )
\ No newline at end of file
+        )
+
+
+@receiver(pre_save, sender=Topic)
+def remember_changed_tracks(sender, instance, raw=False, **kwargs):
+    """
+    Note which caption/chapter files changed so post_save can re-index them,
+    and read the length of a new video unless one was entered with it.
+    """
+    if raw:
+        return
+    if not instance.pk:
+        instance._changed_tracks = [f for f in TRACK_FIELDS if getattr(instance, f)]
+    else:
+        old = Topic.objects.filter(pk=instance.pk).values('video_file', 'video_duration', *TRACK_FIELDS).first() or {}
+        instance._changed_tracks = [
+            f for f in TRACK_FIELDS if (getattr(instance, f).name or '') != (old.get(f) or '')
+        ]
+        video_replaced = (instance.video_file.name or '') != (old.get('video_file') or '')
+        if video_replaced and instance.video_duration == old.get('video_duration'):
+            # The old length belongs to the old video
+            instance.video_duration = None
+    if instance.video_file and not instance.video_duration:
+        instance.video_duration = probe_duration(instance.video_file)
+
+
+@receiver(post_save, sender=Topic)
+def index_changed_tracks(sender, instance, raw=False, **kwargs):
+    changed = getattr(instance, '_changed_tracks', None)
+    if raw or not changed:
+        return
+    instance._changed_tracks = []
+    index_topic_tracks(instance, changed)
+
+
+@receiver(post_delete, sender=FinalExamSubmission)
+def reset_item_analysis(sender, instance, **kwargs):
+    """Cached item statistics only grow, so removed submissions force a rebuild."""
+    invalidate_exam_analysis(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=FinalExamQuestion)
+def reset_exam_question_pool(sender, instance, **kwargs):
+    invalidate_question_pool(instance.exam_id)
+
+
+@receiver(pre_save, sender=MCQQuestion)
+def remember_quiz_course(sender, instance, raw=False, **kwargs):
+    """A question moved to another course leaves the old course's pool stale too."""
+    instance._old_course_id = None
+    if instance.pk and not raw:
+        instance._old_course_id = sender.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=MCQQuestion)
+def reset_quiz_question_pool(sender, instance, **kwargs):
+    for course_id in {instance.course_id, getattr(instance, '_old_course_id', None)} - {None}:
+        invalidate_quiz_pool(course_id)
+
+
+@receiver(post_save, sender=MCQQuestion)
+@receiver(post_save, sender=FinalExamQuestion)
+def refresh_question_signature(sender, instance, raw=False, **kwargs):
+    """Keep the near-duplicate signature current (bulk imports are picked up by find_duplicate_questions)."""
+    if raw:
+        return
+    update_signature('mcq' if sender is MCQQuestion else 'exam', instance)
+
+
+@receiver(post_delete, sender=MCQQuestion)
+@receiver(post_delete, sender=FinalExamQuestion)
+def drop_question_signature(sender, instance, **kwargs):
+    delete_signature('mcq' if sender is MCQQuestion else 'exam', instance.pk)
+
+
+# Media files (see core.storage). Uploads are stored under their content hash,
+# so the original filename is kept in a column next to the file field.
+DISPLAY_NAME_FIELDS = {
+    Assignment: {'file': 'file_name'},
+    Submission: {'submitted_file': 'submitted_file_name'},
+    Topic: {'video_file': 'video_file_name', 'ppt_file': 'ppt_file_name'},
+}
+
+
+def _file_fields(model):
+    return [f for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=Submission)
+@receiver(pre_save, sender=Topic)
+@receiver(pre_save, sender=MCQQuestion)
+def remember_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Name new uploads after the file the user picked, and note the blobs this
+    save stops referencing so post_save can release them.
+    """
+    instance._replaced_blobs = []
+    if raw:
+        return
+    for field_name, name_field in DISPLAY_NAME_FIELDS.get(sender, {}).items():
+        file = getattr(instance, field_name)
+        if not file:
+            setattr(instance, name_field, '')
+        elif not file._committed:
+            setattr(instance, name_field, os.path.basename(file.name)[:255])
+
+    fields = [f for f in _file_fields(sender) if update_fields is None or f.name in update_fields]
+    if not instance.pk or not fields:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values(*(f.attname for f in fields)).first() or {}
+    instance._replaced_blobs = [
+        old[f.attname] for f in fields
+        if old.get(f.attname) and old[f.attname] != (getattr(instance, f.attname).name or '')
+    ]
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=Submission)
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=MCQQuestion)
+def release_replaced_files(sender, instance, **kwargs):
+    for name in getattr(instance, '_replaced_blobs', ()):
+        release_blob(name)
+    instance._replaced_blobs = []
+
+
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Submission)
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=MCQQuestion)
+def release_deleted_files(sender, instance, **kwargs):
+    for field in _file_fields(sender):
+        release_blob(getattr(instance, field.attname).name)
+
+
+# Live dashboard deltas (see core.events); payments publish from handle_payment
+# and bulk writes publish their own.
+@receiver(post_save, sender=Submission)
+def publish_submission(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit('submission', delta={'submissions': 1})
+
+
+@receiver(pre_save, sender=TopicCompletion)
+def remember_completion(sender, instance, raw=False, **kwargs):
+    """Note whether this save is the one that completes the topic."""
+    instance._newly_completed = bool(
+        not raw and instance.completed and has_subscribers()
+        and (not instance.pk or TopicCompletion.objects.filter(pk=instance.pk, completed=False).exists())
+    )
+
+
+@receiver(post_save, sender=TopicCompletion)
+def publish_completion(sender, instance, created, raw=False, **kwargs):
+    delta = {}
+    if created and not raw:
+        delta['completions'] = 1
+    if getattr(instance, '_newly_completed', False):
+        instance._newly_completed = False
+        delta['completed_completions'] = 1
+    if delta:
+        publish_on_commit('completion', delta=delta)
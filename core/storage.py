@@ -0,0 +1,146 @@
+"""
+Content-addressed, deduplicating media storage.
+
+Every file is hashed (streaming SHA-256) while it is written and stored once
+under blobs/<aa>/<bb>/<sha256><ext>, so the same PPT uploaded for five topics
+or the same submission uploaded by forty students occupies disk once. Each
+blob has a MediaBlob row counting the FileField values that point at it;
+delete() only removes the bytes when the last reference goes. Because a
+blob's name is derived from its content, its URL never changes meaning and
+can be cached forever.
+
+The count is changed and the bytes placed or removed in one transaction:
+a save() of content whose last reference is being deleted waits for the
+delete, then registers a fresh blob and puts the bytes back. References
+are dropped by the model signals in core.signals when a row is deleted or
+its file replaced (release_blob()). Blob names mean nothing to people, so
+the models keep each upload's original filename in a separate column.
+
+FileFields opt in with storage=media_storage; with MEDIA_DEDUP = False the
+callable hands back the regular default storage.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs/'
+# Cache-Control for blob responses; safe because blob URLs are immutable
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def blob_name(digest, ext):
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once, by hash."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content hash in _save().
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        ext = os.path.splitext(name)[1].lower()[:10]
+        digest = hashlib.sha256()
+        size = 0
+
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large uploads): hash in place, then move.
+            source = content.temporary_file_path()
+            with open(source, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+                    size += len(block)
+            staged = None
+        else:
+            staging_dir = self.path('.staging')
+            os.makedirs(staging_dir, exist_ok=True)
+            fd, staged = tempfile.mkstemp(dir=staging_dir)
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            source = staged
+
+        hexdigest = digest.hexdigest()
+        name = blob_name(hexdigest, ext)
+        full_path = self.path(name)
+        try:
+            with transaction.atomic():
+                # Hold the reference first so a concurrent delete() cannot
+                # remove the bytes between the check below and our commit.
+                if not MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=timezone.now()):
+                    try:
+                        with transaction.atomic():
+                            MediaBlob.objects.create(name=name, sha256=hexdigest, size=size, ref_count=1)
+                    except IntegrityError:
+                        # The same content was registered by another upload meanwhile
+                        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    if staged:
+                        os.replace(staged, full_path)
+                    else:
+                        file_move_safe(source, full_path, allow_overwrite=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if staged and os.path.exists(staged):
+                os.remove(staged)
+        return name
+
+    def delete(self, name):
+        """Drop one reference; remove the bytes only when none are left."""
+        if not is_blob(name):
+            return super().delete(name)
+
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1, updated_at=timezone.now())
+            if MediaBlob.objects.filter(name=name, ref_count=0).delete()[0]:
+                # Before commit, so a save() of the same content waits and restores them
+                super().delete(name)
+
+
+dedup_storage = ContentAddressedStorage()
+
+
+def _release(name):
+    try:
+        dedup_storage.delete(name)
+    except Exception as e:
+        # media_gc corrects the count later
+        logger.error(f"Could not release {name}: {str(e)}")
+
+
+def release_blob(name):
+    """Drop a FileField's reference to blob `name` once the current transaction commits."""
+    if is_blob(name):
+        transaction.on_commit(lambda: _release(name))
+
+
+def media_storage():
+    """Storage for uploaded media FileFields (see MEDIA_DEDUP)."""
+    if getattr(settings, 'MEDIA_DEDUP', True):
+        return dedup_storage
+    return default_storage
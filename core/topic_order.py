@@ -0,0 +1,151 @@
+"""
+Gap-free topic ordering.
+
+Topic unlocking looks up the previous topic with `order - 1` and treats
+order 1 as the first topic, so within a course the orders must always be
+exactly 1..n. Every change to a course's topic list therefore rewrites the
+orders as a whole: the course's topics are locked, renumbered in memory and
+the ones whose order changed are written with one bulk_update, all in one
+transaction. Cached offline bundles of the course are discarded afterwards.
+
+overall_progress is videos watched over the number of topics, so adding,
+removing or moving topics between courses leaves the stored percentages
+stale until each student opens the course again. recompute_progress() is
+the background task that brings a whole course up to date, a chunk of
+Progress rows per query.
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .bundles import discard_bundles
+from .models import Progress, Topic
+
+CHUNK_SIZE = 500
+# Upper bound on the topics a single reorder request may list.
+MAX_TOPICS = 1000
+
+
+class TopicOrderError(ValueError):
+    """A posted topic order does not match the course's topics."""
+
+
+def _parse_ids(topic_ids):
+    if not isinstance(topic_ids, list):
+        raise TopicOrderError('Expected a list of topic ids.')
+    if len(topic_ids) > MAX_TOPICS:
+        raise TopicOrderError(f'At most {MAX_TOPICS} topics can be ordered at once.')
+    try:
+        ids = [int(topic_id) for topic_id in topic_ids]
+    except (TypeError, ValueError):
+        raise TopicOrderError('Topic ids must be integers.')
+    if len(set(ids)) != len(ids):
+        raise TopicOrderError('A topic appears more than once.')
+    return ids
+
+
+def _locked_topics(course_id):
+    """The course's topics in their current order, locked for the transaction."""
+    return list(
+        Topic.objects.select_for_update()
+        .filter(course_id=course_id)
+        .order_by('order', 'id')
+        .only('id', 'order')
+    )
+
+
+def _write_order(topics, ordered_ids):
+    """Number `ordered_ids` 1..n and save the topics whose order changed."""
+    by_id = {topic.id: topic for topic in topics}
+    changed = []
+    for position, topic_id in enumerate(ordered_ids, start=1):
+        topic = by_id[topic_id]
+        if topic.order != position:
+            topic.order = position
+            changed.append(topic)
+    if changed:
+        Topic.objects.bulk_update(changed, ['order'], batch_size=CHUNK_SIZE)
+    return len(changed)
+
+
+def reorder_topics(course, topic_ids):
+    """
+    Give the course's topics the order of `topic_ids`, which must list each
+    of them exactly once. Returns the number of topics that moved.
+    """
+    ids = _parse_ids(topic_ids)
+    with transaction.atomic():
+        topics = _locked_topics(course.id)
+        current = {topic.id for topic in topics}
+        missing = current.difference(ids)
+        unknown = set(ids).difference(current)
+        if unknown:
+            raise TopicOrderError(f'Topics {sorted(unknown)} do not belong to this course.')
+        if missing:
+            raise TopicOrderError(f'Topics {sorted(missing)} are missing from the new order.')
+        moved = _write_order(topics, ids)
+    if moved:
+        discard_bundles(course.id)
+    return moved
+
+
+def place_topic(topic, position):
+    """
+    Move `topic` to `position` (1-based, clamped to the ends) among its
+    course's topics and close any gaps. Returns the number of topics that moved.
+    """
+    with transaction.atomic():
+        topics = _locked_topics(topic.course_id)
+        ids = [t.id for t in topics if t.id != topic.id]
+        position = min(max(int(position), 1), len(ids) + 1)
+        ids.insert(position - 1, topic.id)
+        moved = _write_order(topics, ids)
+    topic.order = position
+    discard_bundles(topic.course_id)
+    return moved
+
+
+def compact_topic_order(course_id):
+    """Renumber a course's topics 1..n keeping their relative order."""
+    with transaction.atomic():
+        topics = _locked_topics(course_id)
+        moved = _write_order(topics, [topic.id for topic in topics])
+    discard_bundles(course_id)
+    return moved
+
+
+def recompute_progress(job, course_id):
+    """
+    Background task: recompute overall_progress for every student of the
+    course. Returns the report stored as the job result.
+    """
+    total_topics = Topic.objects.filter(course_id=course_id).count()
+    records = Progress.objects.filter(course_id=course_id)
+    total = records.count()
+    job.report(0, total=total, message='Recomputing course progress')
+
+    done = updated = 0
+    last_id = 0
+    while True:
+        rows = list(
+            records.filter(id__gt=last_id)
+            .order_by('id')
+            .annotate(watched=Count('topiccompletion', filter=Q(topiccompletion__video_watched=True)))
+            .values_list('id', 'overall_progress', 'watched')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        stale = []
+        for progress_id, current, watched in rows:
+            # Same formula as Progress.update_progress()
+            value = (watched / total_topics) * 100 if total_topics else 0.0
+            if value != current:
+                stale.append(Progress(id=progress_id, overall_progress=value))
+        if stale:
+            Progress.objects.bulk_update(stale, ['overall_progress'])
+        updated += len(stale)
+        done += len(rows)
+        last_id = rows[-1][0]
+        job.report(min(done, total))
+
+    job.report(total, message=f'{updated} of {done} progress records updated')
+    return {'progress_records': done, 'updated': updated, 'topics': total_topics}
@@ -0,0 +1,201 @@
+"""
+Chunked, resumable uploads for large topic files.
+
+The browser opens an UploadSession, then sends fixed-size chunks in order,
+each with its offset and SHA-256. Chunks are streamed straight into a temp
+file; the session only advances once a chunk's checksum matches, so a failed
+or interrupted chunk is simply re-sent from the last acknowledged offset.
+When every byte has arrived the temp file is moved (not copied) into the
+Topic field's storage, and the form attaches it by name.
+
+A session nobody touches for UPLOAD_EXPIRY seconds is abandoned:
+expire_uploads() (run by media_gc) removes its temp file, or releases the
+stored file of an upload that was completed but never attached to a Topic.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Topic, UploadSession
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+UPLOAD_DIR = getattr(settings, 'CHUNKED_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'tansam_uploads'))
+MAX_UPLOAD_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 5 * 1024 * 1024 * 1024)
+UPLOAD_EXPIRY = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 24 * 60 * 60)
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    """A chunk or session request that cannot be applied; `status` is the HTTP code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _AssembledFile(File):
+    # FileSystemStorage moves files that expose temporary_file_path()
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def temp_path(session):
+    return os.path.join(UPLOAD_DIR, f'{session.id}.part')
+
+
+def start_upload(owner, field, filename, total_size):
+    """Open a new upload session and its (empty) temp file."""
+    if field not in dict(UploadSession.FIELDS):
+        raise UploadError('Unknown target field.')
+    if not filename or total_size <= 0:
+        raise UploadError('filename and a positive size are required.')
+    if total_size > MAX_UPLOAD_SIZE:
+        raise UploadError('File is too large.', status=413)
+
+    session = UploadSession.objects.create(
+        owner=owner,
+        field=field,
+        filename=os.path.basename(filename)[:255],
+        total_size=total_size,
+        chunk_size=CHUNK_SIZE,
+    )
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    open(temp_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session, offset, checksum, stream):
+    """
+    Stream one chunk from `stream` into the temp file at `offset`.
+
+    The chunk must start at the last acknowledged offset, be exactly
+    chunk_size bytes (the final chunk may be shorter) and match `checksum`
+    (hex SHA-256). Returns the new acknowledged offset.
+    """
+    if session.status != 'active':
+        raise UploadError('Upload is already complete.', status=409)
+    if offset != session.received_bytes:
+        raise UploadError(f'Expected offset {session.received_bytes}.', status=409)
+
+    expected = min(session.chunk_size, session.total_size - offset)
+    digest = hashlib.sha256()
+    written = 0
+    with open(temp_path(session), 'r+b') as f:
+        f.seek(offset)
+        while written <= expected:
+            block = stream.read(READ_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            written += len(block)
+
+    if written != expected:
+        raise UploadError(f'Chunk must be {expected} bytes, got {written}.')
+    if digest.hexdigest() != (checksum or '').lower():
+        raise UploadError('Checksum mismatch.', status=422)
+
+    acknowledged = UploadSession.objects.filter(pk=session.pk, status='active', received_bytes=offset).update(
+        received_bytes=F('received_bytes') + written, updated_at=timezone.now()
+    )
+    if not acknowledged:
+        # Another request wrote this chunk (or the session expired) meanwhile
+        session.refresh_from_db(fields=['received_bytes', 'status'])
+        raise UploadError(f'Expected offset {session.received_bytes}.', status=409)
+    session.received_bytes = offset + written
+    return session.received_bytes
+
+
+def complete_upload(session):
+    """Move the assembled temp file into storage. Returns the stored name."""
+    if session.status == 'complete':
+        return session.stored_name
+    if session.received_bytes != session.total_size:
+        raise UploadError(f'Only {session.received_bytes} of {session.total_size} bytes received.', status=409)
+
+    path = temp_path(session)
+    with open(path, 'r+b') as f:
+        f.truncate(session.total_size)
+    field = Topic._meta.get_field(session.field)
+    with open(path, 'rb') as f:
+        stored_name = field.storage.save(os.path.join(field.upload_to, session.filename), _AssembledFile(f))
+    if os.path.exists(path):
+        os.remove(path)
+
+    session.stored_name = stored_name
+    session.status = 'complete'
+    session.save(update_fields=['stored_name', 'status', 'updated_at'])
+    return stored_name
+
+
+def completed_upload(owner, field, upload_id):
+    """
+    Return the owner's completed UploadSession for a Topic form field, or
+    None. Callers attach `session.stored_name` and delete the session in
+    the same transaction as the Topic save, which hands the stored file's
+    reference over to the Topic.
+    """
+    if not upload_id:
+        return None
+    try:
+        return UploadSession.objects.get(
+            id=upload_id, owner=owner, field=field, status='complete',
+            updated_at__gte=timezone.now() - timedelta(seconds=UPLOAD_EXPIRY),
+        )
+    except (UploadSession.DoesNotExist, ValidationError):
+        return None
+
+
+def _discard(session):
+    """Delete an abandoned session with its temp file or unattached stored file."""
+    with transaction.atomic():
+        if not UploadSession.objects.filter(pk=session.pk, updated_at=session.updated_at).delete()[0]:
+            # Resumed or attached meanwhile
+            return False
+        if session.stored_name:
+            Topic._meta.get_field(session.field).storage.delete(session.stored_name)
+    path = temp_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    return True
+
+
+def expire_uploads(max_age=UPLOAD_EXPIRY, dry_run=False):
+    """
+    Discard upload sessions untouched for `max_age` seconds, and temp files
+    in UPLOAD_DIR that no session owns. Returns (sessions, temp files) removed,
+    or that would be removed with `dry_run`.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    sessions = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator(chunk_size=500):
+        try:
+            if dry_run or _discard(session):
+                sessions += 1
+        except OSError as e:
+            logger.error(f"Could not discard upload {session.id}: {str(e)}")
+
+    strays = 0
+    if os.path.isdir(UPLOAD_DIR):
+        live = {f'{pk}.part' for pk in UploadSession.objects.values_list('pk', flat=True).iterator(chunk_size=5000)}
+        for entry in os.scandir(UPLOAD_DIR):
+            if (entry.name.endswith('.part') and entry.name not in live
+                    and entry.stat().st_mtime < cutoff.timestamp()):
+                try:
+                    if not dry_run:
+                        os.remove(entry.path)
+                    strays += 1
+                except OSError as e:
+                    logger.error(f"Could not remove {entry.path}: {str(e)}")
+    return sessions, strays
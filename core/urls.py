@@ -15,13 +15,22 @@ urlpatterns = [
     path('course/<int:course_id>/mcq/quiz/', views.course_mcq_view, name='course_mcq'),
     path('course/<int:course_id>/mcq/result/', views.course_mcq_result_view, name='course_mcq_result'),
     path('course/<int:course_id>/final-exam/', views.final_exam_view, name='final_exam'),
+    path('course/<int:course_id>/final-exam/autosave/', views.final_exam_autosave_api, name='final_exam_autosave'),
     path('course/<int:course_id>/final-exam/result/', views.final_exam_result_view, name='final_exam_result'),
     path('course/<int:course_id>/certificate/', views.certificate_view, name='certificate'),
     path('course/<int:course_id>/assignments/', views.assignment_page, name='assignment_page'),
     path('course/<int:course_id>/grading-dashboard/', views.student_grading_dashboard, name='student_grading_dashboard'),
+    path('course/<int:course_id>/offline-bundle/', views.course_offline_bundle, name='course_offline_bundle'),
     path('topic/<int:topic_id>/mcq/start/', views.course_mcq_view, name='start_mcq_test'),
     path('topic/<int:topic_id>/assignments/', views.assignment_page, name='assignment_list'),
+    path('api/topic/<int:topic_id>/chapters/', views.topic_chapters_api, name='topic_chapters_api'),
+    path('api/topic/<int:topic_id>/heartbeat/', views.video_heartbeat_api, name='video_heartbeat_api'),
+    path('api/topic/<int:topic_id>/cues/', views.topic_cues_api, name='topic_cues_api'),
+    path('api/course/<int:course_id>/transcript-search/', views.transcript_search_api, name='transcript_search_api'),
 ]
 
 if settings.DEBUG:
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}blobs/<path:path>", views.media_blob_view, name='media_blob'),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,98 @@
+"""
+Read a video's length on the server.
+
+Only the MP4 family (.mp4, .m4v, .mov) is understood: the length is taken
+from the movie header ('mvhd') inside the 'moov' box, wherever in the file
+that box sits. Nothing is decoded and only box headers are read, so this is
+cheap even for large files. Other formats return None and the admin enters
+the length by hand.
+
+Lengths are read when a topic is saved; fill_durations() reads them for
+topics saved before that (data migration and `manage.py probe_video_durations`).
+"""
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+MP4_EXTENSIONS = {'.mp4', '.m4v', '.mov'}
+
+
+def _boxes(f, end):
+    """Yield (type, body end) for each box between the current offset and `end`."""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header)
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - start
+        if size < 8 or start + size > end:
+            return
+        yield kind, start + size
+        f.seek(start + size)
+
+
+def mp4_duration(f):
+    """Length in whole seconds of an MP4 file object, or None."""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    f.seek(0)
+    for kind, moov_end in _boxes(f, end):
+        if kind != b'moov':
+            continue
+        for child, _ in _boxes(f, moov_end):
+            if child != b'mvhd':
+                continue
+            version = f.read(4)[0]
+            if version == 1:
+                f.seek(16, os.SEEK_CUR)
+                timescale, duration = struct.unpack('>IQ', f.read(12))
+            else:
+                f.seek(8, os.SEEK_CUR)
+                timescale, duration = struct.unpack('>II', f.read(8))
+            if timescale and duration:
+                return max(1, round(duration / timescale))
+            return None
+    return None
+
+
+def probe_duration(fieldfile):
+    """Length in seconds of the video in a FileField, or None if it cannot be read."""
+    if not fieldfile or os.path.splitext(fieldfile.name)[1].lower() not in MP4_EXTENSIONS:
+        return None
+    try:
+        if getattr(fieldfile, '_committed', True):
+            with fieldfile.storage.open(fieldfile.name, 'rb') as f:
+                return mp4_duration(f)
+        # A fresh upload that has not been written to storage yet
+        f = fieldfile.file
+        position = f.tell()
+        try:
+            return mp4_duration(f)
+        finally:
+            f.seek(position)
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        logger.error(f"Could not read the length of {fieldfile.name}: {str(e)}")
+        return None
+
+
+def fill_durations(topics):
+    """
+    Read and store the length of every video in `topics` (a Topic queryset)
+    that has none. Returns (filled, unreadable).
+    """
+    filled = unreadable = 0
+    for topic in topics.filter(video_duration__isnull=True).exclude(video_file='').only('id', 'video_file').iterator():
+        duration = probe_duration(topic.video_file)
+        if duration:
+            # update(): a save() would re-run the topic signals for one column
+            topics.filter(pk=topic.pk).update(video_duration=duration)
+            filled += 1
+        else:
+            unreadable += 1
+    return filled, unreadable
@@ -4,10 +4,28 @@ from django.contrib import messages
 from django.contrib.auth import login, logout, get_user_model
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db.models import Avg, Count, Q
-from .models import Progress, Course, Topic, TopicCompletion, Assignment, Submission, MCQQuestion, FinalExam, FinalExamQuestion, FinalExamSubmission
-
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, HttpResponseNotModified
+from django.views.decorators.http import require_POST
+from django.views.static import serve
+from django.conf import settings
+from .models import Progress, Course, Topic, TopicCompletion, Assignment, Submission, MCQQuestion, FinalExam, FinalExamQuestion, FinalExamSubmission, CaptionCue
+from .bundles import course_version, cached_bundle_path, stream_bundle
+from .storage import BLOB_CACHE_CONTROL, BLOB_PREFIX
+from .watch import position_limit, record_heartbeat
+from .attempts import record_attempt
+from .mcq_forms import PASS_MARK, grade_quiz, new_quiz, quiz_questions
+from .exam_forms import render_form
+from .exam_attempts import (
+    AUTOSAVE_INTERVAL, active_attempt, autosave, is_expired, open_attempt, parse_answers,
+    remaining_seconds, saved_answers, submit_attempt,
+)
+import json
 import logging
+import math
+import os
+import secrets
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -239,26 +257,29 @@ def course_mcq_view(request, course_id):
     topic_id = request.GET.get('topic')
     topic = None
     
-    # Filter MCQs: if topic_id provided, show topic-specific; otherwise show course-level
-    mcqs_query = MCQQuestion.objects.filter(course=course)
+    # A topic quiz if topic_id is provided; otherwise the course-level questions (no topic assigned)
     if topic_id:
         topic = get_object_or_404(Topic, id=topic_id, course=course)
-        mcqs_query = mcqs_query.filter(topic=topic)
-    else:
-        # Show only course-level MCQs (no topic assigned)
-        mcqs_query = mcqs_query.filter(topic__isnull=True)
-    
-    mcqs = mcqs_query[:10]
-    
+    quiz_key = f'mcq_quiz_{course_id}'
+
     if request.method == 'POST':
-        submitted = [int(request.POST.get(f'q{i}', 0)) for i in range(len(mcqs))]
-        corrects = [int(mcq.correct_option) for mcq in mcqs]
-        score = sum([a == b and a != 0 for a, b in zip(submitted, corrects)])
-        passed = score >= 7
+        quiz = request.session.get(quiz_key)
+        if (quiz is None or quiz['token'] != request.POST.get('quiz')
+                or quiz['topic_id'] != (topic.id if topic else None)):
+            # Submitted, or replaced by a quiz opened in another tab: start afresh
+            return redirect(request.get_full_path())
+        del request.session[quiz_key]
+        submitted = []
+        for i in range(len(quiz['ids'])):
+            answer = request.POST.get(f'q{i}', '')
+            submitted.append(int(answer) if answer.isdigit() else 0)
+        # Graded against the answer keys drawn with the quiz; no question is re-read
+        corrects, score = grade_quiz(quiz, submitted)
+        passed = score >= PASS_MARK
 
         # Store minimal result data in session (POST -> Redirect -> GET)
         result_payload = {
-            'question_ids': [q.id for q in mcqs],
+            'question_ids': quiz['ids'],
             'selected': submitted,
             'corrects': corrects,
             'score': score,
@@ -266,16 +287,22 @@ def course_mcq_view(request, course_id):
             'topic_id': topic_id,  # Store topic_id for result page
         }
         request.session[f'mcq_result_{course_id}'] = result_payload
+
+        record_attempt(
+            request.user, course, topic.id if topic else None,
+            quiz['ids'], submitted, corrects, score, passed,
+            started_at=parse_datetime(quiz['started_at']),
+        )
         return redirect('course_mcq_result', course_id=course_id)
 
-    return render(request, 'mcq.html', {
-        'course': course,
-        'topic': topic,
-        'mcqs': mcqs,
-    })
-    
+    quiz = new_quiz(course.id, topic.id if topic else None)
+    quiz.update(
+        topic_id=topic.id if topic else None, token=secrets.token_hex(8), started_at=timezone.now().isoformat(),
+    )
+    request.session[quiz_key] = quiz
     context = {
-        'questions': mcqs,
+        'questions': quiz_questions(quiz),
+        'quiz_token': quiz['token'],
         'course': course,
         'topic': topic,
     }
@@ -364,41 +391,51 @@ def final_exam_view(request, course_id):
         # Create a basic exam placeholder if not present
         exam = FinalExam.objects.create(course=course)
 
-    questions_qs = exam.questions.all()[:exam.num_questions]
-    questions = list(questions_qs)
-
     if request.method == 'POST':
-        submitted = [int(request.POST.get(f'q{i}', 0)) for i in range(len(questions))]
-        corrects = [int(q.correct_option) for q in questions]
-        score = int(sum([a == b and a != 0 for a, b in zip(submitted, corrects)]) / max(len(questions), 1) * 100)
-        passed = score >= exam.pass_mark
-
-        # Save submission
-        submission = FinalExamSubmission.objects.create(
-            student=request.user,
-            course=course,
-            score=score,
-            passed=passed,
-            details={
-                'question_ids': [q.id for q in questions],
-                'selected': submitted,
-                'corrects': corrects,
-            }
-        )
-
-        # Update progress and certificate
-        progress.final_exam_score = score
-        progress.final_exam_passed = passed
-        if passed and not progress.certificate_issued_at:
-            progress.certificate_issued_at = timezone.now()
-        progress.save()
+        attempt = open_attempt(request.user, exam)
+        if attempt:
+            # Answers posted after the deadline are ignored; the autosaved ones count
+            answers = None if is_expired(attempt) else parse_answers(request.POST, len(attempt.form['ids']))
+            submit_attempt(attempt, progress, answers)
+        return redirect('final_exam_result', course_id=course.id)
 
+    attempt = active_attempt(request.user, exam)
+    if is_expired(attempt):
+        submit_attempt(attempt, progress)
+        messages.warning(request, 'Time is up. Your saved answers have been submitted.')
         return redirect('final_exam_result', course_id=course.id)
 
     return render(request, 'final_exam.html', {
         'course': course,
         'exam': exam,
-        'questions': questions,
+        'questions': render_form(attempt.form, saved_answers(attempt)),
+        'remaining_seconds': remaining_seconds(attempt),
+        'autosave_interval': AUTOSAVE_INTERVAL,
+    })
+
+
+@login_required
+@require_POST
+def final_exam_autosave_api(request, course_id):
+    """
+    AJAX endpoint: autosave the open final exam attempt.
+
+    Body (form): q<i> = selected option for any subset of the questions
+    Returns: JSON {saved, persisted, remaining_seconds}; 409 once time is up.
+    """
+    exam = get_object_or_404(FinalExam, course_id=course_id, course__is_active=True, active=True)
+    attempt = open_attempt(request.user, exam)
+    if attempt is None:
+        return JsonResponse({'error': 'no open attempt'}, status=404)
+    if is_expired(attempt):
+        return JsonResponse({'error': 'time is up', 'remaining_seconds': 0}, status=409)
+
+    answers = parse_answers(request.POST, len(attempt.form['ids']))
+    persisted = autosave(attempt, answers)
+    return JsonResponse({
+        'saved': len(answers),
+        'persisted': persisted,
+        'remaining_seconds': remaining_seconds(attempt),
     })
 
 
@@ -474,35 +511,6 @@ def course_detail_view(request, course_id):
     else:
         course_progress_percent = 0
 
-    # Handle video watching tracking (when video is played for 30+ seconds)
-    video_watched_param = request.GET.get('video_watched')
-    if video_watched_param == 'true':
-        selected_topic_id = request.GET.get('topic')
-        if selected_topic_id:
-            try:
-                watched_topic = topics.get(id=selected_topic_id)
-                if watched_topic.video_file:
-                    completion, _ = TopicCompletion.objects.get_or_create(
-                        progress=progress,
-                        topic=watched_topic,
-                        defaults={'completed': False}
-                    )
-                    if not completion.video_watched:
-                        completion.video_watched = True
-                        completion.video_watched_at = timezone.now()
-                        completion.save()
-                        completion.check_completion()
-                        # Update progress immediately
-                        progress.update_progress()
-                        # Recalculate unlocked topics after video is watched
-                        topic_completions[watched_topic.id] = completion
-                        # Unlock next topic if this one's video is watched
-                        next_topic = topics.filter(order=watched_topic.order + 1).first()
-                        if next_topic:
-                            unlocked_topics.add(next_topic.id)
-            except Topic.DoesNotExist:
-                pass
-
     # Determine selected topic for video playback (via query param ?topic=<id>)
     selected_topic = None
     selected_topic_id = request.GET.get('topic')
@@ -623,9 +631,9 @@ def all_topics_view(request):
 def topic_detail_view(request, topic_id):
     """
     Displays full study content and assignment for a single topic.
-    Tracks video viewing when video is played.
+    Video viewing is tracked by video_heartbeat_api.
     """
-    topic = get_object_or_404(Topic, id=topic_id)
+    topic = get_object_or_404(Topic, id=topic_id, course__is_active=True)
     course = topic.course
     user = request.user
 
@@ -651,16 +659,6 @@ def topic_detail_view(request, topic_id):
         defaults={'completed': False}
     )
 
-    # Track video viewing if video is played (via AJAX or query param)
-    if request.GET.get('video_watched') == 'true' and topic.video_file:
-        if not completion.video_watched:
-            completion.video_watched = True
-            completion.video_watched_at = timezone.now()
-            completion.save()
-            completion.check_completion()
-            # Update progress immediately
-            progress.update_progress()
-
     context = {
         'topic': topic,
         'course': course,
@@ -668,3 +666,151 @@ def topic_detail_view(request, topic_id):
         'completion': completion,
     }
     return render(request, 'topic_detail.html', context)
+
+
+# ------------------- CAPTION / CHAPTER API -------------------
+@login_required
+def topic_chapters_api(request, topic_id):
+    """
+    Return the parsed chapter list for a topic.
+
+    Returns: JSON list of {start, end, title}
+    """
+    topic = get_object_or_404(Topic, id=topic_id, course__is_active=True)
+    chapters = CaptionCue.objects.filter(topic=topic, kind='chapter', language='').values_list('start', 'end', 'text')
+    return JsonResponse([
+        {'start': start, 'end': end, 'title': text} for start, end, text in chapters
+    ], safe=False)
+
+
+@login_required
+def topic_cues_api(request, topic_id):
+    """
+    Return the caption cues overlapping a time window.
+
+    Query params: ?lang=en|ta&start=<seconds>&end=<seconds>
+    Returns: JSON list of {start, end, text}
+    """
+    topic = get_object_or_404(Topic, id=topic_id, course__is_active=True)
+    language = request.GET.get('lang', 'en')
+    try:
+        window_start = float(request.GET.get('start', 0))
+        window_end = float(request.GET.get('end', window_start + 60))
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be numbers'}, status=400)
+    if window_end < window_start:
+        return JsonResponse({'error': 'end must not be before start'}, status=400)
+
+    cues = (
+        CaptionCue.objects.filter(topic=topic, kind='caption', language=language,
+                                  start__lt=window_end, end__gt=window_start)
+        .values_list('start', 'end', 'text')[:500]
+    )
+    return JsonResponse([
+        {'start': start, 'end': end, 'text': text} for start, end, text in cues
+    ], safe=False)
+
+
+@login_required
+def transcript_search_api(request, course_id):
+    """
+    Search the caption text of every topic in a course.
+
+    Query params: ?q=<text>&lang=en|ta
+    Returns: JSON list of {topic_id, topic_title, start, text}
+    """
+    course = get_object_or_404(Course, id=course_id)
+    query = (request.GET.get('q') or '').strip()
+    if len(query) < 2:
+        return JsonResponse({'error': 'q must be at least 2 characters'}, status=400)
+
+    cues = CaptionCue.objects.filter(topic__course=course, kind='caption', text__icontains=query)
+    if request.GET.get('lang'):
+        cues = cues.filter(language=request.GET['lang'])
+    cues = cues.order_by('topic__order', 'start').values_list('topic_id', 'topic__title', 'start', 'text')[:50]
+    return JsonResponse([
+        {'topic_id': topic_id, 'topic_title': title, 'start': start, 'text': text}
+        for topic_id, title, start, text in cues
+    ], safe=False)
+
+
+# ------------------- VIDEO WATCH HEARTBEAT -------------------
+@login_required
+@require_POST
+def video_heartbeat_api(request, topic_id):
+    """
+    Accept a periodic watch heartbeat from the player (fetch or sendBeacon).
+
+    Body (form or JSON): position, seconds (watched since last beat)
+    Returns: JSON {watch_seconds, video_watched}
+
+    The video's length is never taken from the player: it is read from the
+    upload or entered by an admin (Topic.video_duration).
+    """
+    topic = get_object_or_404(Topic, id=topic_id, course__is_active=True)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'invalid JSON'}, status=400)
+    else:
+        data = request.POST
+
+    try:
+        position = float(data.get('position', 0))
+        seconds = float(data.get('seconds', 0))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'position and seconds must be numbers'}, status=400)
+    if not (math.isfinite(position) and math.isfinite(seconds)):
+        return JsonResponse({'error': 'position and seconds must be numbers'}, status=400)
+    if not 0 <= position <= position_limit(topic):
+        return JsonResponse({'error': 'position is outside the video'}, status=400)
+
+    progress = Progress.objects.filter(student=request.user, course_id=topic.course_id).first()
+    if not progress or not topic.video_file:
+        return JsonResponse({'error': 'not enrolled or no video'}, status=403)
+
+    watch_seconds, video_watched = record_heartbeat(progress, topic, position, seconds)
+    return JsonResponse({'watch_seconds': round(watch_seconds, 1), 'video_watched': video_watched})
+
+
+# ------------------- OFFLINE BUNDLE -------------------
+@login_required
+def course_offline_bundle(request, course_id):
+    """
+    Download a course for offline use as a ZIP (videos, PPTs, captions,
+    chapters and manifest.json). Served from the bundle cache when this
+    version of the course has been built before, otherwise streamed.
+    """
+    course = get_object_or_404(Course, id=course_id)
+    if request.user.role != 'admin' and not Progress.objects.filter(student=request.user, course=course).exists():
+        messages.error(request, 'You are not enrolled in this course.')
+        return redirect('dashboard')
+
+    topics = list(Topic.objects.filter(course=course).order_by('order'))
+    version = course_version(course, topics)
+    if request.headers.get('If-None-Match') == f'"{version}"':
+        response = HttpResponseNotModified()
+        response['ETag'] = f'"{version}"'
+        return response
+
+    filename = f"course-{course.id}-{version}.zip"
+    cached = cached_bundle_path(course, version)
+    if os.path.exists(cached):
+        response = FileResponse(open(cached, 'rb'), as_attachment=True, filename=filename, content_type='application/zip')
+    else:
+        response = StreamingHttpResponse(stream_bundle(course, topics, version), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = f'"{version}"'
+    return response
+
+
+# ------------------- MEDIA BLOBS (development server) -------------------
+def media_blob_view(request, path):
+    """
+    Serve a content-addressed media blob with far-future caching headers.
+    In production the web server should serve MEDIA_URL/blobs/ the same way.
+    """
+    response = serve(request, BLOB_PREFIX + path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = BLOB_CACHE_CONTROL
+    return response
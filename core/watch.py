@@ -0,0 +1,265 @@
+"""
+Buffered video-watch heartbeats.
+
+The player posts a heartbeat every few seconds with its playback position and
+the seconds watched since the previous beat. Beats are accumulated in the
+cache and written to TopicCompletion in batches, so a heartbeat costs a couple
+of indexed lookups instead of a full page render.
+
+Each beat also marks the segments of the video it covered in a coverage
+bitmap (TopicCompletion.watch_bitmap): bit i, least significant bit first,
+is set once second [i * SEGMENT_SECONDS, (i + 1) * SEGMENT_SECONDS) was played.
+
+The buffer is kept race-free with atomic cache operations only:
+  - watched time is added with incr() to a per-(progress, topic) counter,
+    and a flush subtracts exactly what it wrote with decr(), so beats that
+    land during a flush stay buffered;
+  - a pair is queued for the next flush once per flush (cache.add() on its
+    pending flag) by taking a slot number from an incr() sequence, so
+    concurrent beats from different students never overwrite each other;
+  - only one flush runs at a time (cache.add() lock).
+The position and coverage mask of a pair are only written by that student's
+own player. All of this needs a cache shared by every server process and
+by `manage.py flush_watch_heartbeats`, with atomic add/incr: Redis or
+Memcached (see CACHES in settings). The per-process memory cache only
+works for a single-process development server.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Progress, TopicCompletion
+
+# Fraction of the video that must be watched before it counts as watched
+WATCHED_THRESHOLD = getattr(settings, 'VIDEO_WATCHED_THRESHOLD', 0.9)
+# Seconds watched that count when the video's length is not known (the old player rule)
+UNKNOWN_LENGTH_WATCHED_SECONDS = getattr(settings, 'VIDEO_WATCHED_FALLBACK_SECONDS', 30)
+# Seconds between batched writes to the database
+FLUSH_INTERVAL = getattr(settings, 'WATCH_FLUSH_INTERVAL', 30)
+# Expected seconds between heartbeats from the player
+HEARTBEAT_INTERVAL = 10
+# Seconds of video covered by one bit of the coverage bitmap
+SEGMENT_SECONDS = getattr(settings, 'WATCH_SEGMENT_SECONDS', 5)
+# Longest video accepted when a topic's length is not known; bounds the bitmap size
+MAX_VIDEO_SECONDS = getattr(settings, 'WATCH_MAX_VIDEO_SECONDS', 6 * 60 * 60)
+# Most queued pairs written by one flush
+FLUSH_BATCH = 5000
+
+SEQUENCE_KEY = 'watch:sequence'
+FLUSHED_KEY = 'watch:flushed'
+FLUSH_GATE_KEY = 'watch:flush-gate'
+FLUSH_LOCK_KEY = 'watch:flush-lock'
+# Longest a flush may take before another one can start
+FLUSH_LOCK_TTL = 5 * 60
+BUFFER_TTL = FLUSH_INTERVAL * 20
+
+
+def _key(kind, progress_id, topic_id):
+    """Cache key of one buffered value ('ms', 'total', 'state', 'watched', 'pending', 'last') of a pair."""
+    return f'watch:{kind}:{progress_id}:{topic_id}'
+
+
+def _slot_key(number):
+    return f'watch:slot:{number}'
+
+
+def _add(key, amount, initial=0, timeout=BUFFER_TTL):
+    """Atomically add `amount` to a counter, creating it at `initial` if missing. Returns the new value."""
+    cache.add(key, initial, timeout)
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, initial + amount, timeout)
+        return initial + amount
+
+
+def segment_count(duration):
+    """Number of bitmap segments needed for a video of `duration` seconds."""
+    return -(-int(duration or 0) // SEGMENT_SECONDS)
+
+
+def covered_mask(start, end):
+    """Bit mask (as an int) of the segments overlapped by [start, end)."""
+    if end <= start:
+        return 0
+    first = int(max(start, 0) // SEGMENT_SECONDS)
+    last = int(max(end - 1e-6, 0) // SEGMENT_SECONDS)
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def merge_bitmap(bitmap, mask):
+    """OR an int mask into a little-endian bitmap (bytes); returns bytes."""
+    merged = int.from_bytes(bytes(bitmap or b''), 'little') | mask
+    return merged.to_bytes((merged.bit_length() + 7) // 8, 'little')
+
+
+def position_limit(topic):
+    """Furthest playback position a heartbeat for `topic` may report."""
+    if topic.video_duration:
+        # The stored length is rounded to whole seconds
+        return topic.video_duration + 1
+    return MAX_VIDEO_SECONDS
+
+
+def is_watched(seconds, duration):
+    """Server-side rule for marking a topic's video as watched."""
+    if not duration:
+        return seconds >= UNKNOWN_LENGTH_WATCHED_SECONDS
+    return seconds >= duration * WATCHED_THRESHOLD
+
+
+def record_heartbeat(progress, topic, position, seconds):
+    """
+    Buffer one heartbeat. Returns (total_seconds_watched, video_watched).
+
+    `seconds` is the time watched since the previous beat. It is capped at
+    the wall-clock time since that beat (and at a couple of heartbeat
+    intervals), so sending beats faster does not watch the video faster.
+    """
+    pair = (progress.id, topic.id)
+    now = time.time()
+    last_key = _key('last', *pair)
+    last_beat = cache.get(last_key)
+    elapsed = now - last_beat if last_beat is not None else HEARTBEAT_INTERVAL
+    cache.set(last_key, now, BUFFER_TTL)
+    seconds = max(0.0, min(float(seconds), HEARTBEAT_INTERVAL * 2, elapsed))
+    # The view rejects out-of-range positions; clamp anyway so the bitmap stays bounded
+    position = min(max(0.0, float(position)), position_limit(topic))
+    milliseconds = int(seconds * 1000)
+
+    total_key, watched_key = _key('total', *pair), _key('watched', *pair)
+    if cache.get(total_key) is None:
+        stored = (
+            TopicCompletion.objects.filter(progress=progress, topic=topic)
+            .values_list('watch_seconds', 'video_watched').first()
+        ) or (0.0, False)
+        unflushed = cache.get(_key('ms', *pair)) or 0
+        cache.add(total_key, int(stored[0] * 1000) + unflushed, BUFFER_TTL)
+        if stored[1]:
+            cache.add(watched_key, True, BUFFER_TTL)
+
+    _add(_key('ms', *pair), milliseconds)
+    total = _add(total_key, milliseconds) / 1000
+
+    state_key = _key('state', *pair)
+    state = cache.get(state_key) or {'position': 0.0, 'mask': 0}
+    state['position'] = position
+    state['mask'] |= covered_mask(position - seconds, position)
+    cache.set(state_key, state, BUFFER_TTL)
+
+    if cache.add(_key('pending', *pair), True, BUFFER_TTL):
+        slot = _add(SEQUENCE_KEY, 1, timeout=None)
+        cache.set(_slot_key(slot), pair, BUFFER_TTL)
+
+    # add() makes exactly one beat the one that crosses the threshold
+    watched = cache.get(watched_key) is not None
+    newly_watched = not watched and is_watched(total, topic.video_duration) and cache.add(watched_key, True, BUFFER_TTL)
+
+    # Crossing the threshold unlocks the next topic, so write it out now;
+    # everything else waits for the next interval.
+    if newly_watched:
+        flush_heartbeats()
+    elif cache.add(FLUSH_GATE_KEY, True, FLUSH_INTERVAL):
+        flush_heartbeats()
+    return total, watched or newly_watched
+
+
+def flush_heartbeats():
+    """Write all buffered heartbeats to TopicCompletion. Returns rows updated."""
+    if not cache.add(FLUSH_LOCK_KEY, True, FLUSH_LOCK_TTL):
+        return 0
+    try:
+        return _flush()
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _flush():
+    flushed = cache.get(FLUSHED_KEY) or 0
+    last = cache.get(SEQUENCE_KEY) or 0
+    if last < flushed:
+        # The sequence was lost (cache restart): start over
+        flushed = 0
+    last = min(last, flushed + FLUSH_BATCH)
+    if last == flushed:
+        return 0
+    slots = [_slot_key(number) for number in range(flushed + 1, last + 1)]
+    pairs = set(cache.get_many(slots).values())
+    # A beat from here on queues its pair again, so nothing it adds is missed
+    cache.delete_many([_key('pending', *pair) for pair in pairs])
+
+    def values(kind):
+        keys = {_key(kind, *pair): pair for pair in pairs}
+        return {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+    milliseconds, states, watched = values('ms'), values('state'), values('watched')
+    buffered = {
+        pair: {
+            'ms': milliseconds.get(pair, 0),
+            'position': states[pair]['position'],
+            'mask': states[pair]['mask'],
+            'watched': pair in watched,
+        }
+        for pair in pairs if pair in states
+    }
+    updated = _write(buffered) if buffered else 0
+
+    # Subtract what was written; time added meanwhile stays for the next flush
+    for pair, entry in buffered.items():
+        if entry['ms']:
+            try:
+                cache.decr(_key('ms', *pair), entry['ms'])
+            except ValueError:
+                pass
+    cache.set(FLUSHED_KEY, last, None)
+    cache.delete_many(slots)
+    return updated
+
+
+def _write(buffered):
+    """Apply {(progress_id, topic_id): entry} to TopicCompletion. Returns rows updated."""
+    progress_ids = {progress_id for progress_id, _ in buffered}
+    topic_ids = {topic_id for _, topic_id in buffered}
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            (tc.progress_id, tc.topic_id): tc
+            for tc in TopicCompletion.objects.filter(progress_id__in=progress_ids, topic_id__in=topic_ids)
+        }
+        missing = [pair for pair in buffered if pair not in existing]
+        if missing:
+            TopicCompletion.objects.bulk_create(
+                [TopicCompletion(progress_id=p, topic_id=t) for p, t in missing],
+                ignore_conflicts=True,
+            )
+            for tc in TopicCompletion.objects.filter(progress_id__in=progress_ids, topic_id__in=topic_ids):
+                existing.setdefault((tc.progress_id, tc.topic_id), tc)
+
+        to_update = []
+        newly_watched = []
+        for pair, entry in buffered.items():
+            tc = existing.get(pair)
+            if tc is None:
+                continue
+            tc.watch_seconds += entry['ms'] / 1000
+            tc.last_position = entry['position']
+            tc.watch_bitmap = merge_bitmap(tc.watch_bitmap, entry['mask'])
+            if entry['watched'] and not tc.video_watched:
+                tc.video_watched = True
+                tc.video_watched_at = now
+                newly_watched.append(tc)
+            to_update.append(tc)
+        TopicCompletion.objects.bulk_update(
+            to_update, ['watch_seconds', 'last_position', 'watch_bitmap', 'video_watched', 'video_watched_at'],
+            batch_size=500,
+        )
+
+        for tc in newly_watched:
+            tc.check_completion()
+        for progress in Progress.objects.filter(id__in={tc.progress_id for tc in newly_watched}):
+            progress.update_progress()
+    return len(to_update)
@@ -0,0 +1,103 @@
+"""
+Retention analytics over the per-topic watch coverage bitmaps.
+
+Bitmaps are streamed out of the database as raw bytes in chunks and
+unpacked with NumPy, so a course with tens of thousands of students is
+aggregated without building a model instance per row.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from .models import TopicCompletion
+from .watch import MAX_VIDEO_SECONDS, SEGMENT_SECONDS, segment_count
+
+CHUNK_SIZE = 5000
+DROP_OFF_POINTS = 3
+
+
+def _unpack(bitmaps, width):
+    """Stack little-endian bitmaps into an (n, width) array of 0/1."""
+    width_bytes = (width + 7) // 8
+    raw = b''.join(b[:width_bytes].ljust(width_bytes, b'\0') for b in bitmaps)
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(bitmaps), width_bytes)
+    return np.unpackbits(packed, axis=1, bitorder='little')[:, :width]
+
+
+class _TopicAccumulator:
+    def __init__(self, width, max_width):
+        self.counts = np.zeros(width, dtype=np.int64)
+        self.max_width = max_width
+        self.viewers = 0
+
+    def add(self, bitmaps):
+        # Bits past the end of the video (e.g. from a bogus position) are ignored
+        width = min(max(len(self.counts), max(len(b) for b in bitmaps) * 8), self.max_width)
+        if width > len(self.counts):
+            self.counts = np.pad(self.counts, (0, width - len(self.counts)))
+        bits = _unpack(bitmaps, width)
+        self.counts += bits.sum(axis=0, dtype=np.int64)
+        self.viewers += int(bits.any(axis=1).sum())
+
+
+def _summarize(topic, acc):
+    width = segment_count(topic['video_duration']) or len(acc.counts)
+    counts = acc.counts[:width]
+    if acc.viewers == 0 or width == 0:
+        retention = np.zeros(width)
+    else:
+        retention = counts / acc.viewers
+
+    drops = -np.diff(retention) if width > 1 else np.zeros(0)
+    worst = np.argsort(drops)[::-1][:DROP_OFF_POINTS]
+    drop_offs = [
+        {'second': int((i + 1) * SEGMENT_SECONDS), 'drop': round(float(drops[i]) * 100, 1)}
+        for i in sorted(worst) if drops[i] > 0
+    ]
+    return {
+        'topic_id': topic['id'],
+        'title': topic['title'],
+        'order': topic['order'],
+        'viewers': acc.viewers,
+        'segments': width,
+        'retention': [round(float(r) * 100, 1) for r in retention],
+        'avg_coverage': round(float(retention.mean()) * 100, 1) if width else 0.0,
+        'finished': round(float(retention[-1]) * 100, 1) if width else 0.0,
+        'drop_offs': drop_offs,
+    }
+
+
+def course_retention(course):
+    """
+    Retention curve and drop-off points for every topic of a course.
+
+    Returns a list (in topic order) of dicts with viewers, per-segment
+    retention percentages, average coverage, share that reached the last
+    segment and the biggest drop-off points.
+    """
+    topics = list(course.topics.order_by('order').values('id', 'title', 'order', 'video_duration'))
+    accumulators = {
+        t['id']: _TopicAccumulator(
+            segment_count(t['video_duration']), segment_count(t['video_duration'] or MAX_VIDEO_SECONDS)
+        )
+        for t in topics
+    }
+    pending = defaultdict(list)
+
+    rows = (
+        TopicCompletion.objects.filter(topic__course=course)
+        .exclude(watch_bitmap=b'')
+        .order_by()
+        .values_list('topic_id', 'watch_bitmap')
+    )
+    for topic_id, bitmap in rows.iterator(chunk_size=CHUNK_SIZE):
+        batch = pending[topic_id]
+        batch.append(bytes(bitmap))
+        if len(batch) >= CHUNK_SIZE:
+            accumulators[topic_id].add(batch)
+            pending[topic_id] = []
+    for topic_id, batch in pending.items():
+        if batch:
+            accumulators[topic_id].add(batch)
+
+    return [_summarize(t, accumulators[t['id']]) for t in topics]
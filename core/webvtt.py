@@ -0,0 +1,74 @@
+"""
+Minimal WebVTT reader used to index topic captions and chapters.
+
+Only the parts the player needs are understood: cue timings and cue text.
+STYLE / REGION / NOTE blocks and cue settings are skipped.
+"""
+import re
+
+TIMING_RE = re.compile(
+    r'^\s*((?:\d+:)?\d{1,2}:\d{2}[\.,]\d{1,3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[\.,]\d{1,3})'
+)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+class WebVTTError(ValueError):
+    """Raised when a file is not a usable WebVTT document."""
+
+
+def parse_timestamp(value):
+    """Convert 'hh:mm:ss.ttt' or 'mm:ss.ttt' to seconds (float)."""
+    parts = value.replace(',', '.').split(':')
+    seconds = float(parts[-1])
+    minutes = int(parts[-2])
+    hours = int(parts[-3]) if len(parts) > 2 else 0
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _lines(fileobj):
+    for raw in fileobj:
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8-sig', errors='replace')
+        yield raw.rstrip('\r\n').lstrip('﻿')
+
+
+def parse_webvtt(fileobj):
+    """
+    Parse a WebVTT file object line by line.
+
+    Yields (start, end, text) tuples; text has markup tags stripped and
+    multi-line cue payloads joined with a newline.
+    """
+    lines = _lines(fileobj)
+    header = next(lines, None)
+    if header is None or not header.startswith('WEBVTT'):
+        raise WebVTTError('File does not start with a WEBVTT header.')
+
+    start = end = None
+    payload = []
+    skipping = False
+    for line in lines:
+        if not line.strip():
+            if start is not None and payload:
+                yield start, end, '\n'.join(payload)
+            start = end = None
+            payload = []
+            skipping = False
+            continue
+        if skipping:
+            continue
+        if start is None:
+            match = TIMING_RE.match(line)
+            if match:
+                start = parse_timestamp(match.group(1))
+                end = parse_timestamp(match.group(2))
+            elif line.startswith(('NOTE', 'STYLE', 'REGION')):
+                skipping = True
+            # Anything else before the timing line is a cue identifier.
+            continue
+        text = TAG_RE.sub('', line).strip()
+        if text:
+            payload.append(text)
+
+    if start is not None and payload:
+        yield start, end, '\n'.join(payload)
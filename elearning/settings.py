@@ -74,9 +74,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts (Django 5.1+). In
+        # SQLite's default deferred mode a transaction that reads before it
+        # writes (select_for_update is ignored here) deadlocks with any other
+        # writer and one of them fails with "database is locked" after the
+        # timeout. Background jobs (roster imports, progress recomputes,
+        # heartbeat flushes, deletions) write while requests run, so every
+        # transaction needs this; SQLite serialises writers anyway.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# Cache
+# The video-watch heartbeat buffer (core.watch) and the final exam autosave
+# buffer (core.exam_attempts) must be shared by every server process and by
+# management commands, and rely on atomic add/incr: set
+# REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs the redis package) in
+# production. Without it each process gets its own memory cache, which is
+# only correct for the single-process development server.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            # The default of 300 entries would evict buffered heartbeats
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 # Email Configuration
@@ -118,6 +149,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files (for video and PPT uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Store each distinct uploaded file once, keyed by its SHA-256 (core.storage)
+MEDIA_DEDUP = True
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file